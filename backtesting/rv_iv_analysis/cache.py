@@ -0,0 +1,96 @@
+"""
+Persistent cache of RV study results per data file and start/end-day pair.
+
+An entry holds everything analyse_symbol returns (weekly changes, percentile
+tables and report lines) in a compressed .npz file. Its name carries a
+fingerprint of the source csv (size and modification time), the day pair
+and METHOD_VERSION, so an entry is only used while the data and the method
+are unchanged; older entries for the same symbol and day pair are removed
+when a new one is stored.
+"""
+
+import os
+import glob
+import hashlib
+import numpy as np
+import pandas as pd
+
+CACHE_FOLDER = os.path.join('data', 'storage', 'cache', 'rv_iv_analysis')
+METHOD_VERSION = 2          # Bump when get_weekly_abs_changes or the percentile rules change
+
+def fingerprint(file_path):
+    stat = os.stat(file_path)
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+def cache_path(file_path, start_day, end_day, cache_folder=CACHE_FOLDER):
+    """
+
+    :param file_path:   csv file the result is computed from
+    :param start_day:   the day at which we would like to open our positions  (Eg : Friday)
+    :param end_day:     the day at which we would like to close our positions (Eg : Thursday)
+
+    :return:            path of the cache entry for the file's current contents
+
+    """
+    key = f"{os.path.abspath(file_path)}|{fingerprint(file_path)}|{start_day}|{end_day}|{METHOD_VERSION}"
+    digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    return os.path.join(cache_folder, f"{name}_{start_day}_{end_day}_{digest}.npz")
+
+def load_result(file_path, start_day, end_day, cache_folder=CACHE_FOLDER):
+    """Cached analyse_symbol result for the file and day pair, or None if there is no valid entry."""
+    path = cache_path(file_path, start_day, end_day, cache_folder)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with np.load(path, allow_pickle=False) as entry:
+            start_dates = pd.to_datetime(entry['start_ns'], utc=True)
+            weekly_changes = list(zip(start_dates, entry['abs_change'], entry['peak_change']))
+            percentile_data = pd.DataFrame({
+                'Stock': str(entry['stock']),
+                'Percentile': entry['percentile'],
+                'Abs Change Percentage': entry['abs_table'],
+                'Peak Abs Change Percentage': entry['peak_table']
+            }).to_dict('records')
+            return {
+                'stock': str(entry['stock']),
+                'weekly_changes': weekly_changes,
+                'percentile_data': percentile_data,
+                'text': entry['text'].tolist()
+            }
+    except (OSError, KeyError, ValueError) as e:
+        print(f"Ignoring unreadable cache entry {path}: {e}")
+        return None
+
+def store_result(file_path, start_day, end_day, result, cache_folder=CACHE_FOLDER):
+    """Write an analyse_symbol result for the file and day pair, replacing older entries."""
+    os.makedirs(cache_folder, exist_ok=True)
+    path = cache_path(file_path, start_day, end_day, cache_folder)
+
+    percentile_df = pd.DataFrame(result['percentile_data'])
+    start_dates = pd.DatetimeIndex([start for start, _, _ in result['weekly_changes']])
+    if start_dates.tz is not None:
+        start_dates = start_dates.tz_convert('UTC').tz_localize(None)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez_compressed(
+            f,
+            stock=np.array(result['stock']),
+            start_ns=start_dates.to_numpy(dtype='datetime64[ns]').astype(np.int64),
+            abs_change=np.array([change for _, change, _ in result['weekly_changes']], dtype=float),
+            peak_change=np.array([max_peak for _, _, max_peak in result['weekly_changes']], dtype=float),
+            percentile=percentile_df['Percentile'].to_numpy(),
+            abs_table=percentile_df['Abs Change Percentage'].to_numpy(dtype=float),
+            peak_table=percentile_df['Peak Abs Change Percentage'].to_numpy(dtype=float),
+            text=np.array(result['text'], dtype=str)
+        )
+    os.replace(tmp_path, path)
+
+    # Entries of older data or method versions are never read again
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    for stale in glob.glob(os.path.join(cache_folder, f"{glob.escape(name)}_{start_day}_{end_day}_*.npz")):
+        if stale != path:
+            os.remove(stale)
+    return path
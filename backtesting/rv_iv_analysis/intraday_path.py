@@ -0,0 +1,197 @@
+"""
+Intraday path of the RV study's windows from 1-minute candles.
+
+The daily study knows how far price moved between entry and expiry but not
+when. Here every window is entered at the close of the ENTRY_TIME minute on
+the start day and followed minute by minute to the close of the end day.
+The running high/low (cumulative max/min over the window's minute bars) give
+the excursion path, and for each move threshold the number of trading
+minutes and sessions until the excursion first reached it. This is what
+decides whether a long straddle's target can be hit before theta decays.
+
+All windows are laid out as rows of one padded minute matrix, so the whole
+history is processed with a few array operations.
+
+Minute candles are the files written by data/fetchers/equity/hd_equity.py
+with TIMEFRAME = "minute".
+
+Usage:
+    python backtesting/rv_iv_analysis/intraday_path.py 0000_NIFTY.csv Friday Thursday 15:00
+"""
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+# Add root directory to Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from backtesting.rv_iv_analysis.windows import DAYS, study_windows
+
+MINUTE_FOLDER = os.path.join('data', 'storage', 'raw', 'equity', 'zerodha', '2015-2025', 'minute')
+OUTPUT_FOLDER = os.path.join('backtesting', 'rv_iv_analysis', 'results')
+ENTRY_TIME = "15:00"                        # Entry at the close of this minute on the start day
+THRESHOLDS = (0.5, 1.0, 1.5, 2.0, 3.0)      # Moves from the entry price, in percent
+MARKET_TZ = "Asia/Kolkata"
+
+def load_minutes(file_path):
+    """
+
+    :param file_path:   csv file of 1-minute candles with columns - Date & OHLCV
+
+    :return:            dataframe sorted by Date, with Date as naive exchange-local time
+
+    """
+    df = pd.read_csv(file_path, usecols=["Date", "High", "Low", "Close"])
+
+    # Kite timestamps (2015-04-01T09:15:00+0530) all carry the exchange offset, so the
+    # wall-clock part can be parsed directly, several times faster than parsing offsets
+    stamps = df["Date"].astype(str)
+    offsets = stamps.str[19:]
+    if len(stamps) and (offsets == offsets.iloc[0]).all() and offsets.iloc[0] in ("+0530", "+05:30"):
+        df["Date"] = pd.to_datetime(stamps.str[:19], format="%Y-%m-%dT%H:%M:%S", errors="coerce")
+    else:
+        dates = pd.to_datetime(df["Date"], errors="coerce", utc=True)
+        df["Date"] = dates.dt.tz_convert(MARKET_TZ).dt.tz_localize(None)
+
+    for col in ["Close", "High", "Low"]:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+
+    df = df.dropna(subset=["Date", "Close", "High", "Low"])
+    return df.sort_values("Date", kind="mergesort").reset_index(drop=True)
+
+def entry_windows(dates, start_day, end_day, entry_time=ENTRY_TIME):
+    """
+
+    :param dates:       sorted datetime64 minute timestamps (exchange-local)
+    :param start_day:   the day at which we would like to open our positions  (Eg : Friday)
+    :param end_day:     the day at which we would like to close our positions (Eg : Thursday)
+    :param entry_time:  HH:MM of the entry minute
+
+    :return:            (entry rows, exit rows) - the entry minute of every start-day session and the
+                        last minute of its end-day session, with sessions paired by
+                        windows.study_windows as in the daily study (windows ending on their
+                        start session are dropped)
+
+    """
+    days = dates.astype("datetime64[D]")
+    minute_of_day = (dates - days).astype("timedelta64[m]").astype(np.int64)
+    day_numbers = days.astype(np.int64)
+
+    # Sessions: first/last row and weekday of every trading date
+    first_rows = np.flatnonzero(np.diff(day_numbers, prepend=day_numbers[0] - 1) != 0)
+    last_rows = np.append(first_rows[1:] - 1, len(dates) - 1)
+    session_days = day_numbers[first_rows]
+    weekday = (session_days + 3) % 7            # 1970-01-01 was a Thursday
+    sessions = len(session_days)
+
+    start_num, end_num = DAYS.index(start_day), DAYS.index(end_day)
+    starts, exit_session = study_windows(days[first_rows], weekday, start_num, end_num)
+
+    # Entry minute: first bar at or after entry_time in each start-day session
+    hours, minutes = map(int, entry_time.split(":"))
+    session_of_row = np.repeat(np.arange(sessions), last_rows - first_rows + 1)
+    keys = session_of_row * 1440 + minute_of_day
+    entry = np.searchsorted(keys, starts * 1440 + hours * 60 + minutes)
+    keep = (entry <= last_rows[starts]) & (exit_session > starts)
+    return entry[keep], last_rows[exit_session[keep]]
+
+def path_analysis(df, start_day, end_day, entry_time=ENTRY_TIME, thresholds=THRESHOLDS):
+    """
+
+    :param df:          minute candles from load_minutes
+    :param start_day:   the day at which we would like to open our positions  (Eg : Friday)
+    :param end_day:     the day at which we would like to close our positions (Eg : Thursday)
+    :param entry_time:  HH:MM of the entry minute
+    :param thresholds:  move thresholds in percent of the entry price
+
+    :return:            (windows dataframe, excursion paths) - one row per window with the final,
+                        up, down and peak change and the minutes/sessions to first touch of every
+                        threshold (NaN if never touched); paths is (windows, minutes) of the running
+                        peak change, NaN after the window's last minute
+
+    """
+    dates = df["Date"].to_numpy(dtype="datetime64[ns]")
+    high = df["High"].to_numpy(dtype=float)
+    low = df["Low"].to_numpy(dtype=float)
+    close = df["Close"].to_numpy(dtype=float)
+
+    if len(dates):
+        entry, exit_ = entry_windows(dates, start_day, end_day, entry_time)
+    else:
+        entry = exit_ = np.empty(0, dtype=np.intp)
+    base = close[entry]
+    length = exit_ - entry
+    last = length - 1
+    width = int(length.max()) if len(length) else 1
+    windows_index = np.arange(len(entry))
+
+    # One row per window, one column per minute after entry
+    offsets = np.arange(1, width + 1)
+    rows = np.minimum(entry[:, None] + offsets, len(close) - 1)
+    inside = offsets <= length[:, None]
+    running_high = np.maximum.accumulate(np.where(inside, high[rows], -np.inf), axis=1)
+    running_low = np.minimum.accumulate(np.where(inside, low[rows], np.inf), axis=1)
+
+    up = (running_high - base[:, None]) / base[:, None] * 100
+    down = (base[:, None] - running_low) / base[:, None] * 100
+    excursion = np.where(inside, np.maximum(up, down), np.nan)
+
+    days = dates.astype("datetime64[D]")
+    session = np.cumsum(np.diff(days.astype(np.int64), prepend=0) != 0)
+    windows = pd.DataFrame({
+        'Start Date': days[entry],
+        'Entry Time': pd.DatetimeIndex(dates[entry]).strftime("%H:%M"),
+        'Entry Price': base,
+        'End Date': days[exit_],
+        'Minutes': length,
+        'Abs Change Percentage': np.round(np.abs(close[exit_] - base) / base * 100, 2),
+        'Max Up Percentage': np.round(up[windows_index, last], 2),
+        'Max Down Percentage': np.round(down[windows_index, last], 2)
+    })
+    windows['Peak Abs Change Percentage'] = windows[['Max Up Percentage', 'Max Down Percentage']].max(axis=1)
+
+    # Time to first touch of each threshold
+    for threshold in thresholds:
+        touched = excursion >= threshold
+        hit = touched.any(axis=1)
+        first = touched.argmax(axis=1)
+        touch_session = session[rows[windows_index, first]] - session[entry]
+        windows[f'Minutes To {threshold}%'] = np.where(hit, first + 1, np.nan)
+        windows[f'Sessions To {threshold}%'] = np.where(hit, touch_session, np.nan)
+
+    return windows, excursion
+
+def touch_summary(windows, thresholds=THRESHOLDS):
+    """Per threshold: share of windows that touched it and the median/90th percentile minutes to touch."""
+    rows = []
+    for threshold in thresholds:
+        minutes = windows[f'Minutes To {threshold}%']
+        rows.append({
+            'Threshold': threshold,
+            'Touched Percentage': round(minutes.notna().mean() * 100, 2) if len(windows) else np.nan,
+            'Median Minutes': minutes.median(),
+            '90th Percentile Minutes': minutes.quantile(0.9),
+            'Median Sessions': windows[f'Sessions To {threshold}%'].median()
+        })
+    return pd.DataFrame(rows)
+
+if __name__ == '__main__':
+
+    file_name = sys.argv[1] if len(sys.argv) > 1 else "0000_NIFTY.csv"
+    start_day = sys.argv[2] if len(sys.argv) > 2 else "Friday"
+    end_day = sys.argv[3] if len(sys.argv) > 3 else "Thursday"
+    entry_time = sys.argv[4] if len(sys.argv) > 4 else ENTRY_TIME
+
+    minutes_df = load_minutes(os.path.join(MINUTE_FOLDER, file_name))
+    windows_df, _ = path_analysis(minutes_df, start_day, end_day, entry_time)
+
+    os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+    stock_name = file_name[:-4].replace('0000_', '')
+    csv_filename = os.path.join(OUTPUT_FOLDER, f"{stock_name}_intraday_{start_day}_{end_day}.csv")
+    windows_df.to_csv(csv_filename, index=False)
+
+    print(f"{stock_name}: {len(windows_df)} {start_day}-to-{end_day} windows, entry at {entry_time}\n")
+    print(touch_summary(windows_df).to_string(index=False))
+    print(f"\nWindow details saved to: {csv_filename}")
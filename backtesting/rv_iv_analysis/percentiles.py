@@ -0,0 +1,71 @@
+"""
+Percentile tables for the RV study, computed with numpy quantiles.
+
+Percentile p (1-100) is the change reached in roughly p% of the windows: the
+value ranked int((p - 1) * n / 100) from the top, as the study has always
+defined it. Values are arrays whose last axis holds the windows, so one call
+covers one symbol, many symbols, or many symbols x start/end-day pairs.
+Ragged inputs are NaN-padded (see stack) and NaNs are ignored.
+"""
+
+import numpy as np
+import pandas as pd
+
+PERCENTILES = np.arange(1, 101)
+BUCKET_SIZE = 5                 # Percentiles averaged per row of the text report
+
+# inverted_cdf at these levels picks exactly the top-down rank above; the tiny
+# offset keeps it on the right side when n * level is a whole number
+QUANTILES = (101 - PERCENTILES) / 100 - 1e-12
+
+def stack(values_list):
+    """
+
+    :param values_list:     sequence of 1-D arrays/lists of changes, possibly of different lengths
+
+    :return:                2-D float array, one row per input, NaN-padded to the longest
+
+    """
+    width = max((len(values) for values in values_list), default=0)
+    stacked = np.full((len(values_list), width), np.nan)
+    for row, values in enumerate(values_list):
+        stacked[row, :len(values)] = values
+    return stacked
+
+def percentile_table(values):
+    """
+
+    :param values:      array of changes, windows along the last axis (Eg : (symbols, windows))
+
+    :return:            array of the same leading shape with 100 percentiles along the last axis
+
+    """
+    values = np.asarray(values, dtype=float)
+    if np.isnan(values).any():
+        table = np.nanquantile(values, QUANTILES, axis=-1, method="inverted_cdf")
+    else:
+        table = np.quantile(values, QUANTILES, axis=-1, method="inverted_cdf")
+    return np.moveaxis(table, 0, -1)
+
+def bucket_averages(table, size=BUCKET_SIZE):
+    """Average of each run of `size` percentiles, Eg : 20 rows of 0-5%, 5-10%, ... for size 5."""
+    return table.reshape(table.shape[:-1] + (-1, size)).mean(axis=-1)
+
+def table_frame(stocks, abs_table, peak_table):
+    """
+
+    :param stocks:      symbol names, one per row of the tables
+    :param abs_table:   (symbols, 100) absolute change percentiles
+    :param peak_table:  (symbols, 100) peak change percentiles
+
+    :return:            long dataframe with Stock, Percentile, Abs Change Percentage & Peak Abs Change Percentage
+
+    """
+    abs_table = np.asarray(abs_table).reshape(len(stocks), len(PERCENTILES))
+    peak_table = np.asarray(peak_table).reshape(len(stocks), len(PERCENTILES))
+    return pd.DataFrame({
+        'Stock': np.repeat(np.asarray(stocks, dtype=object), len(PERCENTILES)),
+        'Percentile': np.tile(PERCENTILES, len(stocks)),
+        'Abs Change Percentage': np.round(abs_table.ravel(), 2),
+        'Peak Abs Change Percentage': np.round(peak_table.ravel(), 2)
+    })
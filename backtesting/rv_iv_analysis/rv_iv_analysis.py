@@ -1,7 +1,17 @@
 import pandas as pd
 import numpy as np
 import os
+import sys
 from datetime import datetime
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+
+# Add root directory to Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from backtesting.rv_iv_analysis.percentiles import percentile_table, bucket_averages, table_frame, stack
+from backtesting.rv_iv_analysis.cache import load_result, store_result
+from backtesting.rv_iv_analysis.windows import DAYS, study_windows
 
 # Configuration
 FOLDER_PATH = "data/storage/processed/equity/zerodha/2015/day"
@@ -27,72 +37,215 @@ def get_weekly_abs_changes(df, start_day, end_day):
     :return:            list of tuples containing (start_date, absolute_change_percentage, max_peak_change)
                         calculation logic is defined excellently in readme file
 
+    Windows come from windows.study_windows (binary searches over the sorted
+    dates) and the peak high/low of all windows from one reduceat each, so the
+    whole history is processed in a few array operations instead of one
+    DataFrame scan per start day.
+
     """
 
-    # Calculate expected days between start and end day
-    days_map = {"Monday": 0, "Tuesday": 1, "Wednesday": 2, "Thursday": 3, "Friday": 4, "Saturday": 5, "Sunday": 6}
-    start_num = days_map[start_day]
-    end_num = days_map[end_day]
-    max_days = (end_num - start_num) % 7 if end_num != start_num else 7
     df["Date"] = pd.to_datetime(df["Date"])
     df["Day"] = df["Date"].dt.day_name()
 
-    start_days = df[df["Day"] == start_day].reset_index()
-    results = []
+    data = df if df["Date"].is_monotonic_increasing else df.sort_values("Date", kind="mergesort")
+    dates = pd.DatetimeIndex(data["Date"]).tz_localize(None).to_numpy(dtype="datetime64[ns]")
+    close = data["Close"].to_numpy(dtype=float)
+    high = data["High"].to_numpy(dtype=float)
+    low = data["Low"].to_numpy(dtype=float)
+    weekday = pd.DatetimeIndex(data["Date"]).dayofweek.to_numpy()
+
+    # Windows as every RV tool builds them (see windows.py)
+    starts, end_rows = study_windows(dates, weekday, DAYS.index(start_day), DAYS.index(end_day), close != 0)
+    period_start = np.searchsorted(dates, dates[starts], side="right")
+    end_dates = dates[end_rows]
+    end_close = close[end_rows]
+    period_end = np.searchsorted(dates, end_dates, side="right")
+    base = close[starts]
+
+    abs_change_pct = np.round(np.abs((end_close - base) / base) * 100, 2)
+
+    # Peak high/low over (start, end]; windows may overlap, so reduce over
+    # interleaved [start, end) bounds and keep every other result
+    empty = period_start >= period_end
+    bounds = np.empty(2 * len(starts), dtype=np.intp)
+    bounds[0::2] = period_start
+    bounds[1::2] = period_end
+    if len(bounds):
+        peak_high = np.fmax.reduceat(np.append(high, np.nan), bounds)[0::2]
+        peak_low = np.fmin.reduceat(np.append(low, np.nan), bounds)[0::2]
+    else:
+        peak_high = peak_low = np.empty(0)
+    peak_high = np.where(empty, np.nan, peak_high)
+    peak_low = np.where(empty, np.nan, peak_low)
+
+    peak_high_change = np.round(np.abs((peak_high - base) / base) * 100, 2)
+    peak_low_change = np.round(np.abs((peak_low - base) / base) * 100, 2)
+    max_peak_change = np.where(peak_low_change > peak_high_change, peak_low_change, peak_high_change)
+
+    start_dates = data["Date"].iloc[starts]
+    return list(zip(start_dates, abs_change_pct, max_peak_change))
+
+def load_ohlc(file_path):
+    """
+    Read an OHLCV csv file into a dataframe sorted by Date.
+
+    :return:    dataframe, or None if the file has no Date column
+    """
+    df = pd.read_csv(file_path)
+
+    if "Date" not in df.columns:
+        return None
+
+    df["Date"] = pd.to_datetime(df["Date"], errors="coerce", utc=True)
+    df = df.dropna(subset=["Date"])
+
+    for col in ["Close", "High", "Low"]:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+
+    df = df.dropna(subset=["Close", "High", "Low"])
+    df.sort_values("Date", ascending=True, inplace=True)
+    return df
+
+def analyse_symbol(file_path, start_day=START_DAY, end_day=END_DAY):
+    """
+
+    :param file_path:   csv file with OHLCV data of one stock/index
+    :param start_day:   the day at which we would like to open our positions  (Eg : Friday)
+    :param end_day:     the day at which we would like to close our positions (Eg : Thursday)
+
+    :return:            dict with the stock name, its weekly changes, percentile rows and report lines,
+                        or None if the file has no usable data. Nothing global is touched, so this
+                        can run in worker processes.
+
+    """
+    file = os.path.basename(file_path)
+    stock_name = file[:-4].replace('0000_', '')  # Remove .csv and 0000_ prefix
+
+    df = load_ohlc(file_path)
+    if df is None:
+        print(f"Skipping {file} (No 'Date' column found)")
+        return None
+
+    weekly_changes = get_weekly_abs_changes(df, start_day, end_day)
+
+    if not weekly_changes:
+        print(f"No {start_day}-to-{end_day} data found in {file}")
+        return None
+
+    text = []
+    avg_abs_change_pct = np.mean([change for _, change, _ in weekly_changes])
+    avg_max_peak_change = np.mean([max_peak for _, _, max_peak in weekly_changes])
+    min_max_peak_change = min(max_peak for _, _, max_peak in weekly_changes)
+
+
+    text.extend([
+        f"Average Absolute Change Percentage: {avg_abs_change_pct:.2f}%",
+        f"Average Max Peak Change Percentage: {avg_max_peak_change:.2f}%\n",
+        f"Minimum Max Peak Change: {min_max_peak_change:.2f}% (Important Factor)"
+    ])
+
+    # Percentile 1-100 of both distributions in one quantile call
+    abs_table, peak_table = percentile_table([[change for _, change, _ in weekly_changes],
+                                              [max_peak for _, _, max_peak in weekly_changes]])
+
+    text.append("\nPercentile Analysis (Top 20 ranges):\n")
+    text.append(f"{'Percentile':<12} {'Abs Change':<12} {'Max Peak Change':<15}")
+    text.append("-" * 40)
+
+    # Display 20 percentile ranges for text output
+    for i, (abs_avg, peak_avg) in enumerate(zip(bucket_averages(abs_table), bucket_averages(peak_table))):
+        percentile_range = f"{i * 5}-{(i + 1) * 5}%"
+        line = f"{percentile_range:<12} {abs_avg:.2f}%{'':<8} {peak_avg:.2f}%"
+        text.append(line)
     
-    for i, row in start_days.iterrows():
-        if row["Close"] == 0:
-            continue
-            
-        start_date = row["Date"]
-        end_day_data = df[(df["Date"] > start_date) & (df["Day"] == end_day)]
-        
-        if not end_day_data.empty:
-            potential_end_date = end_day_data.iloc[0]["Date"]
-            days_diff = (potential_end_date - start_date).days
-            
-            if days_diff <= max_days:
-                end_date = potential_end_date
-                end_close = end_day_data.iloc[0]["Close"]
-            else:
-                # Find the date exactly max_days after start_date
-                target_date = start_date + pd.Timedelta(days=max_days)
-                available_dates = df[(df["Date"] >= start_date) & (df["Date"] <= end_date)]
-                if not available_dates.empty:
-                    end_date = available_dates["Date"].max()
-                    end_close = df[df["Date"] == end_date]["Close"].iloc[0]
-                else:
-                    continue
-            
-            abs_change_pct = round(abs((end_close - row["Close"]) / row["Close"]) * 100, 2)
+    # Create CSV data for individual percentiles (1-100)
+    percentile_data = table_frame([stock_name], abs_table, peak_table).to_dict('records')
+    
+    yearly_changes = {}
+    yearly_peak_changes = {}
 
-            period_df = df[(df["Date"] > start_date) & (df["Date"] <= end_date)]
+    for start, change, max_peak in weekly_changes:
+        year = start.year
 
-            peak_high = period_df["High"].max()
-            peak_low = period_df["Low"].min()
-            peak_high_change = round(abs((peak_high - row["Close"]) / row["Close"]) * 100, 2)
-            peak_low_change = round(abs((peak_low - row["Close"]) / row["Close"]) * 100, 2)
-            
-            max_peak_change = max(peak_high_change, peak_low_change)
+        if year not in yearly_changes:
+            yearly_changes[year] = []
+            yearly_peak_changes[year] = []
 
-            results.append((start_date, abs_change_pct, max_peak_change))
-            
-            # Add OHLCV data to results_text
-            # days_between = (end_date - start_date).days
-            # results_text.append(f"Period: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')} ({days_between} days)")
-            # results_text.append("\nOHLCV Data:")
-            # results_text.append(f"{'Date':<12} {'Open':<10} {'High':<10} {'Low':<10} {'Close':<10} {'Volume':<15}")
-            # results_text.append("-" * 75)
-            
-            # period_df = df[(df["Date"] >= start_date) & (df["Date"] <= end_date)]
-            # for _, period_row in period_df.iterrows():
-            #     date_str = period_row['Date'].strftime('%Y-%m-%d')
-            #     results_text.append(f"{date_str:<12} {period_row['Open']:<10} {period_row['High']:<10} {period_row['Low']:<10} {period_row['Close']:<10} {period_row['Volume']:<15}")
-            
+        yearly_changes[year].append(change)
+        yearly_peak_changes[year].append(max_peak)
 
-    return results
+    avg_yearly_changes = {year: round(np.mean(changes), 2) for year, changes in yearly_changes.items()}
+    avg_yearly_peak_changes = {year: round(np.mean(peaks), 2) for year, peaks in yearly_peak_changes.items()}
 
-def process_volatility_analysis(folder_path=FOLDER_PATH, output_folder=OUTPUT_FOLDER, file_limit=FILE_LIMIT, start_day=START_DAY, end_day=END_DAY, specific_file=None):
+    text.append(f"\nAverage {start_day}-to-{end_day} Changes Per Year:\n")
+    text.append(f"{'Year':<6} {'Abs Change':<12} {'Max Peak Change':<15}")
+    text.append("-" * 35)
+    
+    for year in sorted(avg_yearly_changes.keys()):
+        year_line = f"{year:<6} {avg_yearly_changes[year]:.2f}%{'':<8} {avg_yearly_peak_changes[year]:.2f}%"
+        text.append(year_line)
+
+    # Monthly analysis
+    monthly_changes = {}
+    monthly_peak_changes = {}
+    for start, change, max_peak in weekly_changes:
+        year = start.year
+        month = start.strftime("%b")
+        monthly_changes[(year, month)] = change
+        monthly_peak_changes[(year, month)] = max_peak
+
+    if monthly_changes:
+        table = pd.DataFrame.from_dict(monthly_changes, orient='index', columns=["Abs Change Pct"])
+        table.index = pd.MultiIndex.from_tuples(table.index, names=["Year", "Month"])
+        table = table.unstack(level=1)["Abs Change Pct"]
+        
+        month_order = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+        table = table.reindex(columns=month_order)
+        table.loc["Average"] = round(table.mean(), 2)
+        
+        text.append("\nMonthly Absolute Change Percentages Table:\n")
+        text.append(str(table.round(2)))
+        
+        # Monthly max peak changes table
+        peak_table = pd.DataFrame.from_dict(monthly_peak_changes, orient='index', columns=["Max Peak Change Pct"])
+        peak_table.index = pd.MultiIndex.from_tuples(peak_table.index, names=["Year", "Month"])
+        peak_table = peak_table.unstack(level=1)["Max Peak Change Pct"]
+        peak_table = peak_table.reindex(columns=month_order)
+        peak_table.loc["Average"] = round(peak_table.mean(), 2)
+        
+        text.append("\nMonthly Max Peak Change Percentages Table:\n")
+        text.append(str(peak_table.round(2)))
+
+    return {
+        'stock': stock_name,
+        'weekly_changes': weekly_changes,
+        'percentile_data': percentile_data,
+        'text': text
+    }
+
+def cached_analysis(file_path, start_day=START_DAY, end_day=END_DAY, use_cache=True):
+    """analyse_symbol through the persistent result cache (see cache.py); recomputed only when the file changes."""
+    if use_cache:
+        result = load_result(file_path, start_day, end_day)
+        if result is not None:
+            return result
+
+    result = analyse_symbol(file_path, start_day, end_day)
+    if use_cache and result is not None:
+        try:
+            store_result(file_path, start_day, end_day, result)
+        except OSError as e:
+            print(f"Could not cache the analysis of {file_path}: {e}")
+    return result
+
+def save_percentiles(percentile_data, stock_name, output_folder=OUTPUT_FOLDER):
+    csv_filename = os.path.join(output_folder, f"{stock_name}.csv")
+    percentile_df = pd.DataFrame(percentile_data)
+    percentile_df.to_csv(csv_filename, index=False)
+    print(f"Percentile analysis saved to: {csv_filename}")
+    return csv_filename
+
+def process_volatility_analysis(folder_path=FOLDER_PATH, output_folder=OUTPUT_FOLDER, file_limit=FILE_LIMIT, start_day=START_DAY, end_day=END_DAY, specific_file=None, use_cache=True):
     """
 
     :param folder_path:     path to folder containing csv files with OHLCV data.
@@ -101,6 +254,7 @@ def process_volatility_analysis(folder_path=FOLDER_PATH, output_folder=OUTPUT_FO
     :param start_day:       the day at which we would like to open our positions  (Eg : Friday)
     :param end_day:         the day at which we would like to close our positions (Eg : Thursday)
     :param specific_file:   if we want to process only one specific file, we  can use this
+    :param use_cache:       reuse the cached result while the file is unchanged
 
     Processes Included:
         1) Filters the stocks/indicies files that are to be analysed
@@ -109,7 +263,6 @@ def process_volatility_analysis(folder_path=FOLDER_PATH, output_folder=OUTPUT_FO
 
     """
     os.makedirs(output_folder, exist_ok=True)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     
     files_to_process = [specific_file] if specific_file else os.listdir(folder_path)[:file_limit]
     
@@ -117,160 +270,74 @@ def process_volatility_analysis(folder_path=FOLDER_PATH, output_folder=OUTPUT_FO
         if not file.endswith(".csv"):
             continue
             
-        file_path = os.path.join(folder_path, file)
         print(f"Processing file: {file}")
         results_text.append(f"\nAnalysis for: {file[:-4]}\n")
 
-        df = pd.read_csv(file_path)
-
-        if "Date" not in df.columns:
-            print(f"Skipping {file} (No 'Date' column found)")
+        result = cached_analysis(os.path.join(folder_path, file), start_day, end_day, use_cache)
+        if result is None:
             continue
 
-        df["Date"] = pd.to_datetime(df["Date"], errors="coerce", utc=True)
-        df = df.dropna(subset=["Date"])
-
-        for col in ["Close", "High", "Low"]:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
-
-        df = df.dropna(subset=["Close", "High", "Low"])
-        df.sort_values("Date", ascending=True, inplace=True)
-
-        weekly_changes = get_weekly_abs_changes(df, start_day, end_day)
+        results_text.extend(result['text'])
+        save_percentiles(result['percentile_data'], result['stock'], output_folder)
 
-        if not weekly_changes:
-            print(f"No {start_day}-to-{end_day} data found in {file}")
-            continue
-
-        avg_abs_change_pct = np.mean([change for _, change, _ in weekly_changes])
-        avg_max_peak_change = np.mean([max_peak for _, _, max_peak in weekly_changes])
-        min_max_peak_change = min(max_peak for _, _, max_peak in weekly_changes)
+        return result['percentile_data']
 
+def process_universe(folder_path=FOLDER_PATH, output_folder=OUTPUT_FOLDER, start_day=START_DAY, end_day=END_DAY, file_limit=None, workers=None, use_cache=True):
+    """
 
-        results_text.extend([
-            f"Average Absolute Change Percentage: {avg_abs_change_pct:.2f}%",
-            f"Average Max Peak Change Percentage: {avg_max_peak_change:.2f}%\n",
-            f"Minimum Max Peak Change: {min_max_peak_change:.2f}% (Important Factor)"
-        ])
+    :param folder_path:     path to folder containing csv files with OHLCV data.
+    :param output_folder:   path to folder to store results
+    :param start_day:       the day at which we would like to open our positions  (Eg : Friday)
+    :param end_day:         the day at which we would like to close our positions (Eg : Thursday)
+    :param file_limit:      number of files to process in the folder (default all)
+    :param workers:         number of worker processes (default os.cpu_count())
+    :param use_cache:       reuse cached results of files that have not changed
 
-        max_peak_values = sorted([max_peak for _, _, max_peak in weekly_changes], reverse=True)
-        abs_change_values = sorted([change for _, change, _ in weekly_changes], reverse=True)
-        num_entries = len(max_peak_values)
-        
-        # Calculate individual percentiles (1-100)
-        percentile_averages = {}
-        abs_percentile_averages = {}
-        
-        for p in range(1, 101):
-            idx = int((p - 1) * num_entries / 100)
-            if idx >= num_entries:
-                idx = num_entries - 1
-            
-            percentile_averages[f"{p * 5 - 4}-{p * 5}%"] = max_peak_values[idx] if p <= 20 else 0
-            abs_percentile_averages[f"{p * 5 - 4}-{p * 5}%"] = abs_change_values[idx] if p <= 20 else 0
-        
-        # Store individual percentile data for CSV
-        individual_percentiles = {}
-        individual_abs_percentiles = {}
-        for p in range(1, 101):
-            idx = int((p - 1) * num_entries / 100)
-            if idx >= num_entries:
-                idx = num_entries - 1
-            individual_percentiles[p] = max_peak_values[idx]
-            individual_abs_percentiles[p] = abs_change_values[idx]
-
-        results_text.append("\nPercentile Analysis (Top 20 ranges):\n")
-        results_text.append(f"{'Percentile':<12} {'Abs Change':<12} {'Max Peak Change':<15}")
-        results_text.append("-" * 40)
-
-        # Display 20 percentile ranges for text output
-        for i in range(20):
-            percentile_range = f"{i * 5}-{(i + 1) * 5}%"
-            abs_avg = np.mean([individual_abs_percentiles[p] for p in range(i*5+1, min((i+1)*5+1, 101))])
-            peak_avg = np.mean([individual_percentiles[p] for p in range(i*5+1, min((i+1)*5+1, 101))])
-            line = f"{percentile_range:<12} {abs_avg:.2f}%{'':<8} {peak_avg:.2f}%"
-            results_text.append(line)
-        
-        # Create CSV data for individual percentiles (1-100)
-        percentile_data = []
-        stock_name = file[:-4].replace('0000_', '')  # Remove .csv and 0000_ prefix
-        for p in range(1, 101):
-            percentile_data.append({
-                'Stock': stock_name,
-                'Percentile': p,
-                'Abs Change Percentage': round(individual_abs_percentiles[p], 2),
-                'Peak Abs Change Percentage': round(individual_percentiles[p], 2)
-            })
-        
-        # Save percentile data to CSV
-        csv_filename = os.path.join(output_folder, f"{stock_name}.csv")
-        percentile_df = pd.DataFrame(percentile_data)
-        percentile_df.to_csv(csv_filename, index=False)
-        print(f"Percentile analysis saved to: {csv_filename}")
+    :return:                (list of analyse_symbol results, universe-wide percentile dataframe)
 
-        yearly_changes = {}
-        yearly_peak_changes = {}
+    Batch mode of process_volatility_analysis: the files are analysed in a process pool,
+    each symbol's percentile csv is saved as usual and all of them are merged into
+    universe_percentiles_<start_day>_<end_day>.csv, one row per stock and percentile.
 
-        for start, change, max_peak in weekly_changes:
-            year = start.year
+    """
+    os.makedirs(output_folder, exist_ok=True)
 
-            if year not in yearly_changes:
-                yearly_changes[year] = []
-                yearly_peak_changes[year] = []
+    files = sorted(file for file in os.listdir(folder_path) if file.endswith(".csv"))[:file_limit]
+    paths = [os.path.join(folder_path, file) for file in files]
 
-            yearly_changes[year].append(change)
-            yearly_peak_changes[year].append(max_peak)
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(paths) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = [result for result in pool.map(cached_analysis, paths, repeat(start_day), repeat(end_day),
+                                                 repeat(use_cache), chunksize=chunksize) if result is not None]
 
-        avg_yearly_changes = {year: round(np.mean(changes), 2) for year, changes in yearly_changes.items()}
-        avg_yearly_peak_changes = {year: round(np.mean(peaks), 2) for year, peaks in yearly_peak_changes.items()}
+    for result in results:
+        save_percentiles(result['percentile_data'], result['stock'], output_folder)
 
-        results_text.append(f"\nAverage {start_day}-to-{end_day} Changes Per Year:\n")
-        results_text.append(f"{'Year':<6} {'Abs Change':<12} {'Max Peak Change':<15}")
-        results_text.append("-" * 35)
-        
-        for year in sorted(avg_yearly_changes.keys()):
-            year_line = f"{year:<6} {avg_yearly_changes[year]:.2f}%{'':<8} {avg_yearly_peak_changes[year]:.2f}%"
-            results_text.append(year_line)
-
-        # Monthly analysis
-        monthly_changes = {}
-        monthly_peak_changes = {}
-        for start, change, max_peak in weekly_changes:
-            year = start.year
-            month = start.strftime("%b")
-            monthly_changes[(year, month)] = change
-            monthly_peak_changes[(year, month)] = max_peak
-
-        if monthly_changes:
-            table = pd.DataFrame.from_dict(monthly_changes, orient='index', columns=["Abs Change Pct"])
-            table.index = pd.MultiIndex.from_tuples(table.index, names=["Year", "Month"])
-            table = table.unstack(level=1)["Abs Change Pct"]
-            
-            month_order = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
-            table = table.reindex(columns=month_order)
-            table.loc["Average"] = round(table.mean(), 2)
-            
-            results_text.append("\nMonthly Absolute Change Percentages Table:\n")
-            results_text.append(str(table.round(2)))
-            
-            # Monthly max peak changes table
-            peak_table = pd.DataFrame.from_dict(monthly_peak_changes, orient='index', columns=["Max Peak Change Pct"])
-            peak_table.index = pd.MultiIndex.from_tuples(peak_table.index, names=["Year", "Month"])
-            peak_table = peak_table.unstack(level=1)["Max Peak Change Pct"]
-            peak_table = peak_table.reindex(columns=month_order)
-            peak_table.loc["Average"] = round(peak_table.mean(), 2)
-            
-            results_text.append("\nMonthly Max Peak Change Percentages Table:\n")
-            results_text.append(str(peak_table.round(2)))
+    # Whole universe in one quantile call over the NaN-padded (measure, symbol, window) cube
+    changes = [stack([[change for _, change, _ in result['weekly_changes']] for result in results]),
+               stack([[max_peak for _, _, max_peak in result['weekly_changes']] for result in results])]
+    abs_table, peak_table = percentile_table(changes) if results else (np.empty((0, 100)),) * 2
+    universe_df = table_frame([result['stock'] for result in results], abs_table, peak_table)
+    universe_file = os.path.join(output_folder, f"universe_percentiles_{start_day}_{end_day}.csv")
+    universe_df.to_csv(universe_file, index=False)
+    print(f"Universe percentile table for {len(results)} symbols saved to: {universe_file}")
 
-        return percentile_data
+    return results, universe_df
 
 if __name__ == '__main__':
 
     results_text.append(f"Start day\t-\t{START_DAY}")
     results_text.append(f"End day\t\t-\t{END_DAY}")
     
-    process_volatility_analysis()
+    if '--all' in sys.argv[1:]:
+        # Whole universe in parallel: python rv_iv_analysis.py --all
+        universe_results, _ = process_universe()
+        for result in universe_results:
+            results_text.append(f"\nAnalysis for: {result['stock']}\n")
+            results_text.extend(result['text'])
+    else:
+        process_volatility_analysis()
     
     # Save results to file
     with open(output_file, 'w') as f:
@@ -0,0 +1,313 @@
+"""
+Long straddle backtest on real option prices from the stored 1-minute option candles.
+
+The RV study estimates the chance of a 100% profit from underlying moves only.
+Here every historical expiry is traded the way the live strategy trades it:
+on the opening day (the first session after the previous expiry) at
+ENTRY_TIME, buy the nearest call at or above spot * 1.005 and the nearest put
+at or below spot * 0.995, then hold the pair until
+
+    Target      the straddle (call close + put close) is worth TARGET_MULTIPLE x its cost
+    Breakeven   on the expiry day, the straddle is worth its cost again
+    Expiry      otherwise, the last close of the expiry day
+
+Only option candles are stored, so spot at entry is implied by put-call
+parity at the strike where the call and put prices cross (spot ~ K + C - P).
+That strike is found by bisection over the strikes, so only a handful of
+contract files are read per expiry. Prices are minute closes, and a leg that
+did not trade in a minute keeps its previous close.
+
+The straddle paths of all expiries are rows of one padded minute matrix, so
+the exits of the whole history come out of a few array operations.
+
+Option candles are the files written by data/fetchers/options/hd_options.py:
+<underlying>/<expiry YYYY-MM-DD>/<trading symbol>.csv
+
+Usage:
+    python backtesting/rv_iv_analysis/straddle_backtest.py nifty 15:00
+"""
+
+import os
+import re
+import sys
+import numpy as np
+import pandas as pd
+
+OPTIONS_FOLDER = os.path.join('data', 'storage', 'options', 'index')
+OUTPUT_FOLDER = os.path.join('backtesting', 'rv_iv_analysis', 'results')
+ENTRY_TIME = "15:00"            # Entry at the last close at or before this minute on the opening day
+OTM_PERCENT = 0.5               # Call strike at or above spot + 0.5%, put strike at or below spot - 0.5%
+TARGET_MULTIPLE = 2.0           # Exit once the straddle is worth this multiple of its cost
+
+UNDERLYINGS = ["nifty", "banknifty", "sensex"]
+
+CONTRACT_PATTERN = re.compile(r"_(\d+(?:\.\d+)?)_(CE|PE)(?:_|\.csv$)")
+
+def load_candles(file_path):
+    """
+
+    :param file_path:   csv file of 1-minute option candles with columns - timestamp & OHLCV, oi
+
+    :return:            (timestamps, closes) sorted by time, timestamps as naive exchange-local datetime64
+
+    """
+    df = pd.read_csv(file_path, usecols=["timestamp", "close"])
+
+    # Upstox timestamps (2024-01-04T15:29:00+05:30) all carry the exchange offset
+    stamps = df["timestamp"].astype(str)
+    dates = pd.to_datetime(stamps.str[:19], format="%Y-%m-%dT%H:%M:%S", errors="coerce")
+    closes = pd.to_numeric(df["close"], errors="coerce")
+
+    valid = (dates.notna() & closes.notna()).to_numpy()
+    dates = dates.to_numpy(dtype="datetime64[ns]")[valid]
+    closes = closes.to_numpy(dtype=float)[valid]
+    order = np.argsort(dates, kind="mergesort")
+    return dates[order], closes[order]
+
+def expiry_contracts(expiry_folder):
+    """
+
+    :param expiry_folder:   folder of one expiry's contract files
+
+    :return:                {'CE': {strike: path}, 'PE': {strike: path}}
+
+    """
+    contracts = {'CE': {}, 'PE': {}}
+    for file_name in os.listdir(expiry_folder):
+        match = CONTRACT_PATTERN.search(file_name)
+        if match:
+            contracts[match.group(2)][float(match.group(1))] = os.path.join(expiry_folder, file_name)
+    return contracts
+
+class _Contracts:
+    """Lazily loaded candles of one expiry's contracts; each file is read at most once."""
+
+    def __init__(self, contracts):
+        self.contracts = contracts
+        self.candles = {}
+
+    def load(self, option_type, strike):
+        key = (option_type, strike)
+        if key not in self.candles:
+            path = self.contracts[option_type].get(strike)
+            self.candles[key] = load_candles(path) if path else (np.empty(0, dtype="datetime64[ns]"), np.empty(0))
+        return self.candles[key]
+
+    def price(self, option_type, strike, entry, session):
+        """Last close at or before entry within the entry's session, NaN if the contract had not traded."""
+        dates, closes = self.load(option_type, strike)
+        index = np.searchsorted(dates, entry, side="right") - 1
+        if index < 0 or dates[index] < session:
+            return np.nan
+        return closes[index]
+
+def _implied_spot(book, strikes, entry, session):
+    """Spot implied by put-call parity at the strike where call minus put changes sign."""
+
+    def parity_gap(i):
+        return book.price('CE', strikes[i], entry, session) - book.price('PE', strikes[i], entry, session)
+
+    def nearest_priced(i, lo, hi):
+        for step in range(hi - lo):
+            for j in (i - step, i + step):
+                if lo < j < hi and not np.isnan(parity_gap(j)):
+                    return j
+        return None
+
+    # Call minus put falls as the strike rises, so bisect for the crossing
+    lo, hi = 0, len(strikes) - 1
+    while hi - lo > 1:
+        mid = nearest_priced((lo + hi) // 2, lo, hi)
+        if mid is None:
+            break
+        if parity_gap(mid) > 0:
+            lo = mid
+        else:
+            hi = mid
+
+    candidates = [i for i in range(max(lo - 1, 0), min(hi + 2, len(strikes))) if not np.isnan(parity_gap(i))]
+    if not candidates:
+        return np.nan
+    best = min(candidates, key=lambda i: abs(parity_gap(i)))
+    return strikes[best] + parity_gap(best)
+
+def _otm_leg(book, option_type, strikes, bound, entry, session):
+    """Nearest traded strike at or beyond bound (above for calls, below for puts) and its entry price."""
+    if option_type == 'CE':
+        candidates = strikes[strikes >= bound]
+    else:
+        candidates = strikes[strikes <= bound][::-1]
+    for strike in candidates:
+        price = book.price(option_type, strike, entry, session)
+        if not np.isnan(price) and price > 0:
+            return strike, price
+    return np.nan, np.nan
+
+def _leg_path(book, option_type, strike, stamps, since):
+    """Closes of a leg on the given minute stamps, carrying its last close since `since` forward."""
+    dates, closes = book.load(option_type, strike)
+    index = np.searchsorted(dates, stamps, side="right") - 1
+    valid = (index >= 0) & (dates[np.maximum(index, 0)] >= since)
+    return np.where(valid, closes[np.maximum(index, 0)], np.nan)
+
+def expiry_setups(underlying_folder, entry_time=ENTRY_TIME, otm_percent=OTM_PERCENT):
+    """
+
+    :param underlying_folder:   folder of one underlying's expiry folders (Eg : data/storage/options/index/nifty)
+    :param entry_time:          HH:MM of the entry minute on the opening day
+    :param otm_percent:         distance of the call/put strikes from spot, in percent
+
+    :return:                    (setups dataframe, straddle paths) - one row per tradable expiry with the
+                                entry, implied spot, strikes and prices; paths holds each expiry's minute
+                                stamps and straddle values from entry to the expiry day's close
+
+    """
+    expiries = sorted(name for name in os.listdir(underlying_folder)
+                      if re.fullmatch(r"\d{4}-\d{2}-\d{2}", name))
+    hours, minutes = map(int, entry_time.split(":"))
+
+    setups, paths = [], []
+    for previous_expiry, expiry in zip(expiries, expiries[1:]):
+        book = _Contracts(expiry_contracts(os.path.join(underlying_folder, expiry)))
+        strikes = np.array(sorted(set(book.contracts['CE']) & set(book.contracts['PE'])))
+        if len(strikes) < 2:
+            continue
+
+        # Opening day: first session after the previous expiry, taken from the middle strike's candles
+        dates, _ = book.load('CE', strikes[len(strikes) // 2])
+        days = np.unique(dates.astype("datetime64[D]"))
+        expiry_day = np.datetime64(expiry, "D")
+        opening = days[(days > np.datetime64(previous_expiry, "D")) & (days <= expiry_day)]
+        if not len(opening):
+            continue
+        session = opening[0].astype("datetime64[ns]")
+        entry = session + np.timedelta64(hours * 60 + minutes, "m")
+
+        spot = _implied_spot(book, strikes, entry, session)
+        if np.isnan(spot):
+            continue
+        call_strike, call_cost = _otm_leg(book, 'CE', strikes, spot * (1 + otm_percent / 100), entry, session)
+        put_strike, put_cost = _otm_leg(book, 'PE', strikes, spot * (1 - otm_percent / 100), entry, session)
+        if np.isnan(call_cost) or np.isnan(put_cost):
+            continue
+
+        # Straddle value on every minute either leg traded after entry, up to the expiry day's close
+        close = expiry_day.astype("datetime64[ns]") + np.timedelta64(1, "D")
+        stamps = np.union1d(*(book.load(option_type, strike)[0]
+                              for option_type, strike in (('CE', call_strike), ('PE', put_strike))))
+        stamps = stamps[(stamps > entry) & (stamps < close)]
+        if not len(stamps):
+            continue
+        value = _leg_path(book, 'CE', call_strike, stamps, session) + _leg_path(book, 'PE', put_strike, stamps, session)
+
+        setups.append({
+            'Expiry': expiry,
+            'Entry Date': opening[0],
+            'Entry Time': entry_time,
+            'Implied Spot': round(spot, 2),
+            'Call Strike': call_strike,
+            'Call Cost': call_cost,
+            'Put Strike': put_strike,
+            'Put Cost': put_cost,
+            'Total Cost': round(call_cost + put_cost, 2)
+        })
+        paths.append((stamps, value))
+
+    return pd.DataFrame(setups), paths
+
+def simulate_exits(setups, paths, target_multiple=TARGET_MULTIPLE):
+    """
+
+    :param setups:          setups dataframe from expiry_setups
+    :param paths:           straddle paths from expiry_setups, one per setup row
+    :param target_multiple: exit once the straddle is worth this multiple of its cost
+
+    :return:                trades dataframe - the setups with exit reason, time, value, P&L and the
+                            straddle's peak multiple of cost before exit
+
+    """
+    trades = setups.copy()
+    cost = setups['Total Cost'].to_numpy(dtype=float) if len(setups) else np.empty(0)
+    length = np.array([len(stamps) for stamps, _ in paths], dtype=np.intp)
+    width = int(length.max()) if len(length) else 1
+
+    # One row per expiry, one column per traded minute after entry
+    value = np.full((len(paths), width), np.nan)
+    stamps = np.full((len(paths), width), np.datetime64("NaT"), dtype="datetime64[ns]")
+    for row, (path_stamps, path_value) in enumerate(paths):
+        value[row, :len(path_value)] = path_value
+        stamps[row, :len(path_stamps)] = path_stamps
+
+    expiry_day = np.asarray(setups['Expiry'], dtype="datetime64[D]") if len(setups) else np.empty(0, "datetime64[D]")
+    on_expiry_day = stamps.astype("datetime64[D]") == expiry_day[:, None]
+
+    with np.errstate(invalid="ignore"):
+        target = value >= target_multiple * cost[:, None]
+        breakeven = on_expiry_day & (value >= cost[:, None])
+    rows = np.arange(len(paths))
+    last = np.maximum(length - 1, 0)
+
+    # Priority: target, then breakeven on the expiry day, then the expiry day's close
+    hit_target = target.any(axis=1)
+    hit_breakeven = ~hit_target & breakeven.any(axis=1)
+    exit_index = np.where(hit_target, target.argmax(axis=1), np.where(hit_breakeven, breakeven.argmax(axis=1), last))
+    exit_value = value[rows, exit_index]
+
+    # Last priced value if the final minute has a missing leg
+    exit_value = np.where(np.isnan(exit_value), pd.DataFrame(value).ffill(axis=1).to_numpy()[rows, exit_index], exit_value)
+
+    before_exit = np.arange(width) <= exit_index[:, None]
+    peak = np.nanmax(np.where(before_exit, value, np.nan), axis=1) if len(paths) else np.empty(0)
+
+    trades['Exit Reason'] = np.where(hit_target, 'Target', np.where(hit_breakeven, 'Breakeven', 'Expiry'))
+    trades['Exit Time'] = pd.DatetimeIndex(stamps[rows, exit_index]).strftime("%Y-%m-%d %H:%M")
+    trades['Exit Value'] = np.round(exit_value, 2)
+    trades['PnL'] = np.round(exit_value - cost, 2)
+    trades['Return Percentage'] = np.round((exit_value - cost) / cost * 100, 2)
+    trades['Peak Multiple'] = np.round(peak / cost, 2)
+    return trades
+
+def backtest(underlying_folder, entry_time=ENTRY_TIME, otm_percent=OTM_PERCENT, target_multiple=TARGET_MULTIPLE):
+    """Trades of every expiry of one underlying, see expiry_setups and simulate_exits."""
+    setups, paths = expiry_setups(underlying_folder, entry_time, otm_percent)
+    return simulate_exits(setups, paths, target_multiple)
+
+def summary(trades):
+    """Trade count, exit reason shares, win rate and return statistics."""
+    if trades.empty:
+        return {'Trades': 0}
+    returns = trades['Return Percentage']
+    reasons = trades['Exit Reason'].value_counts(normalize=True) * 100
+    return {
+        'Trades': len(trades),
+        'Target Percentage': round(float(reasons.get('Target', 0.0)), 2),
+        'Breakeven Percentage': round(float(reasons.get('Breakeven', 0.0)), 2),
+        'Expiry Percentage': round(float(reasons.get('Expiry', 0.0)), 2),
+        'Win Rate': round(float((trades['PnL'] > 0).mean()) * 100, 2),
+        'Average Return Percentage': round(float(returns.mean()), 2),
+        'Median Return Percentage': round(float(returns.median()), 2),
+        'Total PnL Points': round(float(trades['PnL'].sum()), 2)
+    }
+
+if __name__ == '__main__':
+
+    underlyings = [sys.argv[1].lower()] if len(sys.argv) > 1 else UNDERLYINGS
+    entry_time = sys.argv[2] if len(sys.argv) > 2 else ENTRY_TIME
+
+    os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+    for underlying in underlyings:
+
+        underlying_folder = os.path.join(OPTIONS_FOLDER, underlying)
+        if not os.path.isdir(underlying_folder):
+            print(f"No option candles for {underlying} in {OPTIONS_FOLDER}")
+            continue
+
+        trades_df = backtest(underlying_folder, entry_time)
+        csv_filename = os.path.join(OUTPUT_FOLDER, f"{underlying.upper()}_straddle_backtest_{entry_time.replace(':', '')}.csv")
+        trades_df.to_csv(csv_filename, index=False)
+
+        print(f"\n{underlying.upper()}: long straddle at {entry_time} on the opening day, "
+              f"{OTM_PERCENT}% OTM, target {TARGET_MULTIPLE}x\n")
+        for key, value in summary(trades_df).items():
+            print(f"{key:28}: {value}")
+        print(f"\nTrade details saved to: {csv_filename}")
@@ -0,0 +1,181 @@
+"""
+All start/end-day pairs of the RV study in one pass per symbol.
+
+build_cube reads a symbol's daily candles once and computes the absolute and
+peak change distributions (see README) for every Monday..Sunday x
+Monday..Sunday pair, plus fixed holding periods counted in trading sessions.
+The 1-100 percentile tables of all of them come out of a single quantile
+call and are kept as a compact float32 cube, so any entry-day/expiry-day
+combination the strategy needs is a lookup instead of a new analysis run.
+
+The weekday-pair windows are built by windows.study_windows, the same rule
+get_weekly_abs_changes uses (including its handling of holidays on the end
+day), so every pair agrees with the study table process_volatility_analysis
+produces.
+
+Usage:
+    python backtesting/rv_iv_analysis/weekday_matrix.py data/storage/processed/equity/zerodha/2015/day/0000_NIFTY.csv
+"""
+
+import os
+import sys
+import glob
+import numpy as np
+import pandas as pd
+
+# Add root directory to Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from backtesting.rv_iv_analysis.percentiles import PERCENTILES, percentile_table, stack
+from backtesting.rv_iv_analysis.cache import CACHE_FOLDER, METHOD_VERSION, fingerprint
+from backtesting.rv_iv_analysis.windows import DAYS, study_windows
+
+HOLDING_DAYS = np.arange(1, 21)     # Holding periods in trading sessions
+
+def _changes(close, high, low, start, end):
+    """Absolute and peak change percentages of the windows (start, end], rounded like get_weekly_abs_changes."""
+    base = close[start]
+    abs_change = np.round(np.abs((close[end] - base) / base) * 100, 2)
+
+    # Windows overlap, so reduce over interleaved (start, end] bounds and keep every other result;
+    # a window ending on its start session has no sessions to reduce over
+    bounds = np.empty(2 * len(start), dtype=np.intp)
+    bounds[0::2] = start + 1
+    bounds[1::2] = end + 1
+    if len(bounds):
+        empty = end <= start
+        peak_high = np.where(empty, np.nan, np.fmax.reduceat(np.append(high, np.nan), bounds)[0::2])
+        peak_low = np.where(empty, np.nan, np.fmin.reduceat(np.append(low, np.nan), bounds)[0::2])
+    else:
+        peak_high = peak_low = np.empty(0)
+    peak_high_change = np.round(np.abs((peak_high - base) / base) * 100, 2)
+    peak_low_change = np.round(np.abs((peak_low - base) / base) * 100, 2)
+    return abs_change, np.where(peak_low_change > peak_high_change, peak_low_change, peak_high_change)
+
+def build_cube(df, holding_days=HOLDING_DAYS):
+    """
+
+    :param df:              dataframe of daily candles with columns - Date, High, Low & Close
+    :param holding_days:    holding periods, in trading sessions, to tabulate besides the weekday pairs
+
+    :return:                dict of arrays -
+                                pairs           (7, 7, 2, 100) percentiles of [abs, peak] change per start x end day
+                                pair_counts     (7, 7) windows behind each pair
+                                holding_days    (H,) the holding periods
+                                holding         (H, 2, 100) percentiles of [abs, peak] change per holding period
+                                holding_counts  (H,) windows behind each holding period
+
+    """
+    df = df.sort_values("Date", kind="mergesort")
+    dates = pd.DatetimeIndex(pd.to_datetime(df["Date"])).tz_localize(None)
+    close = df["Close"].to_numpy(dtype=float)
+    high = df["High"].to_numpy(dtype=float)
+    low = df["Low"].to_numpy(dtype=float)
+    weekday = dates.dayofweek.to_numpy()
+    n = len(close)
+    tradable = close != 0
+    dates = dates.to_numpy(dtype="datetime64[ns]")
+
+    abs_changes, peak_changes = [], []
+    for start_num in range(7):
+        for end_num in range(7):
+            start, end = study_windows(dates, weekday, start_num, end_num, tradable)
+            abs_change, peak_change = _changes(close, high, low, start, end)
+            abs_changes.append(abs_change)
+            peak_changes.append(peak_change)
+
+    holding_days = np.asarray(holding_days, dtype=np.intp)
+    for days in holding_days:
+        start = np.flatnonzero(tradable[:max(n - days, 0)])
+        abs_change, peak_change = _changes(close, high, low, start, start + days)
+        abs_changes.append(abs_change)
+        peak_changes.append(peak_change)
+
+    # Every distribution's percentiles in one quantile call
+    counts = np.array([len(changes) for changes in abs_changes])
+    values = np.stack([stack(abs_changes), stack(peak_changes)], axis=1)
+    empty = counts == 0
+    values[empty] = 0.0
+    tables = percentile_table(values).astype(np.float32)
+    tables[empty] = np.nan
+
+    return {
+        'pairs': tables[:49].reshape(7, 7, 2, len(PERCENTILES)),
+        'pair_counts': counts[:49].reshape(7, 7),
+        'holding_days': holding_days,
+        'holding': tables[49:],
+        'holding_counts': counts[49:]
+    }
+
+def _table_frame(table, count):
+    return pd.DataFrame({
+        'Percentile': PERCENTILES,
+        'Abs Change Percentage': np.round(table[0].astype(float), 2),
+        'Peak Abs Change Percentage': np.round(table[1].astype(float), 2),
+        'Windows': count
+    })
+
+def lookup(cube, start_day, end_day):
+    """Percentile table (same columns as the study's csv) for one start/end-day pair."""
+    start_num, end_num = DAYS.index(start_day), DAYS.index(end_day)
+    return _table_frame(cube['pairs'][start_num, end_num], cube['pair_counts'][start_num, end_num])
+
+def holding_lookup(cube, days):
+    """Percentile table for a holding period of `days` trading sessions."""
+    index = np.flatnonzero(cube['holding_days'] == days)
+    if not len(index):
+        raise KeyError(f"No {days}-session holding period in the cube")
+    return _table_frame(cube['holding'][index[0]], cube['holding_counts'][index[0]])
+
+def cube_path(file_path, cache_folder=CACHE_FOLDER):
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    return os.path.join(cache_folder, f"{name}_cube_{fingerprint(file_path)}_v{METHOD_VERSION}.npz")
+
+def load_cube(file_path, holding_days=HOLDING_DAYS, cache_folder=CACHE_FOLDER):
+    """
+
+    :param file_path:   csv file with daily OHLCV data of one stock/index
+
+    :return:            the file's cube, read from the cache while the file is unchanged,
+                        otherwise built with build_cube and cached
+
+    """
+    path = cube_path(file_path, cache_folder)
+    if os.path.exists(path):
+        with np.load(path, allow_pickle=False) as entry:
+            cube = {key: entry[key] for key in entry.files}
+        if np.array_equal(cube['holding_days'], holding_days):
+            return cube
+
+    df = pd.read_csv(file_path)
+    df["Date"] = pd.to_datetime(df["Date"], errors="coerce", utc=True)
+    for col in ["Close", "High", "Low"]:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    df = df.dropna(subset=["Date", "Close", "High", "Low"])
+
+    cube = build_cube(df, holding_days)
+    os.makedirs(cache_folder, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez_compressed(f, **cube)
+    os.replace(tmp_path, path)
+
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    for stale in glob.glob(os.path.join(cache_folder, f"{glob.escape(name)}_cube_*.npz")):
+        if stale != path:
+            os.remove(stale)
+    return cube
+
+if __name__ == '__main__':
+
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    file_name = os.path.basename(sys.argv[1])
+    cube = load_cube(sys.argv[1])
+
+    # Median peak change for every start x end day pair
+    median = pd.DataFrame(cube['pairs'][:, :, 1, 49].round(2), index=DAYS, columns=DAYS)
+    print(f"Median Max Peak Change Percentage, {file_name[:-4]} (rows: start day, columns: end day)\n")
+    print(median.to_string())
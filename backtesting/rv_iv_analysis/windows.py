@@ -0,0 +1,76 @@
+"""
+Start/end-day windows of the RV study.
+
+Shared by get_weekly_abs_changes, weekday_matrix and intraday_path, so every
+tool measures exactly the same windows.
+
+A window starts at every start-day session with a non-zero close and ends at
+the first end-day session dated after it, if that session is no more than
+the pair's span (max_days) away. When it is further away (the end day was a
+holiday), the study's original rule applies: the window ends on the last
+session up to the end date of the previous window that found an end, and is
+dropped if there is no such session on or after its start. Such a window can
+end on its start session, in which case it has no sessions after the start.
+"""
+
+import numpy as np
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+def max_days(start_num, end_num):
+    """Calendar days from a start day to its end day (7 when they are the same weekday)."""
+    return (end_num - start_num) % 7 if end_num != start_num else 7
+
+def study_windows(dates, weekday, start_num, end_num, tradable=None):
+    """
+
+    :param dates:       sorted datetime64[ns] session dates (one per row)
+    :param weekday:     weekday number (Monday = 0) of every row
+    :param start_num:   weekday number of the start day
+    :param end_num:     weekday number of the end day
+    :param tradable:    optional boolean mask of rows that may start a window (Eg : Close != 0)
+
+    :return:            (start rows, end rows) of the windows, in start order
+
+    """
+    dates = np.asarray(dates, dtype="datetime64[ns]")
+    weekday = np.asarray(weekday)
+    span = max_days(start_num, end_num)
+
+    is_start = weekday == start_num
+    if tradable is not None:
+        is_start &= np.asarray(tradable, dtype=bool)
+    starts = np.flatnonzero(is_start)
+    ends = np.flatnonzero(weekday == end_num)
+
+    # First end-day row dated after each start
+    next_end = np.searchsorted(ends, np.searchsorted(dates, dates[starts], side="right"))
+    found = next_end < len(ends)
+    starts = starts[found]
+    end_rows = ends[next_end[found]]
+    in_time = (dates[end_rows] - dates[starts]) // np.timedelta64(1, "D") <= span
+    keep = in_time.copy()
+
+    # End day missing within the span: last row up to the previous window's end date
+    late = np.flatnonzero(~in_time)
+    if len(late):
+        on_time = np.flatnonzero(in_time)
+        last_late = None        # (index, end row) of the latest late window that found an end
+        for i in late:
+            j = np.searchsorted(on_time, i) - 1
+            candidates = []
+            if j >= 0:
+                candidates.append((on_time[j], end_rows[on_time[j]]))
+            if last_late is not None:
+                candidates.append(last_late)
+            if not candidates:
+                continue
+            previous_end = dates[max(candidates)[1]]
+            last_row = np.searchsorted(dates, previous_end, side="right") - 1
+            if last_row < np.searchsorted(dates, dates[starts[i]], side="left"):
+                continue
+            end_rows[i] = np.searchsorted(dates, dates[last_row], side="left")
+            keep[i] = True
+            last_late = (i, end_rows[i])
+
+    return starts[keep], end_rows[keep]
@@ -0,0 +1,192 @@
+"""
+Vectorized market-depth signals for the scalper.
+
+The latest depth of every scanned stock lives in aligned numpy arrays
+(ltp, tbq, tsq, bq1..5, sq1..5) indexed through a token-to-row map, so the
+pressure ratios, top-5 depth sums, threshold masks and the best candidate
+are each computed in one pass over the whole universe.
+
+The arrays are preallocated when the universe is loaded and every tick,
+including Shoonya's partial delta updates, is written into them in place.
+Each tick re-scores only its own row (signal_at); the vectorized pass
+(candidates) rebuilds the whole candidate ranking at once, e.g. after the
+universe is resubscribed once a trade completes.
+"""
+
+import numpy as np
+
+DEPTH_LEVELS = 5
+
+BUY = 1
+SELL = -1
+NO_SIGNAL = 0
+
+DIRECTIONS = {BUY: 'B', SELL: 'S'}
+
+# Integer tick fields and their column in DepthSnapshot.qty
+QTY_FIELDS = (('tbq', 'tsq')
+              + tuple(f"bq{level}" for level in range(1, DEPTH_LEVELS + 1))
+              + tuple(f"sq{level}" for level in range(1, DEPTH_LEVELS + 1)))
+QTY_COLUMNS = {field: col for col, field in enumerate(QTY_FIELDS)}
+
+# Bit per field (lp plus QTY_FIELDS); a row is usable once every bit has been seen
+_LTP_BIT = 1 << len(QTY_FIELDS)
+_ALL_FIELDS = (_LTP_BIT << 1) - 1
+
+
+class DepthSnapshot:
+    """
+    Latest market depth per token, one row per token.
+
+    :param tokens:  tokens in the order of the scanned stock DataFrame
+    """
+
+    def __init__(self, tokens):
+        self.tokens = [str(token) for token in tokens]
+        self.rows = {token: row for row, token in enumerate(self.tokens)}
+
+        n = len(self.tokens)
+        self.ltp = np.full(n, np.nan)
+        self.qty = np.zeros((n, len(QTY_FIELDS)), dtype=np.int64)
+        self.seen = np.zeros(n, dtype=np.int64)     # Bitmask of fields received so far
+        self.valid = np.zeros(n, dtype=bool)        # Row has received complete depth
+        self.enabled = np.ones(n, dtype=bool)       # Row may still be traded today
+
+        # Named views into qty, so signal code reads like the tick fields
+        self.tbq = self.qty[:, 0]
+        self.tsq = self.qty[:, 1]
+        self.bq = self.qty[:, 2:2 + DEPTH_LEVELS]
+        self.sq = self.qty[:, 2 + DEPTH_LEVELS:2 + 2 * DEPTH_LEVELS]
+
+    def update(self, token, tick_data):
+        """
+        Apply a full or partial depth tick in place and return its row.
+
+        Only the fields present in the tick are written, so delta updates that
+        follow the first SNAPQUOTE snapshot are kept. Raises KeyError for tokens
+        outside the universe and ValueError/TypeError on malformed numbers.
+        """
+        row = self.rows[token]
+        qty = self.qty
+        seen = int(self.seen[row])
+
+        for field, value in tick_data.items():
+            col = QTY_COLUMNS.get(field)
+            if col is not None:
+                qty[row, col] = int(value)
+                seen |= 1 << col
+            elif field == 'lp':
+                self.ltp[row] = float(value)
+                seen |= _LTP_BIT
+
+        if seen != self.seen[row]:
+            self.seen[row] = seen
+            self.valid[row] = seen == _ALL_FIELDS
+        return row
+
+    def set_row(self, row, ltp, qty, seen):
+        """
+        Overwrite a row with an already forward-filled depth state.
+
+        Used when replaying compiled sessions, whose records hold the full
+        depth after each tick plus the bitmask of fields seen so far.
+        """
+        self.ltp[row] = ltp
+        self.qty[row] = qty
+        if seen != self.seen[row]:
+            self.seen[row] = seen
+            self.valid[row] = seen == _ALL_FIELDS
+
+    def reset(self, keep=()):
+        """
+        Forget the depth of every row except the tokens in keep, e.g. after
+        the universe was unsubscribed for a trade; rows become valid again
+        once the resubscribed feed has sent their full depth.
+        """
+        stale = np.ones(len(self.tokens), dtype=bool)
+        for token in keep:
+            row = self.rows.get(str(token))
+            if row is not None:
+                stale[row] = False
+        self.ltp[stale] = np.nan
+        self.qty[stale] = 0
+        self.seen[stale] = 0
+        self.valid[stale] = False
+
+    def disable(self, tokens):
+        """Exclude tokens (e.g. margin shortfall rejections) from further signals."""
+        for token in tokens:
+            row = self.rows.get(str(token))
+            if row is not None:
+                self.enabled[row] = False
+
+    def enable(self, tokens):
+        """Allow signals again for tokens, e.g. once their position is flat."""
+        for token in tokens:
+            row = self.rows.get(str(token))
+            if row is not None:
+                self.enabled[row] = True
+
+    def signals(self, lower, upper, multiplier):
+        """
+        Compute the trade direction and dominance for every row.
+
+        :param lower:       PRESSURE_LOWER_BOUND
+        :param upper:       PRESSURE_UPPER_BOUND
+        :param multiplier:  DEPTH_MULTIPLIER
+
+        :return:            (direction, dominant_percent) arrays; direction is
+                            BUY, SELL or NO_SIGNAL and dominance is NaN without a signal
+        """
+        tq = self.tbq + self.tsq
+        with np.errstate(divide='ignore', invalid='ignore'):
+            bp = np.round(self.tbq / tq, 2)     # Buy pressure ratio
+            sp = np.round(self.tsq / tq, 2)     # Sell pressure ratio
+
+        top5bq = self.bq.sum(axis=1)
+        top5sq = self.sq.sum(axis=1)
+
+        usable = self.valid & self.enabled & (tq > 0)
+        buy = usable & (bp > lower) & (bp < upper) & (top5bq > top5sq * multiplier)
+        sell = usable & ~buy & (sp > lower) & (sp < upper) & (top5sq > top5bq * multiplier)
+
+        direction = np.where(buy, BUY, np.where(sell, SELL, NO_SIGNAL)).astype(np.int8)
+        dominant = np.where(buy, bp, np.where(sell, sp, np.nan))
+        return direction, dominant
+
+    def signal_at(self, row, lower, upper, multiplier):
+        """
+        Scalar version of signals() for a single row, used on every tick.
+
+        :return:    (direction, dominant_percent) with direction 'B' or 'S', or None
+        """
+        if not (self.valid[row] and self.enabled[row]):
+            return None
+
+        tbq = int(self.tbq[row])
+        tsq = int(self.tsq[row])
+        tq = tbq + tsq
+        if tq <= 0:
+            return None
+
+        bp = round(tbq / tq, 2)
+        sp = round(tsq / tq, 2)
+        top5bq = int(self.bq[row].sum())
+        top5sq = int(self.sq[row].sum())
+
+        if upper > bp > lower and top5bq > top5sq * multiplier:
+            return 'B', bp
+        if upper > sp > lower and top5sq > top5bq * multiplier:
+            return 'S', sp
+        return None
+
+    def candidates(self, lower, upper, multiplier):
+        """
+        Every qualifying row from one vectorized pass, for SignalRanking.rebuild.
+
+        :return:    list of (row, direction, dominant_percent), direction 'B' or 'S'
+        """
+        direction, dominant = self.signals(lower, upper, multiplier)
+        rows = np.flatnonzero(direction)
+        return [(row, DIRECTIONS[side], percent) for row, side, percent
+                in zip(rows.tolist(), direction[rows].tolist(), dominant[rows].tolist())]
@@ -0,0 +1,179 @@
+"""
+Stage latency instrumentation for the scalper's tick-to-order path.
+
+Timestamps come from time.perf_counter_ns(). Each measured span (for example
+tick receipt to place_order) feeds a fixed-size histogram with geometric
+buckets, so recording is O(1), memory stays constant over the session and
+p50/p99 can be read at any time without keeping raw samples.
+"""
+
+import math
+import json
+import time
+import logging
+import threading
+
+MIN_NS = 1_000               # Smallest bucket edge, 1 microsecond
+MAX_NS = 60_000_000_000      # Anything slower lands in the last bucket
+BUCKET_RATIO = 1.05          # Neighbouring edges differ by 5%, the percentile resolution
+STAMP_TTL_NS = 60_000_000_000    # Stamps and joins not closed within a minute are dropped
+PRUNE_EVERY_NS = 1_000_000_000   # Minimum gap between sweeps for expired stamps
+
+# Spans recorded by the scalper, in pipeline order
+SPANS = (
+    'tick_to_signal',        # Feed callback: tick receipt to signal computed
+    'tick_to_submit',        # Receipt of the chosen token's last tick to place_order call
+    'submit_to_ack',         # place_order round trip until the order number comes back
+    'ack_to_update',         # Order number to its first order-update event (0 if the event came first)
+    'submit_to_update',      # place_order call to the order's first order-update event
+    'fill_to_sl_modify',     # Entry fill event to the first trailing modify_order
+    'modify_to_ack',         # modify_order round trip
+)
+
+
+def now():
+    """High-resolution monotonic timestamp in nanoseconds."""
+    return time.perf_counter_ns()
+
+
+class LatencyHistogram:
+    """Log-bucketed histogram of durations in nanoseconds."""
+
+    _LOG_RATIO = math.log(BUCKET_RATIO)
+    _BUCKETS = int(math.log(MAX_NS / MIN_NS) / math.log(BUCKET_RATIO)) + 2
+
+    def __init__(self):
+        self.counts = [0] * self._BUCKETS
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, ns):
+        if ns < MIN_NS:
+            index = 0
+        else:
+            index = min(int(math.log(ns / MIN_NS) / self._LOG_RATIO) + 1, self._BUCKETS - 1)
+        self.counts[index] += 1
+        self.count += 1
+        self.total += ns
+        if ns > self.max:
+            self.max = ns
+
+    def percentile(self, q):
+        """Upper edge of the bucket holding the q-th percentile (0-100), in ns."""
+        if not self.count:
+            return None
+        rank = math.ceil(self.count * q / 100) or 1
+        seen = 0
+        for index, bucket in enumerate(self.counts):
+            seen += bucket
+            if seen >= rank:
+                return min(MIN_NS * BUCKET_RATIO ** index, self.max)
+        return self.max
+
+
+class LatencyTracker:
+    """
+    Per-span latency histograms plus pending stage stamps keyed by order or token.
+
+    Spans are recorded either directly from two timestamps (record), by
+    stamping the start of a stage under a key and closing it later from
+    another callback (stamp / close), or by joining a start and an end that
+    may arrive in either order (join). Stamps and joins that are never
+    closed expire after STAMP_TTL_NS.
+    """
+
+    def __init__(self, spans=SPANS):
+        self._hists = {span: LatencyHistogram() for span in spans}
+        self._stamps = {}        # (key, stage) -> start ns
+        self._joins = {}         # (key, span) -> [start ns, end ns, created ns], start/end None until known
+        self._last_prune = now()
+        self._lock = threading.Lock()
+
+    def record(self, span, start_ns, end_ns=None):
+        """Add the duration from start_ns to end_ns (default now) to a span."""
+        elapsed = (now() if end_ns is None else end_ns) - start_ns
+        with self._lock:
+            hist = self._hists.get(span)
+            if hist is None:
+                hist = self._hists[span] = LatencyHistogram()
+            hist.add(elapsed)
+
+    def _prune(self, current_ns):
+        # Caller holds the lock
+        if current_ns - self._last_prune < PRUNE_EVERY_NS:
+            return
+        self._last_prune = current_ns
+        expired = current_ns - STAMP_TTL_NS
+        self._stamps = {key: ns for key, ns in self._stamps.items() if ns >= expired}
+        self._joins = {key: entry for key, entry in self._joins.items() if entry[2] >= expired}
+
+    def stamp(self, key, stage, ns=None):
+        """Remember when a stage started for key, unless already stamped."""
+        current_ns = now()
+        with self._lock:
+            self._prune(current_ns)
+            self._stamps.setdefault((key, stage), current_ns if ns is None else ns)
+
+    def join(self, key, span, start_ns=None, end_ns=None):
+        """
+        Give the start or the end of a span for key; the span is recorded by
+        whichever call comes second, and only the first end counts.
+
+        An end earlier than its start (Eg : an order update that beats the
+        place_order response) is recorded as 0.
+        """
+        current_ns = now()
+        with self._lock:
+            self._prune(current_ns)
+            entry = self._joins.setdefault((key, span), [None, None, current_ns])
+            if entry[0] is None and start_ns is not None:
+                entry[0] = start_ns
+            elif entry[1] is None and end_ns is not None:
+                entry[1] = end_ns
+            else:
+                return
+            if entry[0] is None or entry[1] is None:
+                return
+            elapsed = max(entry[1] - entry[0], 0)
+            entry[0] = entry[1] = 0      # Closed; kept until it expires so later ends are ignored
+        self.record(span, 0, elapsed)
+
+    def close(self, key, stage, span, end_ns=None):
+        """Record span from the stamp of (key, stage) and drop the stamp; no-op if absent."""
+        with self._lock:
+            start_ns = self._stamps.pop((key, stage), None)
+        if start_ns is not None:
+            self.record(span, start_ns, end_ns)
+
+    def summary(self):
+        """{span: {'count', 'p50_ms', 'p99_ms', 'mean_ms', 'max_ms'}} for spans with samples."""
+        with self._lock:
+            stats = {}
+            for span, hist in self._hists.items():
+                if not hist.count:
+                    continue
+                stats[span] = {
+                    'count': hist.count,
+                    'p50_ms': round(hist.percentile(50) / 1e6, 3),
+                    'p99_ms': round(hist.percentile(99) / 1e6, 3),
+                    'mean_ms': round(hist.total / hist.count / 1e6, 3),
+                    'max_ms': round(hist.max / 1e6, 3)
+                }
+            return stats
+
+    def log_summary(self):
+        for span, stats in self.summary().items():
+            logging.info(f"Latency {span}: n={stats['count']} p50={stats['p50_ms']}ms "
+                         f"p99={stats['p99_ms']}ms max={stats['max_ms']}ms")
+
+    def dump(self, path):
+        """Write the summary to a JSON file and log it, e.g. at session end."""
+        summary = self.summary()
+        try:
+            with open(path, 'w') as f:
+                json.dump(summary, f, indent=2)
+        except Exception as e:
+            logging.error(f"Error writing latency summary to {path}: {e}")
+        self.log_summary()
+        return summary
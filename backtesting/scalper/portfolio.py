@@ -0,0 +1,174 @@
+"""
+Multi-position mode for the scalper.
+
+Each open position is supervised by its own lightweight PositionTask thread
+that shares the quote cache and the local order book. A task watches its
+entry until it fills, is rejected or goes stale (then cancels it), and
+releases its slot once the instrument is flat with no live orders left.
+Stops are trailed by the shared TrailingStopEngine, so a slow REST call for
+one position never holds up another position's stop.
+
+Portfolio enforces the caps on open positions, entry exposure and day MTM
+before the bot is allowed to open another trade.
+"""
+
+import logging
+import threading
+
+from backtesting.scalper.strategy import (
+    MAX_OPEN_POSITIONS, MAX_EXPOSURE, STOP_LOSS, TAKE_PROFIT, entry_is_stale
+)
+
+POLL_INTERVAL = 0.1         # Longest a task sleeps without an order event
+ENTRY_TIMEOUT = 2.0         # Wait for the entry's first event before asking REST
+
+LIVE_STATUSES = {'OPEN', 'PENDING', 'TRIGGER_PENDING'}
+
+
+class PositionTask(threading.Thread):
+    """
+    Supervises one position from its entry order until it is flat.
+
+    :param portfolio:   owning Portfolio, notified when the task ends
+    :param orderno:     entry order number
+    :param notional:    entry value reserved against the exposure cap
+    """
+
+    def __init__(self, portfolio, orderno, exchange, token, tsym, notional):
+        super().__init__(name=f'position-{tsym}', daemon=True)
+        self.portfolio = portfolio
+        self.orderno = orderno
+        self.exchange = exchange
+        self.token = str(token)
+        self.tsym = tsym
+        self.notional = notional
+        self.filled = False
+        self.cancel_sent = False    # Stale entry cancel acknowledged, waiting for its event
+        self._stop = threading.Event()
+
+    @property
+    def key(self):
+        return f"{self.exchange}|{self.token}"
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self):
+        orders = self.portfolio.orders
+        try:
+            if orders.wait_for_order(self.orderno, timeout=ENTRY_TIMEOUT) is None:
+                logging.info(f"Entry {self.orderno} for {self.tsym} unknown to the broker")
+                return
+            while not self._stop.is_set():
+                if self._step(orders):
+                    break
+                orders.wait_for_update(timeout=POLL_INTERVAL)
+        except Exception as e:
+            logging.error(f"Position task for {self.tsym} failed: {e}")
+        finally:
+            self.portfolio._release(self)
+
+    def _step(self, orders):
+        """One supervision pass; returns True once the position is done."""
+        instrument_orders = orders.orders_for(self.exchange, self.token)
+        entry = next((o for o in instrument_orders if o.get('norenordno') == self.orderno), None)
+        if entry is None:
+            return False    # Dropped by a reconcile in flight, back on the next one
+
+        status = entry.get('status')
+        if status == 'COMPLETE':
+            self.filled = True
+        elif status in ('REJECTED', 'CANCELED'):
+            logging.info(f"Entry {self.orderno} for {self.tsym} {status.lower()}: "
+                         f"{entry.get('rejreason', '')}")
+            return True
+        elif status == 'OPEN':
+            if self.cancel_sent:
+                return False
+            ltp = self.portfolio.quotes.ltp(self.exchange, self.token)
+            if entry_is_stale(entry.get('trantype'), float(entry.get('prc') or 0), ltp):
+                if self.portfolio.api.cancel_order(orderno=self.orderno):
+                    self.cancel_sent = True
+                    logging.info(f"Cancelled unfilled entry {self.orderno} for {self.tsym}")
+                else:
+                    logging.warning(f"Cancel of unfilled entry {self.orderno} for {self.tsym} failed, retrying")
+            return False
+
+        live = any(o.get('status') in LIVE_STATUSES for o in instrument_orders)
+        return self.filled and not live and orders.net_qty(self.exchange, self.token) == 0
+
+
+class Portfolio:
+    """
+    Open positions and the caps that gate new entries.
+
+    :param api:             NorenApi-like client used to cancel stale entries
+    :param orders:          shared OrderBook
+    :param quotes:          shared QuoteCache
+    :param on_close:        optional callback(task) run when a position is done
+    """
+
+    def __init__(self, api, orders, quotes, max_positions=MAX_OPEN_POSITIONS,
+                 max_exposure=MAX_EXPOSURE, stop_loss=STOP_LOSS, take_profit=TAKE_PROFIT,
+                 on_close=None):
+        self.api = api
+        self.orders = orders
+        self.quotes = quotes
+        self.max_positions = max_positions
+        self.max_exposure = max_exposure
+        self.stop_loss = stop_loss
+        self.take_profit = take_profit
+        self.on_close = on_close
+
+        self._tasks = {}                    # "EXCH|TOKEN" -> PositionTask
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    def __len__(self):
+        return len(self._tasks)
+
+    @property
+    def exposure(self):
+        with self._lock:
+            return sum(task.notional for task in self._tasks.values())
+
+    def can_open(self, notional):
+        """True if one more position of this notional fits every cap."""
+        with self._lock:
+            if len(self._tasks) >= self.max_positions:
+                return False
+            if sum(task.notional for task in self._tasks.values()) + notional > self.max_exposure:
+                return False
+        return self.stop_loss < self.orders.day_mtm() < self.take_profit
+
+    def open(self, orderno, exchange, token, tsym, notional):
+        """Start supervising a just-placed entry."""
+        task = PositionTask(self, orderno, exchange, token, tsym, notional)
+        with self._lock:
+            self._tasks[task.key] = task
+            self._changed.notify_all()
+        task.start()
+        return task
+
+    def _release(self, task):
+        with self._lock:
+            if self._tasks.get(task.key) is task:
+                del self._tasks[task.key]
+            self._changed.notify_all()
+        if self.on_close is not None:
+            try:
+                self.on_close(task)
+            except Exception as e:
+                logging.error(f"Position close callback for {task.tsym} failed: {e}")
+
+    def wait_for_change(self, timeout=None):
+        """Block until a position opens or closes, or the timeout."""
+        with self._lock:
+            return self._changed.wait(timeout)
+
+    def stop_all(self):
+        """Ask every task to stop supervising, e.g. at shutdown."""
+        with self._lock:
+            tasks = list(self._tasks.values())
+        for task in tasks:
+            task.stop()
@@ -0,0 +1,125 @@
+"""
+Incremental ranking of scalper entry candidates.
+
+Each websocket tick changes one token, so instead of rescanning and sorting
+the whole universe the feed callback recomputes that token's signal and
+updates an indexed max-heap of qualifying candidates. The strongest
+candidate is then always at the top of the heap.
+"""
+
+import heapq
+import threading
+
+
+class SignalRanking:
+    """
+    Indexed max-heap of (dominant_percent, row, direction) entries.
+
+    Ties on dominance go to the lowest row, matching a full rescan. All
+    methods are thread safe: the feed thread updates, the strategy reads.
+    """
+
+    def __init__(self):
+        self._heap = []          # [(-dominant_percent, row, direction)]
+        self._pos = {}           # row -> index in self._heap
+        self._lock = threading.Lock()
+        self.ready = threading.Event()      # Set while at least one candidate qualifies
+
+    def __len__(self):
+        return len(self._heap)
+
+    def update(self, row, signal):
+        """Insert, move or drop a row; signal is (direction, dominant_percent) or None."""
+        with self._lock:
+            if signal is None:
+                self._remove(row)
+            else:
+                direction, dominant = signal
+                entry = (-dominant, row, direction)
+                idx = self._pos.get(row)
+                if idx is None:
+                    self._heap.append(entry)
+                    self._pos[row] = len(self._heap) - 1
+                    self._sift_up(len(self._heap) - 1)
+                else:
+                    old = self._heap[idx]
+                    self._heap[idx] = entry
+                    if entry < old:
+                        self._sift_up(idx)
+                    else:
+                        self._sift_down(idx)
+
+            if self._heap:
+                self.ready.set()
+            else:
+                self.ready.clear()
+
+    def remove(self, row):
+        """Drop a row from the ranking, e.g. after a margin shortfall rejection."""
+        self.update(row, None)
+
+    def rebuild(self, candidates):
+        """
+        Replace every entry with (row, direction, dominant_percent) candidates
+        from a full rescan (DepthSnapshot.candidates), heapified in one pass.
+        """
+        with self._lock:
+            self._heap = [(-dominant, row, direction) for row, direction, dominant in candidates]
+            heapq.heapify(self._heap)
+            self._pos = {entry[1]: idx for idx, entry in enumerate(self._heap)}
+            if self._heap:
+                self.ready.set()
+            else:
+                self.ready.clear()
+
+    def best(self):
+        """Return (row, direction, dominant_percent) of the top candidate, or None."""
+        with self._lock:
+            if not self._heap:
+                return None
+            key, row, direction = self._heap[0]
+            return row, direction, -key
+
+    def wait(self, timeout=None):
+        """Block until a candidate qualifies; returns False on timeout."""
+        return self.ready.wait(timeout)
+
+    def _remove(self, row):
+        idx = self._pos.pop(row, None)
+        if idx is None:
+            return
+        last = self._heap.pop()
+        if idx < len(self._heap):
+            self._heap[idx] = last
+            self._pos[last[1]] = idx
+            self._sift_up(idx)
+            self._sift_down(self._pos[last[1]])
+
+    def _swap(self, i, j):
+        heap = self._heap
+        heap[i], heap[j] = heap[j], heap[i]
+        self._pos[heap[i][1]] = i
+        self._pos[heap[j][1]] = j
+
+    def _sift_up(self, idx):
+        heap = self._heap
+        while idx > 0:
+            parent = (idx - 1) // 2
+            if heap[idx] < heap[parent]:
+                self._swap(idx, parent)
+                idx = parent
+            else:
+                break
+
+    def _sift_down(self, idx):
+        heap = self._heap
+        n = len(heap)
+        while True:
+            smallest = idx
+            for child in (2 * idx + 1, 2 * idx + 2):
+                if child < n and heap[child] < heap[smallest]:
+                    smallest = child
+            if smallest == idx:
+                break
+            self._swap(idx, smallest)
+            idx = smallest
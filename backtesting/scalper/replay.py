@@ -0,0 +1,393 @@
+"""
+Faster-than-real-time tick replay backtester for the scalper.
+
+Recorded depth ticks (see broker/shoonya/tick_recorder.py) are fed through
+the same DepthSnapshot/SignalRanking signal pipeline and the same strategy
+rules as the live bot (strategy.py) on a simulated clock taken from the tick
+receive times. A simple fill model stands in for the broker:
+
+    - entries are market orders filled on the first tick of the token that
+      arrives at least latency_ms after the decision, slipped by slippage_ticks
+    - each entry gets the live bot's bracket: an SL-MKT stop at SL_PERCENT,
+      trailed with TRAILING_STEP exactly like manage_position (no target leg
+      is sent live, so none is modelled)
+    - the stop fills at the triggering tick's LTP (minus slippage)
+    - day MTM above TAKE_PROFIT flattens the book; at or below STOP_LOSS no new
+      trades are opened; anything still open is squared off at the last tick
+
+Once no more entries are possible only the open position's ticks are decoded,
+so a full recorded day replays in seconds.
+
+Sessions can also be compiled once (compile_session) into a .npy record array
+holding the forward-filled depth after every universe tick. Replaying a
+compiled session skips JSON decoding entirely, and the file can be opened
+memory-mapped, so the parameter sweep (sweep.py) shares one copy between its
+worker processes.
+
+Usage:
+    python backtesting/scalper/replay.py tradable_equity.csv data/storage/raw/ticks/*.ticks
+"""
+
+import os
+import sys
+import time
+import hashlib
+import logging
+from itertools import chain
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from broker.shoonya.tick_recorder import read_ticks
+from backtesting.scalper.depth_signal import DepthSnapshot, QTY_FIELDS
+from backtesting.scalper.ranking import SignalRanking
+from backtesting.scalper.strategy import DEFAULT_PARAMS, bracket_points, trailed_price
+
+IST = timezone(timedelta(hours=5, minutes=30))
+MARKET_OPEN = "09:15:01"     # First moment the live bot looks for trades
+DEFAULT_TICK_SIZE = 0.05
+
+COMPILED_FOLDER = os.path.join('data', 'storage', 'raw', 'ticks', 'compiled')
+COMPILED_VERSION = 1         # Bump when COMPILED_DTYPE or the compile rules change
+COMPILE_CHUNK = 1_000_000    # Records buffered per chunk while compiling
+REPLAY_CHUNK = 65_536        # Records converted to Python values at a time when replaying
+
+# One record per universe tick: the token's full depth as it stood after the tick
+COMPILED_DTYPE = np.dtype([
+    ('recv_ns', np.int64),
+    ('row', np.int32),
+    ('seen', np.int32),
+    ('ltp', np.float64),
+    ('qty', np.int64, (len(QTY_FIELDS),))
+])
+
+
+def _ns_at(day, hhmmss):
+    """Epoch nanoseconds of an IST wall-clock time on the given date."""
+    clock = datetime.strptime(hhmmss, "%H:%M:%S").time()
+    return int(datetime.combine(day, clock, tzinfo=IST).timestamp() * 1_000_000_000)
+
+
+def _fmt_ns(ns):
+    return datetime.fromtimestamp(ns / 1e9, tz=IST).strftime("%H:%M:%S.%f")[:-3]
+
+
+class ScalperReplay:
+    """
+    Replay one or more recorded sessions through the scalper logic.
+
+    :param universe:        DataFrame with TOKEN, Trading Symbol and Tick Size columns
+    :param params:          overrides for strategy.DEFAULT_PARAMS
+    :param qty:             shares per trade
+    :param latency_ms:      simulated signal-to-fill delay
+    :param slippage_ticks:  adverse ticks applied to market fills
+    :param market_open:     IST time from which entries are allowed
+    """
+
+    def __init__(self, universe, params=None, qty=1, latency_ms=0.0, slippage_ticks=0,
+                 market_open=MARKET_OPEN):
+        self.params = dict(DEFAULT_PARAMS, **(params or {}))
+        self.qty = qty
+        self.latency_ns = int(latency_ms * 1_000_000)
+        self.slippage_ticks = slippage_ticks
+        self.market_open = market_open
+
+        universe = universe.dropna(subset=['TOKEN']).reset_index(drop=True)
+        self.tokens = universe['TOKEN'].astype(int).astype(str).tolist()
+        self.symbols = universe['Trading Symbol'].tolist() if 'Trading Symbol' in universe else self.tokens
+        if 'Tick Size' in universe:
+            self.tick_sizes = pd.to_numeric(universe['Tick Size'], errors='coerce').fillna(DEFAULT_TICK_SIZE).tolist()
+        else:
+            self.tick_sizes = [DEFAULT_TICK_SIZE] * len(self.tokens)
+
+    def run(self, sessions):
+        """
+        Replay sessions, each a list of tick files recorded in one session or
+        a compiled record array (see load_compiled) built for this universe.
+
+        :return:    (trades DataFrame, summary dict)
+        """
+        trades = []
+        ticks = 0
+        simulated_ns = 0
+        started = time.perf_counter()
+
+        for paths in sessions:
+            day_trades, day_ticks, day_span = self._run_day(paths)
+            trades.extend(day_trades)
+            ticks += day_ticks
+            simulated_ns += day_span
+
+        wall = time.perf_counter() - started
+        trades_df = pd.DataFrame(trades)
+        summary = {
+            'sessions': len(sessions),
+            'trades': len(trades_df),
+            'pnl': round(float(trades_df['pnl'].sum()), 2) if len(trades_df) else 0.0,
+            'ticks_processed': ticks,
+            'wall_seconds': round(wall, 3),
+            'speedup': round(simulated_ns / 1e9 / wall, 1) if wall > 0 else None
+        }
+        return trades_df, summary
+
+    def _slipped(self, price, side, tick_size):
+        adjust = self.slippage_ticks * tick_size
+        return round(price + adjust if side == 'B' else price - adjust, 2)
+
+    def _run_day(self, session):
+        depth = DepthSnapshot(self.tokens)
+        held = {'row': None}    # Set once only the open position's ticks matter
+        if isinstance(session, np.ndarray):
+            events = self._compiled_events(depth, session, held)
+        else:
+            events = self._tick_events(depth, session, held)
+        return self._simulate(depth, events, held)
+
+    def _tick_events(self, depth, paths, held):
+        """Decode recorded ticks into depth; yields (recv_ns, row) per universe tick."""
+        rows = depth.rows
+        pattern = []
+
+        # Decode every record while entries are possible, then only the held token's
+        def want(payload):
+            if held['row'] is None:
+                return True
+            if not pattern:
+                pattern.append(f'"tk":"{self.tokens[held["row"]]}"'.encode())
+            return pattern[0] in payload
+
+        for recv_ns, tick in chain.from_iterable(read_ticks(path, want) for path in paths):
+            row = rows.get(tick.get('tk'))
+            if row is None:
+                continue
+            try:
+                depth.update(tick['tk'], tick)
+            except (ValueError, TypeError):
+                continue
+            yield recv_ns, row
+
+    def _compiled_events(self, depth, records, held):
+        """Copy compiled records into depth; yields (recv_ns, row) per record."""
+        n = len(records)
+        recv = records['recv_ns']
+        rows = records['row']
+        seen = records['seen']
+        ltp = records['ltp']
+        qty = records['qty']
+
+        start = 0
+        while start < n:
+            if held['row'] is not None:
+                row = held['row']
+                for i in (np.flatnonzero(rows[start:] == row) + start).tolist():
+                    depth.set_row(row, float(ltp[i]), qty[i], int(seen[i]))
+                    yield int(recv[i]), row
+                return
+
+            stop = min(start + REPLAY_CHUNK, n)
+            chunk = zip(recv[start:stop].tolist(), rows[start:stop].tolist(),
+                        ltp[start:stop].tolist(), seen[start:stop].tolist())
+            for i, (recv_ns, row, row_ltp, row_seen) in enumerate(chunk, start):
+                depth.set_row(row, row_ltp, qty[i], row_seen)
+                yield recv_ns, row
+                if held['row'] is not None:
+                    stop = i + 1
+                    break
+            start = stop
+
+    def _simulate(self, depth, events, held):
+        p = self.params
+        ranking = SignalRanking()
+
+        trades = []
+        realized = 0.0
+        trade_count = 0
+        pending = None          # (row, direction, fill_not_before_ns, decision_ns)
+        position = None
+        open_ns = cutoff_ns = None
+        first_ns = last_ns = None
+        ticks = 0
+
+        def close_position(price, ns, reason):
+            nonlocal position, realized
+            sign = 1 if position['direction'] == 'B' else -1
+            pnl = round((price - position['entry_price']) * sign * self.qty, 2)
+            realized += pnl
+            trades.append({
+                'symbol': self.symbols[position['row']],
+                'token': self.tokens[position['row']],
+                'direction': position['direction'],
+                'signal_time': _fmt_ns(position['decision_ns']),
+                'entry_time': _fmt_ns(position['entry_ns']),
+                'entry_price': position['entry_price'],
+                'exit_time': _fmt_ns(ns),
+                'exit_price': round(price, 2),
+                'exit_reason': reason,
+                'qty': self.qty,
+                'pnl': pnl
+            })
+            position = None
+
+        for recv_ns, row in events:
+            ticks += 1
+
+            if first_ns is None:
+                first_ns = recv_ns
+                day = datetime.fromtimestamp(recv_ns / 1e9, tz=IST).date()
+                open_ns = _ns_at(day, self.market_open)
+                cutoff_ns = _ns_at(day, p['ENTRY_CUTOFF'])
+            last_ns = recv_ns
+
+            if held['row'] is None:
+                ranking.update(row, depth.signal_at(row, p['PRESSURE_LOWER_BOUND'],
+                                                    p['PRESSURE_UPPER_BOUND'], p['DEPTH_MULTIPLIER']))
+            ltp = float(depth.ltp[row])
+            tick_size = self.tick_sizes[row]
+
+            # Market entry fills on the first tick after the simulated latency
+            if pending is not None and row == pending[0] and recv_ns >= pending[2]:
+                _, direction, _, decision_ns = pending
+                entry_price = self._slipped(ltp, direction, tick_size)
+                sl_points, _ = bracket_points(entry_price, tick_size, p['SL_PERCENT'])
+                sign = 1 if direction == 'B' else -1
+                position = {
+                    'row': row, 'direction': direction, 'entry_price': entry_price,
+                    'entry_ns': recv_ns, 'decision_ns': decision_ns,
+                    'exit_side': 'S' if direction == 'B' else 'B',
+                    'trigger': round(entry_price - sign * sl_points, 2)
+                }
+                pending = None
+
+            # Bracket exits and trailing for the open position
+            if position is not None and row == position['row']:
+                exit_side = position['exit_side']
+                if (exit_side == 'S' and ltp <= position['trigger']) or \
+                        (exit_side == 'B' and ltp >= position['trigger']):
+                    close_position(self._slipped(ltp, exit_side, tick_size), recv_ns, 'SL')
+                else:
+                    new_trigger = trailed_price(exit_side, ltp, position['trigger'], tick_size,
+                                                p['TRAILING_STEP'])
+                    if new_trigger is not None:
+                        position['trigger'] = round(new_trigger, 2)
+
+            # Day MTM check, as manage_position does on every pass
+            day_mtm = realized
+            if position is not None:
+                sign = 1 if position['direction'] == 'B' else -1
+                pos_ltp = float(depth.ltp[position['row']])
+                day_mtm += (pos_ltp - position['entry_price']) * sign * self.qty
+                if day_mtm > p['TAKE_PROFIT']:
+                    close_position(self._slipped(pos_ltp, position['exit_side'],
+                                                 self.tick_sizes[position['row']]),
+                                   recv_ns, 'MTM_TP')
+
+            # Entry decision on the best ranked candidate
+            can_enter = (trade_count < p['MAX_TRADES_PER_DAY'] and recv_ns <= cutoff_ns
+                         and p['STOP_LOSS'] < day_mtm < p['TAKE_PROFIT'])
+            if can_enter and position is None and pending is None and recv_ns >= open_ns:
+                best = ranking.best()
+                if best is not None:
+                    best_row, direction, _ = best
+                    pending = (best_row, direction, recv_ns + self.latency_ns, recv_ns)
+                    trade_count += 1
+
+            if not can_enter and pending is None:
+                if position is None:
+                    break       # Nothing left that can happen today
+                held['row'] = position['row']
+
+        if position is not None:
+            close_position(float(depth.ltp[position['row']]), last_ns, 'EOD')
+
+        span = (last_ns - first_ns) if first_ns is not None else 0
+        return trades, ticks, span
+
+
+def group_sessions(paths):
+    """Group tick files into sessions by their recording date (YYYYMMDD prefix)."""
+    sessions = {}
+    for path in sorted(paths):
+        sessions.setdefault(os.path.basename(path)[:8], []).append(path)
+    return list(sessions.values())
+
+
+def compiled_path(paths, tokens, folder=COMPILED_FOLDER):
+    """
+    Cache file for a session compiled against a universe.
+
+    The name carries the session date and a digest of the tick files (name,
+    size, mtime), the universe tokens in order and COMPILED_VERSION, so any
+    change to the inputs compiles a fresh file.
+    """
+    digest = hashlib.sha1(str(COMPILED_VERSION).encode())
+    for path in sorted(paths):
+        stat = os.stat(path)
+        digest.update(f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    digest.update(','.join(str(token) for token in tokens).encode())
+    date = os.path.basename(sorted(paths)[0])[:8]
+    return os.path.join(folder, f"{date}_{digest.hexdigest()[:12]}.npy")
+
+
+def compile_session(paths, tokens, folder=COMPILED_FOLDER):
+    """
+    Decode one session's tick files into a COMPILED_DTYPE array on disk.
+
+    Rows follow the order of tokens, which must be the universe later given
+    to ScalperReplay. Ticks of other tokens and malformed ticks are dropped.
+    An up-to-date compiled file is reused as is.
+
+    :return:    path of the .npy file
+    """
+    path = compiled_path(paths, tokens, folder)
+    if os.path.exists(path):
+        return path
+
+    depth = DepthSnapshot(tokens)
+    chunks = []
+    buffer = np.empty(COMPILE_CHUNK, dtype=COMPILED_DTYPE)
+    filled = 0
+    for recv_ns, tick in chain.from_iterable(read_ticks(p) for p in sorted(paths)):
+        token = tick.get('tk')
+        if token not in depth.rows:
+            continue
+        try:
+            row = depth.update(token, tick)
+        except (ValueError, TypeError):
+            continue
+        buffer[filled] = (recv_ns, row, depth.seen[row], depth.ltp[row], depth.qty[row])
+        filled += 1
+        if filled == COMPILE_CHUNK:
+            chunks.append(buffer)
+            buffer = np.empty(COMPILE_CHUNK, dtype=COMPILED_DTYPE)
+            filled = 0
+    chunks.append(buffer[:filled])
+
+    os.makedirs(folder, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.save(f, np.concatenate(chunks))
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_compiled(path, mmap=True):
+    """Open a compiled session, memory-mapped read-only by default."""
+    return np.load(path, mmap_mode='r' if mmap else None)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+
+    universe_df = pd.read_csv(sys.argv[1])
+    replay = ScalperReplay(universe_df)
+    trades_df, summary = replay.run(group_sessions(sys.argv[2:]))
+
+    logging.info(f"\n{trades_df.to_string(index=False) if len(trades_df) else 'No trades'}")
+    logging.info(f"Summary: {summary}")
@@ -7,7 +7,9 @@ It connects to the Shoonya API for real-time data and order execution.
 
 import os
 import sys
+import atexit
 import logging
+import threading
 import pandas as pd
 from datetime import datetime
 from time import sleep
@@ -18,38 +20,50 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 
 from broker.shoonya.config import *
 import broker.shoonya.basicfunctions as bf
+from broker.shoonya.tick_recorder import TickRecorder
+from backtesting.scalper.depth_signal import DepthSnapshot
+from backtesting.scalper.ranking import SignalRanking
+from backtesting.scalper.latency import LatencyTracker, now as perf_ns
+from backtesting.scalper.trailing import TrailingStopEngine
+from backtesting.scalper.strategy import (
+    PRESSURE_LOWER_BOUND, PRESSURE_UPPER_BOUND, DEPTH_MULTIPLIER,
+    STOP_LOSS, TAKE_PROFIT, MAX_TRADES_PER_DAY, ENTRY_CUTOFF, MAX_OPEN_POSITIONS,
+    bracket_points, entry_is_stale
+)
+from backtesting.scalper.portfolio import Portfolio
+from backtesting.scalper.universe import (
+    load_universe, TOTAL_STOCKS_FOR_SCAN, MIN_STOCK_PRICE, MAX_STOCK_PRICE
+)
+from utilities.scheduler import MarketSchedule, MARKET_PHASES
+from utilities.journal import JournalWriter
 
-# Delay token subscription until 1 minute before market opens (9:14 AM)
-while datetime.now().strftime("%H:%M:%S") < "09:14:00":
-    logging.info("\nWaiting to subscribe to tokens until 09:14:00 🫠")
-    sleep(1)
+# Market phases as events: pre_open 09:14, open 09:15:01, cutoff, close
+schedule = MarketSchedule([(name, ENTRY_CUTOFF if name == 'cutoff' else hhmmss)
+                           for name, hhmmss in MARKET_PHASES]).start()
 
-# Trading strategy parameters
-TOTAL_STOCKS_FOR_SCAN = 990  # Number of stocks to analyze from the CSV file
-MAX_TRADES_PER_DAY = 1       # Maximum number of trades allowed per day
+# Trading strategy parameters (signal and risk thresholds live in strategy.py,
+# universe size and price band in universe.py)
 trade_count = 0              # Counter to track daily trades
 
-STOP_LOSS = -500             # Maximum loss per trade in rupees
-TAKE_PROFIT = 3000           # Target profit per trade in rupees
-
 SIZE_OF_EACH_TRADE = 500     # Investment amount per trade in rupees
-START_ROW = 2                # Starting row in CSV (skip header)
+ENTRY_QTY = 1                # Fixed quantity for testing
+START_ROW = 2                # Starting row in the fallback CSV (skip header)
 END_ROW = START_ROW + TOTAL_STOCKS_FOR_SCAN - 1  # Ending row for stock selection
 
-MIN_STOCK_PRICE = 50         # Minimum stock price filter
-MAX_STOCK_PRICE = 200        # Maximum stock price filter
+MANAGE_INTERVAL = 0.1        # Seconds between position checks without order events
 
-TRAILING_STEP = 0.0025       # Step size for trailing stop loss (0.25%)
+# More than one open position runs each trade as its own task (portfolio.py)
+MULTI_POSITION = MAX_OPEN_POSITIONS > 1
 
 # Global tracking variables
 day_m2m = 0          # Daily mark-to-market profit/loss
-feed_json = {}       # Storage for real-time market data from websocket
 
 # File paths and naming
 today_date = datetime.now().strftime("%d%m%y")  # Today's date in DDMMYY format
-filename = 'tradable_equity.csv'                # Input file with stock data
+filename = 'tradable_equity.csv'                # Fallback stock list if no universe was built
 mtm_graph = f'{today_date}_mtmgraph.csv'        # Daily P&L tracking file
 log_file = f'{today_date}_logfile.log'          # Daily log file
+latency_file = f'{today_date}_latency.json'     # Stage latency summary written at exit
 
 # Setup logging to file with timestamp
 logging.basicConfig(
@@ -60,32 +74,52 @@ logging.basicConfig(
     force=True
 )
 
-# Create P&L tracking file if it doesn't exist
-if not os.path.exists(mtm_graph) or os.path.getsize(mtm_graph) == 0:
-    try:
-        with open(mtm_graph, 'w') as file:
-            file.write("timestamp,day_m2m\n")
-            logging.info(f"Headers added to {mtm_graph}")
-    except Exception as e:
-        logging.error(f"Error writing headers to {mtm_graph}: {e}")
-else:
-    logging.info(f"{mtm_graph} already exists and contains data. "
-                 "Headers not added.")
+# P&L curve written off-thread; headers are added if the file is new
+mtm_journal = JournalWriter(mtm_graph, ['timestamp', 'day_m2m']).start()
+atexit.register(mtm_journal.close)
 
-# Load stock data from CSV file
+# Today's pre-market universe, already filtered and ranked by liquidity (universe.py)
 try:
-    df = pd.read_csv(filename)  # Load stock list with tokens and prices
+    df, universe_file = load_universe()
+    logging.info(f"Loaded {len(df)} stocks from {universe_file}")
 except FileNotFoundError:
-    logging.info("Stock data CSV file not found")
-    exit()
+    logging.info("No universe built for today, falling back to the stock data CSV")
+    try:
+        df = pd.read_csv(filename)  # Load stock list with tokens and prices
+    except FileNotFoundError:
+        logging.info("Stock data CSV file not found")
+        exit()
+
+    # Filter and clean stock data
+    df = df.iloc[START_ROW - 1:END_ROW]  # Select specified range of stocks
+
+    # Clean and validate Last Traded Price data
+    df["LTP"] = pd.to_numeric(df["LTP"], errors="coerce")  # Convert to numbers, invalid becomes NaN
+    df = df.dropna(subset=["LTP"])  # Remove stocks with invalid prices
+    df = df[(df["LTP"] >= MIN_STOCK_PRICE) & (df["LTP"] <= MAX_STOCK_PRICE)]  # Apply price filters
+    df = df.dropna(subset=["EXCHANGE", "TOKEN"])  # Skip rows with missing data
+
+df = df.reset_index(drop=True)  # Row numbers line up with the depth snapshot rows
+
+# Everything is subscribed as soon as the feed is up
+tokens_to_subscribe = (df['EXCHANGE'] + '|' + df['TOKEN'].astype(str)).tolist()
 
-# Filter and clean stock data
-df = df.iloc[START_ROW - 1:END_ROW]  # Select specified range of stocks
+# Latest market depth per stock in preallocated numpy arrays, one row per df row
+depth = DepthSnapshot(df['TOKEN'].astype(str))
+ranking = SignalRanking()   # Qualifying entry candidates, updated on every tick
 
-# Clean and validate Last Traded Price data
-df["LTP"] = pd.to_numeric(df["LTP"], errors="coerce")  # Convert to numbers, invalid becomes NaN
-df = df.dropna(subset=["LTP"])  # Remove stocks with invalid prices
-df = df[(df["LTP"] >= MIN_STOCK_PRICE) & (df["LTP"] <= MAX_STOCK_PRICE)]  # Apply price filters
+# Record every raw depth tick for research and replay, flushed on exit
+recorder = TickRecorder().start()
+atexit.register(recorder.close)
+
+# Per-stage latency histograms, p50/p99 available live and dumped at exit
+latency = LatencyTracker()
+tick_ns = [0] * len(df)     # Receipt time of the last tick applied to each row
+atexit.register(latency.dump, latency_file)
+
+# Trails the bracket exit legs on every tick of the traded token
+trailing = TrailingStopEngine(api, latency=latency)
+atexit.register(trailing.close)
 
 logging.info(df)
 
@@ -100,88 +134,82 @@ except Exception as e:
     logging.error(f"Failed to retrieve cash balance: {e}")
 
 
-def round_to_tick(price, tick_size):
-    """Round price to nearest valid tick size as per exchange rules."""
-    return round(price / tick_size) * tick_size
-
-
 # Track websocket connection status
-feed_opened = False
+feed_ready = threading.Event()
 
 
 def event_handler_feed_update(tick_data):
     """Handle incoming real-time market data from websocket."""
-    required_keys = {
-        'lp', 'tbq', 'tsq', 'bq1', 'bq2', 'bq3', 'bq4', 'bq5',
-        'sq1', 'sq2', 'sq3', 'sq4', 'sq5'
-    }
-    
-    # Check if all required market depth fields are present
-    if all(key in tick_data for key in required_keys) and 'tk' in tick_data:
-        try:
-            # Store complete market depth data for this stock token
-            feed_json[tick_data['tk']] = {
-                'ltp': float(tick_data['lp']),     # Last traded price
-                # 'pc': int(tick_data['pc']),     # Previous close (if needed)
-                'tbq': int(tick_data['tbq']),     # Total buy quantity
-                'tsq': int(tick_data['tsq']),     # Total sell quantity
-                'bq1': int(tick_data['bq1']),     # Buy quantity at level 1
-                'bq2': int(tick_data['bq2']),     # Buy quantity at level 2
-                'bq3': int(tick_data['bq3']),     # Buy quantity at level 3
-                'bq4': int(tick_data['bq4']),     # Buy quantity at level 4
-                'bq5': int(tick_data['bq5']),     # Buy quantity at level 5
-                'sq1': int(tick_data['sq1']),     # Sell quantity at level 1
-                'sq2': int(tick_data['sq2']),     # Sell quantity at level 2
-                'sq3': int(tick_data['sq3']),     # Sell quantity at level 3
-                'sq4': int(tick_data['sq4']),     # Sell quantity at level 4
-                'sq5': int(tick_data['sq5'])      # Sell quantity at level 5
-            }
-
-        except (ValueError, TypeError) as e:
-            logging.info(f"Error converting market data to numbers: {e}")
-    else:
-        logging.info("Incomplete market data received:", tick_data)
+    received_ns = perf_ns()
+    recorder.record(tick_data)  # Raw tick with receive time, written off-thread
+    quotes.update(tick_data)  # Keep the shared LTP cache current for exits
+    trailing.on_tick(tick_data)  # Move SL/TP legs of the traded token, coalesced per order
+
+    token = tick_data.get('tk')
+    if token not in depth.rows:
+        return  # Not part of the scanned universe
+
+    try:
+        # Apply full snapshots and partial delta updates in place
+        row = depth.update(token, tick_data)
+    except (ValueError, TypeError) as e:
+        logging.info(f"Error converting market data to numbers: {e}")
+        return
+
+    # Re-score only this token and keep the candidate heap current
+    ranking.update(row, depth.signal_at(row, PRESSURE_LOWER_BOUND,
+                                        PRESSURE_UPPER_BOUND, DEPTH_MULTIPLIER))
+    tick_ns[row] = received_ns
+    latency.record('tick_to_signal', received_ns)
 
 
 def event_handler_order_update(tick_data):
     """Handle order status updates (fills, rejections, etc.)."""
+    received_ns = perf_ns()
+    orders.on_order_update(tick_data)  # Keep the local order book and positions current
+
+    # Order updates can beat the place_order response, so join in either order
+    orderno = tick_data.get('norenordno')
+    if orderno:
+        latency.join(orderno, 'ack_to_update', end_ns=received_ns)
+        latency.join(orderno, 'submit_to_update', end_ns=received_ns)
+    if tick_data.get('status') == 'COMPLETE' and not tick_data.get('snoordt'):
+        # Entry filled: time until the stop-loss leg is first trailed
+        latency.stamp(str(tick_data.get('tk')), 'fill', received_ns)
     logging.info(f"Order update received: {tick_data}")
 
 
 def open_callback():
     """Called when websocket connection is successfully established."""
-    global feed_opened
-    feed_opened = True
+    feed_ready.set()
+    orders.mark_gap()  # Order events may have been missed while disconnected
 
 
 def close_callback():
     """Called when websocket connection is closed or lost."""
-    global feed_opened
-    feed_opened = False
+    feed_ready.clear()
+    orders.mark_gap()
+
 
+# Delay token subscription until 1 minute before market opens (9:14 AM)
+if not schedule.reached('pre_open'):
+    logging.info("\nWaiting to subscribe to tokens until 09:14:00 🫠")
+    schedule.wait_for('pre_open')
 
 # Start websocket connection with callback functions
 api.start_websocket(
     order_update_callback=event_handler_order_update,  # For order status updates
     subscribe_callback=event_handler_feed_update,       # For market data updates
-    socket_open_callback=open_callback                  # For connection events
+    socket_open_callback=open_callback,                 # For connection events
+    socket_close_callback=close_callback
 )
 
 # Wait until websocket connection is ready
-while not feed_opened:
-    logging.info("\nWaiting for WebSocket connection to open")
-    pass
+logging.info("\nWaiting for WebSocket connection to open")
+feed_ready.wait()
 
 logging.info("\nWebSocket feed connection established successfully")
 
-# Build list of stock tokens to subscribe for live data
-tokens_to_subscribe = []
-for _, row in df.iterrows():
-    exchange = row['EXCHANGE']
-    token = row['TOKEN']
-    if pd.notna(exchange) and pd.notna(token):  # Skip rows with missing data
-        tokens_to_subscribe.append(f"{exchange}|{token}")
-
 # Subscribe to live market depth data for filtered stocks
 if tokens_to_subscribe:
     api.subscribe(tokens_to_subscribe, feed_type=FeedType.SNAPQUOTE)
@@ -190,119 +218,111 @@ if tokens_to_subscribe:
 else:
     logging.info("No valid tokens found for subscription.")
 
-# Add columns to store calculated trading signals
-for col in ['ltp', 'trade_direction', 'dominant_percent']:
-    if col not in df.columns:
-        df[col] = None
-
-sleep(3)
-
 # Wait until market officially opens at 9:15 AM
-while datetime.now().strftime("%H:%M:%S") < "09:15:01":
+if not schedule.reached('open'):
     logging.info("\nWaiting for market to open 🫠")
-    sleep(1)
-
-
-def generate_marketdepth_signal():
-    """Analyze market depth to identify strong buy/sell signals."""
-    global df
-    
-    # Signal threshold parameters
-    PRESSURE_LOWER_BOUND = 0.70
-    PRESSURE_UPPER_BOUND = 0.95
-    DEPTH_MULTIPLIER = 1.50
-
-    # Process each stock to calculate market depth signals
-    for idx, row in df.iterrows():
-        try:
-            token = str(row['TOKEN'])
-            ltp = round(float(feed_json[token]['ltp']), 2)  # Current market price
-            tq = feed_json[token]['tbq'] + feed_json[token]['tsq']  # Total quantity
-            # pc = round(float((feed_json[token]['pc'])), 2)  # Previous close if needed
-            
-            # Calculate buy and sell pressure percentages
-            bp = round(float((feed_json[token]['tbq']) / tq), 2)  # Buy pressure ratio
-            sp = round(float((feed_json[token]['tsq']) / tq), 2)  # Sell pressure ratio
-
-            # Sum top 5 levels of buy and sell quantities
-            top5bq = (feed_json[token]['bq1'] + feed_json[token]['bq2'] +
-                     feed_json[token]['bq3'] + feed_json[token]['bq4'] +
-                     feed_json[token]['bq5'])
-            top5sq = (feed_json[token]['sq1'] + feed_json[token]['sq2'] +
-                     feed_json[token]['sq3'] + feed_json[token]['sq4'] +
-                     feed_json[token]['sq5'])
-
-            # Generate trading signals based on market depth analysis
-            if PRESSURE_UPPER_BOUND > bp > PRESSURE_LOWER_BOUND and top5bq > top5sq * DEPTH_MULTIPLIER:  # Strong buying interest
-                trade_direction = 'B'  # Buy signal
-                dominant_percent = bp
-            elif PRESSURE_UPPER_BOUND > sp > PRESSURE_LOWER_BOUND and top5sq > top5bq * DEPTH_MULTIPLIER:  # Strong selling pressure
-                trade_direction = 'S'  # Sell signal
-                dominant_percent = sp
-            else:
-                trade_direction = None  # No clear signal
-                dominant_percent = None
-
-            # Store calculated values back to dataframe
-            df.at[idx, 'ltp'] = ltp
-            df.at[idx, 'trade_direction'] = trade_direction
-            df.at[idx, 'dominant_percent'] = dominant_percent
-
-            logging.info(f"Stock {idx}: Token {token}, Price {ltp}, "
-                        f"Signal {trade_direction}, Strength: {dominant_percent}")
-        except Exception as e:
-            logging.info(f"Error analyzing token {token}: {e}")
-
-    # logging.info(feed_json)  # Enable to debug raw market data
-
-    # Rank stocks by signal strength (highest dominance first)
-    df = df.sort_values(by='dominant_percent', ascending=False)
-    df.reset_index(drop=True, inplace=True)  # Reset row numbers after sorting
-
-    logging.info(df)
-    logging.info(f"\nTop candidate: {df.loc[0]}")
-
-    dominant_percent = df.loc[0, 'dominant_percent']
-
-    # If no signals found, retry analysis
-    if pd.isna(dominant_percent):
-        logging.info("\nNo trading signals detected... Retrying analysis ;)\n")
-        generate_marketdepth_signal()
+    schedule.wait_for('open')
+
+
+# Trading states. Each handler does one bounded step and returns the next
+# state, so the bot runs all session at constant stack depth.
+SCAN = 'SCAN'        # Waiting for a qualifying depth signal
+ENTER = 'ENTER'      # Placing the entry for the chosen candidate
+MANAGE = 'MANAGE'    # Trailing and supervising open orders
+DONE = 'DONE'        # No more trades possible today
+
+RESCAN_TIMEOUT = 1.0   # Longest wait for a qualifying tick before re-checking limits
+RETRY_DELAY = 0.5      # Pause after a rejected entry or an error before retrying
+
+# Columns to extract from the order book
+ORDERBOOK_COLUMNS = [
+    'norenordno', 'exch', 'tsym', 'rejby', 'qty', 'ordenttm', 'trantype',
+    'prctypr', 'prc', 'ret', 'token', 'prcftr', 'ordersource', 'ti',
+    'avgprc', 's_prdt_ali', 'prd', 'status', 'fillshares', 'rqty',
+    'rorgqty', 'rorgprc', 'blprc', 'trgprc', 'snonum', 'snoordt',
+    'rejreason'
+]
+
+candidate = None        # (row, direction, dominant_percent) picked in SCAN
+traded_token = None     # "EXCH|TOKEN" kept subscribed while a trade is live
+trade_lock = threading.Lock()   # Position tasks give back trades that never filled
+book_flat = threading.Event()   # Set once take profit has squared off the whole book
+
+
+def can_open_trade():
+    """True while the daily trade count, MTM limits and entry cutoff allow a new trade."""
+    return (trade_count < MAX_TRADES_PER_DAY and
+            STOP_LOSS < day_m2m < TAKE_PROFIT and
+            not schedule.reached('cutoff'))
+
+
+def resume_scanning():
+    """Re-subscribe the universe dropped while a trade was live, ranking it from fresh depth."""
+    global traded_token
+    if traded_token is not None:
+        # Depth of the unsubscribed tokens predates the trade; rank what is still current
+        depth.reset(keep=[traded_token.split('|', 1)[1]])
+        ranking.rebuild(depth.candidates(PRESSURE_LOWER_BOUND, PRESSURE_UPPER_BOUND, DEPTH_MULTIPLIER))
+        api.subscribe([t for t in tokens_to_subscribe if t != traded_token],
+                      feed_type=FeedType.SNAPQUOTE)
+        traded_token = None
+
+
+def scan_for_signal():
+    """SCAN: pick the strongest candidate, waiting at most RESCAN_TIMEOUT for one."""
+    global candidate
+
+    if not can_open_trade():
+        orders.maybe_reconcile()
+        if not orders.all_terminal() or (MULTI_POSITION and len(portfolio)):
+            return MANAGE   # Let open orders run to completion first
+        logging.info("\nMaximum trades for the day reached or M2M loss is "
+                     "too high or M2M gain breached take profit or time is past "
+                     f"{ENTRY_CUTOFF}, exiting the program.\n")
+        return DONE
+
+    # Strongest qualifying candidate, kept current by the feed callback
+    signal = ranking.best()
+
+    # If no signals found, wait for a qualifying tick and come back
+    if signal is None:
+        logging.info("\nNo trading signals detected... Waiting for a qualifying tick ;)\n")
+        ranking.wait(timeout=RESCAN_TIMEOUT)
+        return SCAN
+
+    # Portfolio caps on open positions, exposure and day MTM
+    if MULTI_POSITION and not portfolio.can_open(float(depth.ltp[signal[0]]) * ENTRY_QTY):
+        portfolio.wait_for_change(timeout=RESCAN_TIMEOUT)
+        return SCAN
+
+    candidate = signal
+    return ENTER
+
+
+def place_entry():
+    """ENTER: place the entry for the chosen candidate and check it was accepted."""
+    global trade_count, traded_token
+
+    row, trade_direction, dominant_percent = candidate
+    price = round(float(depth.ltp[row]), 2)
+    logging.info(f"\nTop candidate: {df.loc[row, 'Trading Symbol']}, Price {price}, "
+                 f"Signal {trade_direction}, Strength: {dominant_percent}")
 
     # Prepare trade parameters for the best signal
-    price = df.loc[0, 'ltp']
-    price = float(price)
     # qty = int(SIZE_OF_EACH_TRADE / price)  # Calculate shares based on investment amount
-    qty = 1  # Fixed quantity for testing
-    tsym = df.loc[0, 'Trading Symbol']
-    token = df.loc[0, 'TOKEN']
-    trade_direction = df.loc[0, 'trade_direction']
-    exchange = df.loc[0, 'EXCHANGE']
+    qty = ENTRY_QTY
+    tsym = df.loc[row, 'Trading Symbol']
+    token = df.loc[row, 'TOKEN']
+    exchange = df.loc[row, 'EXCHANGE']
     remarks = 'Scapling Trade'
-    tick_size = df.loc[0, 'Tick Size']
-
-    if trade_direction == 'B':
-        sl_price = max(round_to_tick(((price * 0.0025)), tick_size), 1.00)
-        # price -= 1  # Adjust entry price for buy orders
-        tp_price = round_to_tick(((price * 0.01)), tick_size)
-    elif trade_direction == 'S':
-        sl_price = max(round_to_tick(((price * 0.0025)), tick_size), 1.00)
-        # price += 1  # Adjust entry price for sell orders
-        tp_price = round_to_tick(((price * 0.01)), tick_size)
-    else:
-        generate_marketdepth_signal()
-    
-    global trade_count
+    tick_size = df.loc[row, 'Tick Size']
 
-    if trade_count >= MAX_TRADES_PER_DAY:
-        logging.info("Max trades per day reached. "
-                    "Checking if there is an existing order...")
-        manage_position()
-        logging.info("No existing order found. Exiting the program")
-        exit()
+    sl_price, tp_price = bracket_points(price, tick_size)
 
+    submit_ns = perf_ns()
+    latency.record('tick_to_submit', tick_ns[row], submit_ns)
 
-    api.place_order(
+    ret = api.place_order(
         buy_or_sell=trade_direction,
         product_type='H',
         exchange=exchange,
@@ -317,6 +337,12 @@ def generate_marketdepth_signal():
         bookloss_price=sl_price
     )
 
+    ack_ns = perf_ns()
+    latency.record('submit_to_ack', submit_ns, ack_ns)
+    if ret:
+        latency.join(ret['norenordno'], 'ack_to_update', start_ns=ack_ns)
+        latency.join(ret['norenordno'], 'submit_to_update', start_ns=submit_ns)
+
     logging.info(f"\nPrice: {price}")
     logging.info(f"Quantity (qty): {qty}")
     logging.info(f"Trading Symbol (tsym): {tsym}")
@@ -326,276 +352,175 @@ def generate_marketdepth_signal():
     logging.info(f"Remarks: {remarks}")
     logging.info(f"Tick Size: {tick_size}\n")
 
-    trade_count += 1
+    with trade_lock:
+        trade_count += 1
 
-    api.unsubscribe(tokens_to_subscribe)
+    if MULTI_POSITION:
+        if not ret:
+            with trade_lock:
+                trade_count -= 1
+            sleep(RETRY_DELAY)
+            return SCAN
+        # Hand the position to its own task and keep scanning the whole universe
+        depth.disable([token])
+        ranking.remove(row)
+        portfolio.open(ret['norenordno'], exchange, token, tsym, price * qty)
+        return SCAN
 
-    # api.close_websocket()  # Close websocket connection if needed
+    # Wait for the entry's first order event instead of polling the REST order book
+    entry = orders.wait_for_order(ret['norenordno']) if ret else None
+    latency.log_summary()
 
-    # while feed_opened :
-    #     print("\nWaiting to close websocket connection")
-    #     pass
+    orders.maybe_reconcile()
+    order_df = orders.orders_df(ORDERBOOK_COLUMNS)
 
-    # api.subscribe(f'{exchange}|{token}', feed_type=FeedType.SNAPQUOTE)  # Re-subscribe to specific token
-
-    # Retrieve the order book from the API
-    orderbook = api.get_order_book()
-
-    # Define the columns to extract from the order book
-    orderbook_columns = [
-        'norenordno', 'exch', 'tsym', 'rejby', 'qty', 'ordenttm', 'trantype',
-        'prctypr', 'prc', 'ret', 'token', 'prcftr', 'ordersource', 'ti',
-        'avgprc', 's_prdt_ali', 'prd', 'status', 'fillshares', 'rqty',
-        'rorgqty', 'rorgprc', 'blprc', 'trgprc', 'snonum', 'snoordt',
-        'rejreason'
-    ]
-        
-    order_df = pd.DataFrame(orderbook, columns=orderbook_columns)
-
-    # Check if all orders are in terminal states (rejected, completed, or canceled)
-    # If order is rejected for any reason, regenerate trading signals
-    if order_df['status'].isin({"REJECTED", "COMPLETE", "CANCELED"}).all():
+    # If the order is rejected for any reason, go back to scanning
+    if (order_df['status'].isin({"REJECTED", "COMPLETE", "CANCELED"}).all() and
+            (entry is None or entry.get('status') != 'COMPLETE')):
 
         logging.info("\nOrder was rejected, "
                     "regenerating trading signals\n")
 
         # Identify tokens with margin shortfall rejection
         tokens_to_remove = order_df.loc[
-            order_df['rejreason'].str.startswith("RED:Margin Shortfall", na=False), 
+            order_df['rejreason'].str.startswith("RED:Margin Shortfall", na=False),
             'token'
         ]
-        
+
         # Remove stocks with margin issues from trading list
-        df = df[~df['token'].isin(tokens_to_remove)]
+        depth.disable(tokens_to_remove)
+        for token in tokens_to_remove:
+            if str(token) in depth.rows:
+                ranking.remove(depth.rows[str(token)])
 
-        trade_count -= 1
-        generate_marketdepth_signal()
+        with trade_lock:
+            trade_count -= 1
+        sleep(RETRY_DELAY)  # Bound the retry rate when the broker keeps rejecting
+        return SCAN
 
-    elif (order_df['status'].isin({"REJECTED", "COMPLETE", "CANCELED"}).all() and 
-          datetime.now().strftime("%H:%M:%S") > "09:20:00"):
-        logging.info("There are no open positions and time is past 09:20:00, "
-                    "so it isn't possible to open any new trades for the day, "
-                    "exiting the program.")
-        exit()
-        pass
+    # Keep only the traded token subscribed so trailing reads LTP from the quote cache
+    traded_token = f"{exchange}|{token}"
+    api.unsubscribe([t for t in tokens_to_subscribe if t != traded_token])
 
-    manage_position()
+    return MANAGE
 
 
-def manage_position():
-    """Monitor and manage active trading positions and orders."""
-    while True:
+def position_closed(task):
+    """Portfolio callback: free the token for new signals and give back unfilled trades."""
+    global trade_count
+
+    entry = next((o for o in orders.orders_for(task.exchange, task.token)
+                  if o.get('norenordno') == task.orderno), {})
+    if not str(entry.get('rejreason') or '').startswith("RED:Margin Shortfall"):
+        depth.enable([task.token])
 
-        global day_m2m
+    if not task.filled:
+        with trade_lock:
+            trade_count -= 1
+    logging.info(f"Position in {task.tsym} closed, {len(portfolio)} still open")
 
-        logging.info("\nMonitoring active positions...\n")
 
-        ret = api.get_positions()
-        mtm = 0
-        pnl = 0
-        for i in ret:
-            mtm += float(i['urmtom'])
-            pnl += float(i['rpnl'])
-            day_m2m = mtm + pnl
+def supervise_book():
+    """Mark the book to market, journal MTM, take profit and sync the trailing legs."""
+    global day_m2m
 
-        day_m2m = round(day_m2m, 2)
+    # Local state from order events, reconciled with REST only periodically
+    orders.maybe_reconcile()
+    day_m2m = orders.day_mtm()
 
-        logging.info(f'{day_m2m} is your Daily MTM')
+    logging.info(f'{day_m2m} is your Daily MTM')
+    mtm_journal.write({'timestamp': datetime.now().strftime('%H:%M:%S'), 'day_m2m': day_m2m})
+
+    if day_m2m > TAKE_PROFIT:
+        logging.info(f"Take profit target reached: {day_m2m} is daily MTM. "
+                    "Closing all positions.")
+        if bf.exitallpositions() is None:
+            book_flat.set()     # Nothing left open, the session is over
+
+    order_df = orders.orders_df(ORDERBOOK_COLUMNS)
+
+    # Bracket legs are trailed tick by tick; keep the engine's legs in step with the book
+    trailing.sync(order_df)
+    return order_df
+
+
+def run_supervisor():
+    """Multi-position mode: supervise the whole book while the main loop keeps scanning."""
+    while not book_flat.is_set():
         try:
-            with open(mtm_graph, 'a') as file:
-                timestamp = datetime.now().strftime('%H:%M:%S')
-                file.write(f"{timestamp},{day_m2m}\n")
+            supervise_book()
         except Exception as e:
-            logging.error(f"Error writing to {mtm_graph}: {e}")
-
-        if day_m2m > TAKE_PROFIT:
-            logging.info(f"Take profit target reached: {day_m2m} is daily MTM. "
-                        "Closing all positions.")
-            bf.exitallpositions()
-
-        # Retrieve the order book from the API
-        orderbook = api.get_order_book()
-
-        # Define the columns to extract from the order book
-        orderbook_columns = [
-            'norenordno', 'exch', 'tsym', 'rejby', 'qty', 'ordenttm', 'trantype',
-            'prctypr', 'prc', 'ret', 'token', 'prcftr', 'ordersource', 'ti',
-            'avgprc', 's_prdt_ali', 'prd', 'status', 'fillshares', 'rqty',
-            'rorgqty', 'rorgprc', 'blprc', 'trgprc', 'snonum', 'snoordt'
-        ]
-        
-        order_df = pd.DataFrame(orderbook, columns=orderbook_columns)
-
-        global trade_count
-
-        for _, row in order_df.iterrows():
-
-            try:
-                rqty = row['rqty']
-                token = row['token']            # Stock token for price lookup
-                exchange = row['exch']          # Trading exchange
-                tsym = row['tsym']              # Trading symbol
-                trantype = row['trantype']      # Transaction type: 'B' for Buy, 'S' for Sell
-                # ltp = round(float(feed_json[token]['ltp']), 2)  # Last traded price
-                tick_size = (round(float(row['ti']), 2) 
-                           if not pd.isna(row['ti']) else 0.05)  # Minimum price movement
-                orderno = row['norenordno']     # Order number
-
-                # Trailing stop-loss management for buy orders
-                if (trantype == 'B' and row['status'] == 'TRIGGER_PENDING' and 
-                    int(row['snoordt']) == 1):
-
-                    quote_info = api.get_quotes(exchange=exchange, token=token)
-                    ltp = float(quote_info.get("lp", 0))
-
-                    new_trigger_price = round_to_tick(ltp * (1 + TRAILING_STEP), 
-                                                     tick_size)
-
-                    # Only move stop-loss in favorable direction (upward for buy orders)
-                    if new_trigger_price < round(float(row['trgprc']), 2):
-                        api.modify_order(
-                            exchange=exchange,
-                            tradingsymbol=tsym,
-                            orderno=row['norenordno'],
-                            newquantity=rqty,
-                            newprice_type='SL-MKT',
-                            newprice=0.00,
-                            newtrigger_price=round(new_trigger_price, 2)
-                        )
-                        logging.info(f"Modified SL for Buy order {row['norenordno']} "
-                                   f"to {new_trigger_price}")
-
-                    else:
-                        # logging.info(f"No stop-loss adjustment needed for Buy order {row['norenordno']}")
-                        pass
-
-                # Trailing take-profit management for buy orders
-                elif (trantype == 'B' and row['status'] == 'OPEN' and 
-                      int(row['snoordt']) == 0):
-
-                    quote_info = api.get_quotes(exchange=exchange, token=token)
-                    ltp = float(quote_info.get("lp", 0))
-
-                    new_tp_price = round_to_tick(ltp * (1 + TRAILING_STEP), 
-                                               tick_size)
-
-                    # Only move take-profit in favorable direction (upward for buy orders)
-                    if new_tp_price < round(float(row['prc']), 2):
-                        api.modify_order(
-                            exchange=exchange,
-                            tradingsymbol=tsym,
-                            orderno=row['norenordno'],
-                            newquantity=rqty,
-                            newprice_type='LMT',
-                            newprice=new_tp_price
-                        )
-                        logging.info(f"Modified take-profit for Buy order "
-                                   f"{row['norenordno']} to {new_tp_price}")
-
-                    else:
-                        # logging.info(f"No take-profit adjustment needed for Buy order {row['norenordno']}")
-                        pass
-
-                # Trailing SL Leg for filled long-orders      # For Sell orders
-                elif (trantype == 'S' and row['status'] == 'TRIGGER_PENDING' and 
-                      int(row['snoordt']) == 1):
-
-                    quote_info = api.get_quotes(exchange=exchange, token=token)
-                    ltp = float(quote_info.get("lp", 0))
-                    
-                    new_trigger_price = round_to_tick(ltp * (1 - TRAILING_STEP), 
-                                                     tick_size)
-
-                    # Ensure SL is only increased
-                    if new_trigger_price > round(float(row['trgprc']), 2):
-                        api.modify_order(
-                            exchange=exchange,
-                            tradingsymbol=tsym,
-                            orderno=row['norenordno'],
-                            newquantity=rqty,
-                            newprice_type='SL-MKT',
-                            newprice=0.00,
-                            newtrigger_price=round(new_trigger_price, 2)
-                        )
-                        logging.info(f"Modified SL for Sell order {row['norenordno']} "
-                                   f"to {new_trigger_price}")
-
-                    else:
-                        # logging.info(f"No SL modification needed for Sell order (SL Leg) {row['norenordno']}")
-                        pass
-
-                # Trailing TP Leg for filled long-orders      # For Sell orders
-                elif (trantype == 'S' and row['status'] == 'OPEN' and 
-                      int(row['snoordt']) == 0):
-
-                    quote_info = api.get_quotes(exchange=exchange, token=token)
-                    ltp = float(quote_info.get("lp", 0))
-                    
-                    new_tp_price = round_to_tick(ltp * (1 - TRAILING_STEP), 
-                                               tick_size)
-
-                    # Ensure TP is only increased
-                    if new_tp_price > round(float(row['prc']), 2):
-                        api.modify_order(
-                            exchange=exchange,
-                            tradingsymbol=tsym,
-                            orderno=row['norenordno'],
-                            newquantity=rqty,
-                            newprice_type='LMT',
-                            newprice=new_tp_price
-                        )
-                        logging.info(f"Modified SL for Sell order (TP Leg) "
-                                   f"{row['norenordno']} to {new_tp_price}")
-
-                    else:
-                        # logging.info(f"No SL modification needed for Sell order {row['norenordno']}")
-                        pass
-
-                # Cancelling Unfilled Orders
-                elif row['status'] == 'OPEN' and pd.isna(row['snonum']):
-                    if trantype == 'B':
-                        quote_info = api.get_quotes(exchange=exchange, token=token)
-                        ltp = float(quote_info.get("lp", 0))
-                        orderprice = float(row['prc'])
-                        if (orderprice + orderprice*0.005) < ltp:
-                            api.cancel_order(orderno=orderno)
-                            trade_count -= 1
-                            logging.info(f"Cancelled Unfilled Buy Order {orderno}, "
-                                       "and called generate_marketdepth_signal()")
-                            generate_marketdepth_signal()
-                        else:
-                            pass
-                    elif trantype == 'S':
-                        quote_info = api.get_quotes(exchange=exchange, token=token)
-                        ltp = float(quote_info.get("lp", 0))
-                        orderprice = float(row['prc'])
-                        if (orderprice - orderprice*0.005) > ltp:
-                            api.cancel_order(orderno=orderno)
-                            trade_count -= 1
-                            logging.info(f"Cancelled Unfilled Sell order {orderno}, "
-                                       "and called generate_marketdepth_signal()")
-                            generate_marketdepth_signal()
-                        else:
-                            pass
-                        
-            except:
-                logging.info("Critical Error in SL Trailing")
-        
-        # Check if all values in the 'status' column are in the given set
-        if order_df['status'].isin({"REJECTED", "COMPLETE", "CANCELED"}).all():
-            logging.info("\nNo Open Positions, Returning to main loop the program.\n")
-            return
-
-
-# Main execution loop
-while True:
+            logging.error(f"Error supervising the order book: {e}")
+        orders.wait_for_update(timeout=MANAGE_INTERVAL)
+
+
+def manage_position():
+    """MANAGE: one pass over the open orders; returns the next state."""
+    global trade_count
+
+    if MULTI_POSITION:
+        # Position tasks and the supervisor do the work, just wait for them
+        portfolio.wait_for_change(timeout=RESCAN_TIMEOUT)
+        return SCAN
+
+    logging.info("\nMonitoring active positions...\n")
+    order_df = supervise_book()
+
+    for _, row in order_df.iterrows():
+
+        try:
+            token = row['token']            # Stock token for price lookup
+            exchange = row['exch']          # Trading exchange
+            trantype = row['trantype']      # Transaction type: 'B' for Buy, 'S' for Sell
+            orderno = row['norenordno']     # Order number
+
+            # Cancelling Unfilled Orders
+            if row['status'] == 'OPEN' and pd.isna(row['snonum']):
+                ltp = quotes.ltp(exchange, token)
+                if entry_is_stale(trantype, float(row['prc']), ltp):
+                    api.cancel_order(orderno=orderno)
+                    with trade_lock:
+                        trade_count -= 1
+                    logging.info(f"Cancelled Unfilled {'Buy' if trantype == 'B' else 'Sell'} "
+                                 f"Order {orderno}, scanning for a new signal")
+                    resume_scanning()
+                    return SCAN
+
+        except:
+            logging.info("Critical Error in order management")
+    
+    # Check if all values in the 'status' column are in the given set
+    if order_df['status'].isin({"REJECTED", "COMPLETE", "CANCELED"}).all():
+        logging.info("\nNo Open Positions, returning to scanning.\n")
+        resume_scanning()
+        return SCAN
+
+    # Sleep until the next order event, or re-check prices after MANAGE_INTERVAL
+    orders.wait_for_update(timeout=MANAGE_INTERVAL)
+    return MANAGE
+
+
+# Main execution loop: run the state machine until no more trades are possible
+STATE_HANDLERS = {
+    SCAN: scan_for_signal,
+    ENTER: place_entry,
+    MANAGE: manage_position,
+}
+
+# Each open position gets its own task; the supervisor trails and marks them all
+portfolio = Portfolio(api, orders, quotes, on_close=position_closed)
+atexit.register(portfolio.stop_all)
+if MULTI_POSITION:
+    threading.Thread(target=run_supervisor, name='supervisor', daemon=True).start()
+
+state = SCAN
+while state != DONE:
+    if book_flat.is_set():
+        logging.info("\nAll positions are squared off after take profit, exiting the program.\n")
+        state = DONE
+        break
     try:
-        if (trade_count < MAX_TRADES_PER_DAY and 
-            STOP_LOSS < day_m2m < TAKE_PROFIT):
-            generate_marketdepth_signal()
-        else:
-            logging.info("\nMaximum trades for the day reached or M2M loss is "
-                        "too high or M2M gain breached take profit, "
-                        "exiting the program.\n")
-    except:
-        logging.info("Error") 
\ No newline at end of file
+        state = STATE_HANDLERS[state]()
+    except Exception as e:
+        logging.info(f"Error in {state} state: {e}")
+        sleep(RETRY_DELAY)
@@ -0,0 +1,74 @@
+"""
+Scalper strategy parameters and pricing rules.
+
+Shared by the live bot (scalper.py) and the offline tools (replay.py), so a
+backtest always runs the same thresholds and trailing rules as the bot.
+"""
+
+# Signal threshold parameters
+PRESSURE_LOWER_BOUND = 0.70
+PRESSURE_UPPER_BOUND = 0.95
+DEPTH_MULTIPLIER = 1.50
+
+# Risk parameters
+STOP_LOSS = -500             # Maximum loss per trade in rupees
+TAKE_PROFIT = 3000           # Target profit per trade in rupees
+SL_PERCENT = 0.0025          # Bracket stop-loss distance (0.25% of entry)
+TP_PERCENT = 0.01            # Bracket take-profit distance (1% of entry)
+MIN_SL_POINTS = 1.00         # Smallest stop-loss distance the broker accepts
+TRAILING_STEP = 0.0025       # Step size for trailing stop loss (0.25%)
+
+MAX_TRADES_PER_DAY = 1       # Maximum number of trades allowed per day
+ENTRY_CUTOFF = "09:20:00"    # No new trades after this time
+UNFILLED_CANCEL_PERCENT = 0.005  # Cancel an unfilled entry once price runs 0.5% past it
+
+# Portfolio caps; more than one open position enables multi-position mode
+MAX_OPEN_POSITIONS = 1       # Positions held at the same time
+MAX_EXPOSURE = 50000         # Entry notional across open positions in rupees
+
+DEFAULT_PARAMS = {
+    'PRESSURE_LOWER_BOUND': PRESSURE_LOWER_BOUND,
+    'PRESSURE_UPPER_BOUND': PRESSURE_UPPER_BOUND,
+    'DEPTH_MULTIPLIER': DEPTH_MULTIPLIER,
+    'STOP_LOSS': STOP_LOSS,
+    'TAKE_PROFIT': TAKE_PROFIT,
+    'SL_PERCENT': SL_PERCENT,
+    'TRAILING_STEP': TRAILING_STEP,
+    'MAX_TRADES_PER_DAY': MAX_TRADES_PER_DAY,
+    'ENTRY_CUTOFF': ENTRY_CUTOFF,
+}
+
+
+def round_to_tick(price, tick_size):
+    """Round price to nearest valid tick size as per exchange rules."""
+    return round(price / tick_size) * tick_size
+
+
+def bracket_points(price, tick_size, sl_percent=SL_PERCENT, tp_percent=TP_PERCENT):
+    """Return the (stop-loss, take-profit) distances in points for an entry price."""
+    sl_points = max(round_to_tick(price * sl_percent, tick_size), MIN_SL_POINTS)
+    tp_points = round_to_tick(price * tp_percent, tick_size)
+    return sl_points, tp_points
+
+
+def trailed_price(trantype, ltp, current, tick_size, step=TRAILING_STEP):
+    """
+    New price for a trailing exit leg, or None if it should stay where it is.
+
+    Buy legs (exits of a short) trail down to ltp * (1 + step); sell legs
+    (exits of a long) trail up to ltp * (1 - step). Legs only ever move in
+    the position's favour.
+    """
+    if trantype == 'B':
+        new_price = round_to_tick(ltp * (1 + step), tick_size)
+        return new_price if new_price < round(current, 2) else None
+
+    new_price = round_to_tick(ltp * (1 - step), tick_size)
+    return new_price if new_price > round(current, 2) else None
+
+
+def entry_is_stale(trantype, order_price, ltp, percent=UNFILLED_CANCEL_PERCENT):
+    """True when price has run far enough past an unfilled entry to cancel it."""
+    if trantype == 'B':
+        return order_price * (1 + percent) < ltp
+    return order_price * (1 - percent) > ltp
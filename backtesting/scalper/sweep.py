@@ -0,0 +1,168 @@
+"""
+Parallel parameter sweep for the scalper's thresholds over recorded ticks.
+
+Every session is compiled once (replay.compile_session) into a .npy record
+array. Worker processes open those files memory-mapped, so the operating
+system's page cache holds a single copy of the data however many workers
+run, and each worker only receives the parameter sets it has to evaluate.
+Each set is replayed with ScalperReplay and scored; the results are ranked
+by total P&L and written to a CSV.
+
+Usage:
+    python backtesting/scalper/sweep.py universe.csv data/storage/raw/ticks/*.ticks
+    python backtesting/scalper/sweep.py universe.csv data/storage/raw/ticks/*.ticks --random 200 --workers 8
+"""
+
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+from itertools import product
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from backtesting.scalper.replay import (
+    ScalperReplay, group_sessions, compile_session, load_compiled, COMPILED_FOLDER
+)
+
+SWEEP_FOLDER = os.path.join('backtestresults', 'scalper')
+
+# Values tried per parameter: lists are enumerated by grid() and sampled by
+# random_search(); (low, high) tuples are drawn uniformly by random_search()
+PARAM_GRID = {
+    'PRESSURE_LOWER_BOUND': [0.60, 0.65, 0.70, 0.75],
+    'PRESSURE_UPPER_BOUND': [0.90, 0.95, 0.98],
+    'DEPTH_MULTIPLIER': [1.25, 1.50, 2.00],
+    'TRAILING_STEP': [0.0015, 0.0025, 0.0040],
+    'SL_PERCENT': [0.0015, 0.0025, 0.0040],
+}
+
+_worker = {}        # Per-process replay inputs, set by _init_worker
+
+
+def _valid(params):
+    return params.get('PRESSURE_LOWER_BOUND', 0) < params.get('PRESSURE_UPPER_BOUND', 1)
+
+
+def grid(space=PARAM_GRID):
+    """Every combination of the listed values, skipping inverted pressure bands."""
+    names = list(space)
+    combos = (dict(zip(names, values)) for values in product(*(space[name] for name in names)))
+    return [params for params in combos if _valid(params)]
+
+
+def random_search(space=PARAM_GRID, n=100, seed=None):
+    """n distinct random parameter sets drawn from space."""
+    rng = random.Random(seed)
+    sets, keys = [], set()
+    for _ in range(n * 20):
+        if len(sets) == n:
+            break
+        params = {name: round(rng.uniform(*values), 6) if isinstance(values, tuple) else rng.choice(values)
+                  for name, values in space.items()}
+        key = tuple(sorted(params.items()))
+        if _valid(params) and key not in keys:
+            keys.add(key)
+            sets.append(params)
+    return sets
+
+
+def score(trades_df):
+    """Summary metrics of one replay's trades."""
+    if trades_df.empty:
+        return {'pnl': 0.0, 'trades': 0, 'win_rate': 0.0, 'avg_pnl': 0.0, 'max_drawdown': 0.0}
+    pnl = trades_df['pnl'].to_numpy()
+    equity = np.cumsum(pnl)
+    drawdown = np.maximum.accumulate(np.maximum(equity, 0)) - equity
+    return {
+        'pnl': round(float(pnl.sum()), 2),
+        'trades': len(pnl),
+        'win_rate': round(float((pnl > 0).mean()), 4),
+        'avg_pnl': round(float(pnl.mean()), 4),
+        'max_drawdown': round(float(drawdown.max()), 2)
+    }
+
+
+def _init_worker(universe, compiled_paths, replay_kwargs):
+    _worker['universe'] = universe
+    _worker['sessions'] = [load_compiled(path) for path in compiled_paths]
+    _worker['kwargs'] = replay_kwargs
+
+
+def _evaluate(params):
+    replay = ScalperReplay(_worker['universe'], params, **_worker['kwargs'])
+    try:
+        trades_df, _ = replay.run(_worker['sessions'])
+    except Exception as e:
+        logging.error(f"Replay failed for {params}: {e}")
+        return dict(params, error=str(e))
+    return dict(params, **score(trades_df))
+
+
+def run_sweep(universe, sessions, param_sets, workers=None, folder=COMPILED_FOLDER, **replay_kwargs):
+    """
+    Replay every parameter set over the sessions and rank the results.
+
+    :param universe:        DataFrame with TOKEN, Trading Symbol and Tick Size columns
+    :param sessions:        lists of tick files, one list per session
+    :param param_sets:      dicts of strategy.DEFAULT_PARAMS overrides
+    :param workers:         worker processes (default os.cpu_count())
+    :param replay_kwargs:   passed on to ScalperReplay (qty, latency_ms, ...)
+    :return:                DataFrame of parameters and metrics, best P&L first
+    """
+    tokens = ScalperReplay(universe).tokens
+    compiled_paths = []
+    for paths in sessions:
+        started = time.perf_counter()
+        compiled_paths.append(compile_session(paths, tokens, folder))
+        logging.info(f"Session {os.path.basename(paths[0])[:8]} ready in "
+                     f"{time.perf_counter() - started:.1f}s: {compiled_paths[-1]}")
+
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(param_sets) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(universe, compiled_paths, replay_kwargs)) as pool:
+        results = list(pool.map(_evaluate, param_sets, chunksize=chunksize))
+
+    results_df = pd.DataFrame(results)
+    if 'pnl' in results_df:
+        results_df = results_df.sort_values(['pnl', 'max_drawdown'], ascending=[False, True])
+    results_df = results_df.reset_index(drop=True)
+    results_df.insert(0, 'Rank', results_df.index + 1)
+    return results_df
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    parser = argparse.ArgumentParser(description="Scalper parameter sweep over recorded ticks")
+    parser.add_argument('universe', help="universe CSV the ticks were recorded for")
+    parser.add_argument('ticks', nargs='+', help="tick files, grouped into sessions by date")
+    parser.add_argument('--random', type=int, default=0, help="random sets to try instead of the full grid")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--slippage-ticks', type=int, default=0)
+    args = parser.parse_args()
+
+    universe_df = pd.read_csv(args.universe)
+    param_sets = random_search(n=args.random, seed=args.seed) if args.random else grid()
+    logging.info(f"Evaluating {len(param_sets)} parameter sets")
+
+    started = time.perf_counter()
+    results_df = run_sweep(universe_df, group_sessions(args.ticks), param_sets, workers=args.workers,
+                           latency_ms=args.latency_ms, slippage_ticks=args.slippage_ticks)
+    logging.info(f"Sweep finished in {time.perf_counter() - started:.1f}s")
+
+    os.makedirs(SWEEP_FOLDER, exist_ok=True)
+    out_path = os.path.join(SWEEP_FOLDER, f"sweep_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+    results_df.to_csv(out_path, index=False)
+    logging.info(f"\n{results_df.head(20).to_string(index=False)}")
+    logging.info(f"Results written to {out_path}")
@@ -0,0 +1,197 @@
+"""
+Tick-driven trailing engine for the scalper's bracket exit legs.
+
+Every tick of a traded token recomputes the stop-loss and take-profit legs
+with strategy.trailed_price. Modifications are coalesced per order: at most
+one modify_order is in flight for an order, and a new one is only sent when
+the leg would move by at least min_step_ticks ticks from the price already
+live or in flight. A fast move therefore produces a single modify to the
+latest level instead of one per tick, which keeps stops tight while staying
+under the broker's modify rate limits.
+"""
+
+import logging
+import threading
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+
+from backtesting.scalper.strategy import TRAILING_STEP, trailed_price
+from backtesting.scalper.latency import now as perf_ns
+
+MIN_STEP_TICKS = 2         # Smallest leg move, in ticks, worth a modify_order
+MAX_WORKERS = 4            # Upper bound on simultaneous modify requests
+DEFAULT_TICK_SIZE = 0.05
+
+
+def _leg_kind(row):
+    """'SL' or 'TP' for a live bracket exit leg, else None."""
+    try:
+        snoordt = int(float(row['snoordt']))
+    except (TypeError, ValueError):
+        return None
+    if row['status'] == 'TRIGGER_PENDING' and snoordt == 1:
+        return 'SL'
+    if row['status'] == 'OPEN' and snoordt == 0:
+        return 'TP'
+    return None
+
+
+class TrailingStopEngine:
+    """
+    Trails bracket exit legs on every tick with coalesced modifications.
+
+    :param api:             NorenApi-like client used for modify_order
+    :param step:            trailing distance as a fraction of LTP
+    :param min_step_ticks:  smallest move, in ticks, that triggers a modify
+    :param latency:         optional LatencyTracker for modify round trips
+    """
+
+    def __init__(self, api, step=TRAILING_STEP, min_step_ticks=MIN_STEP_TICKS,
+                 latency=None, max_workers=MAX_WORKERS):
+        self.api = api
+        self.step = step
+        self.min_step_ticks = min_step_ticks
+        self.latency = latency
+
+        self._legs = {}            # norenordno -> leg state
+        self._by_token = {}        # token -> set of norenordno
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='trailing')
+        self._closed = False        # Set by close(); no modify is submitted afterwards
+        self.sent = 0
+        self.coalesced = 0
+
+    # ------------------------------------------------------------------
+    # Leg tracking
+    # ------------------------------------------------------------------
+
+    def sync(self, order_df):
+        """
+        Track live exit legs from the order book and drop finished ones.
+
+        Broker prices are adopted only for legs without a modify in flight,
+        so an acknowledged modify is never overwritten by a stale row.
+        """
+        live = set()
+        with self._lock:
+            for _, row in order_df.iterrows():
+                kind = _leg_kind(row)
+                if kind is None:
+                    continue
+                orderno = row['norenordno']
+                price = float(row['trgprc'] if kind == 'SL' else row['prc'])
+                live.add(orderno)
+
+                leg = self._legs.get(orderno)
+                if leg is None:
+                    tick_size = float(row['ti']) if not pd.isna(row['ti']) else DEFAULT_TICK_SIZE
+                    token = str(row['token'])
+                    self._legs[orderno] = {
+                        'orderno': orderno, 'kind': kind, 'token': token,
+                        'exch': row['exch'], 'tsym': row['tsym'], 'qty': row['rqty'],
+                        'trantype': row['trantype'], 'tick_size': tick_size,
+                        'price': price, 'in_flight': None, 'pending': None
+                    }
+                    self._by_token.setdefault(token, set()).add(orderno)
+                elif leg['in_flight'] is None:
+                    leg['price'] = price
+
+            for orderno in [o for o in self._legs if o not in live]:
+                leg = self._legs.pop(orderno)
+                self._by_token.get(leg['token'], set()).discard(orderno)
+
+    # ------------------------------------------------------------------
+    # Ticks
+    # ------------------------------------------------------------------
+
+    def on_tick(self, tick_data):
+        """Re-trail the legs of the tick's token; call from the feed callback."""
+        ordernos = self._by_token.get(tick_data.get('tk'))
+        if not ordernos or 'lp' not in tick_data:
+            return
+        try:
+            ltp = float(tick_data['lp'])
+        except (TypeError, ValueError):
+            return
+
+        with self._lock:
+            for orderno in list(ordernos):
+                leg = self._legs.get(orderno)
+                if leg is None:
+                    continue
+                # Trail from the most favourable level already live or on its way
+                reference = leg['in_flight'] if leg['in_flight'] is not None else leg['price']
+                new_price = trailed_price(leg['trantype'], ltp, reference, leg['tick_size'], self.step)
+                if new_price is None or \
+                        abs(new_price - reference) < self.min_step_ticks * leg['tick_size'] - 1e-9:
+                    continue
+                new_price = round(new_price, 2)
+
+                if leg['in_flight'] is not None:
+                    if leg['pending'] is not None:
+                        self.coalesced += 1
+                    leg['pending'] = new_price    # Sent once the in-flight modify returns
+                    continue
+                self._submit(leg, new_price)
+
+    # ------------------------------------------------------------------
+    # Modifications
+    # ------------------------------------------------------------------
+
+    def _submit(self, leg, price):
+        """Send a modify for leg; the caller holds the lock."""
+        if self._closed:
+            leg['in_flight'] = leg['pending'] = None
+            return
+        leg['in_flight'] = price
+        leg['pending'] = None
+        self.sent += 1
+        self._pool.submit(self._modify, leg, price)
+
+    def _modify(self, leg, price):
+        args = {
+            'exchange': leg['exch'],
+            'tradingsymbol': leg['tsym'],
+            'orderno': leg['orderno'],
+            'newquantity': leg['qty'],
+        }
+        if leg['kind'] == 'SL':
+            args.update(newprice_type='SL-MKT', newprice=0.00, newtrigger_price=price)
+        else:
+            args.update(newprice_type='LMT', newprice=price)
+
+        started_ns = perf_ns()
+        if self.latency is not None and leg['kind'] == 'SL':
+            self.latency.close(leg['token'], 'fill', 'fill_to_sl_modify', started_ns)
+
+        try:
+            ret = self.api.modify_order(**args)
+        except Exception as e:
+            logging.error(f"Trailing modify for order {leg['orderno']} failed: {e}")
+            ret = None
+
+        if self.latency is not None:
+            self.latency.record('modify_to_ack', started_ns)
+
+        acked = bool(ret) and ret.get('stat') == 'Ok'
+        if acked:
+            logging.info(f"Trailed {leg['kind']} leg of order {leg['orderno']} to {price}")
+        else:
+            logging.info(f"Trailing modify for order {leg['orderno']} not accepted: {ret}")
+
+        with self._lock:
+            if acked:
+                leg['price'] = price
+            leg['in_flight'] = None
+            pending = leg['pending']
+            if pending is not None and leg['orderno'] in self._legs and \
+                    abs(pending - leg['price']) >= self.min_step_ticks * leg['tick_size'] - 1e-9:
+                self._submit(leg, pending)
+            else:
+                leg['pending'] = None
+
+    def close(self):
+        """Wait for modifications in flight and stop the worker threads."""
+        with self._lock:
+            self._closed = True
+        self._pool.shutdown(wait=True)
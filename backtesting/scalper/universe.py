@@ -0,0 +1,161 @@
+"""
+Pre-market trading universe for the scalper.
+
+Joins the Shoonya symbol master (tokens, tick and lot sizes) with previous
+closes and liquidity statistics, filters it to the tradable price band and
+ranks it by median traded value. The result is written once before the open
+to a small versioned CSV, so the bot loads it in milliseconds and subscribes
+straight away instead of cleaning a stale CSV after the 09:14 wait.
+
+Previous closes come from the broker's quotes when an API client is given,
+else from the last daily candle on disk. Liquidity always comes from the
+daily candles (data/fetchers/equity/hd_equity.py).
+
+Usage:
+    python backtesting/scalper/universe.py            # candles only
+    python backtesting/scalper/universe.py --quotes   # previous close from Shoonya
+"""
+
+import os
+import sys
+import glob
+import logging
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+UNIVERSE_VERSION = 1            # Bump when the file layout changes
+UNIVERSE_FOLDER = os.path.join('data', 'storage', 'universe')
+SYMBOL_MASTER = os.path.join('broker', 'shoonya', 'NSE_symbols.txt')
+HISTORY_FOLDER = os.path.join('data', 'storage', 'raw', 'equity', 'zerodha', '2015-2025', 'day')
+
+TOTAL_STOCKS_FOR_SCAN = 990     # Most liquid stocks kept in the universe
+MIN_STOCK_PRICE = 50            # Minimum previous close
+MAX_STOCK_PRICE = 200           # Maximum previous close
+LIQUIDITY_DAYS = 20             # Sessions used for the liquidity statistics
+QUOTE_WORKERS = 16              # Parallel get_quotes calls when using the broker
+
+COLUMNS = ['Rank', 'EXCHANGE', 'TOKEN', 'Trading Symbol', 'Symbol', 'Tick Size', 'Lot Size',
+           'Prev Close', 'LTP', 'Median Traded Value', 'Avg Volume']
+
+
+def load_symbol_master(path=SYMBOL_MASTER):
+    """Equity (EQ series) rows of a Shoonya symbol master file."""
+    master = pd.read_csv(path)
+    master = master[master['Instrument'] == 'EQ']
+    return pd.DataFrame({
+        'EXCHANGE': master['Exchange'],
+        'TOKEN': master['Token'].astype(int),
+        'Trading Symbol': master['TradingSymbol'],
+        'Symbol': master['Symbol'],
+        'Tick Size': pd.to_numeric(master['TickSize'], errors='coerce').fillna(0.05),
+        'Lot Size': master['LotSize'].astype(int)
+    }).reset_index(drop=True)
+
+
+def liquidity_stats(history_folder=HISTORY_FOLDER, days=LIQUIDITY_DAYS):
+    """
+    Per-symbol statistics over the last `days` daily candles.
+
+    Candle files are named XXXX_SYMBOL.csv with Date, Close and Volume
+    columns, as written by hd_equity.py.
+    """
+    rows = []
+    for path in glob.glob(os.path.join(history_folder, '*.csv')):
+        symbol = os.path.splitext(os.path.basename(path))[0].split('_', 1)[-1]
+        try:
+            candles = pd.read_csv(path, usecols=['Date', 'Close', 'Volume']).tail(days)
+        except (ValueError, pd.errors.EmptyDataError) as e:
+            logging.info(f"Skipping {path}: {e}")
+            continue
+        if candles.empty:
+            continue
+        traded_value = candles['Close'] * candles['Volume']
+        rows.append({
+            'Symbol': symbol,
+            'Last Close': float(candles['Close'].iloc[-1]),
+            'Median Traded Value': float(traded_value.median()),
+            'Avg Volume': float(candles['Volume'].mean())
+        })
+    return pd.DataFrame(rows, columns=['Symbol', 'Last Close', 'Median Traded Value', 'Avg Volume'])
+
+
+def fetch_prev_close(api, universe, workers=QUOTE_WORKERS):
+    """Previous close per row from the broker's quotes, NaN where unavailable."""
+    def prev_close(exchange, token):
+        try:
+            quote = api.get_quotes(exchange=exchange, token=str(token))
+            return float(quote['c']) if quote and quote.get('c') else float('nan')
+        except Exception as e:
+            logging.info(f"Quote for {exchange}|{token} failed: {e}")
+            return float('nan')
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(prev_close, universe['EXCHANGE'], universe['TOKEN']))
+
+
+def universe_path(date=None, folder=UNIVERSE_FOLDER, version=UNIVERSE_VERSION):
+    date = date or datetime.now().strftime('%Y%m%d')
+    return os.path.join(folder, f"universe_{date}_v{version}.csv")
+
+
+def build_universe(api=None, symbol_master=SYMBOL_MASTER, history_folder=HISTORY_FOLDER,
+                   min_price=MIN_STOCK_PRICE, max_price=MAX_STOCK_PRICE,
+                   size=TOTAL_STOCKS_FOR_SCAN, days=LIQUIDITY_DAYS, date=None, folder=UNIVERSE_FOLDER):
+    """
+    Build, rank and write today's universe.
+
+    :param api:     optional NorenApi-like client for previous closes
+    :return:        (universe DataFrame, path written)
+    """
+    master = load_symbol_master(symbol_master)
+    stats = liquidity_stats(history_folder, days)
+    universe = master.merge(stats, on='Symbol', how='inner')
+
+    if api is not None:
+        universe['Prev Close'] = fetch_prev_close(api, universe)
+        universe['Prev Close'] = universe['Prev Close'].fillna(universe['Last Close'])
+    else:
+        universe['Prev Close'] = universe['Last Close']
+
+    universe = universe[universe['Prev Close'].between(min_price, max_price) &
+                        (universe['Median Traded Value'] > 0)]
+    universe = universe.sort_values('Median Traded Value', ascending=False).head(size)
+    universe = universe.reset_index(drop=True)
+    universe['Rank'] = universe.index + 1
+    universe['LTP'] = universe['Prev Close']    # Same column the legacy tradable_equity.csv used
+    universe = universe[COLUMNS].round({'Prev Close': 2, 'LTP': 2,
+                                        'Median Traded Value': 0, 'Avg Volume': 0})
+
+    path = universe_path(date, folder)
+    os.makedirs(folder, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    universe.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return universe, path
+
+
+def load_universe(date=None, folder=UNIVERSE_FOLDER, version=UNIVERSE_VERSION):
+    """
+    Load the universe built for a date (default today).
+
+    :return:    (universe DataFrame, path)
+    :raises FileNotFoundError:  if no universe of this version was built for the date
+    """
+    path = universe_path(date, folder, version)
+    universe = pd.read_csv(path, dtype={'TOKEN': int})
+    return universe, path
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+    client = None
+    if '--quotes' in sys.argv[1:]:
+        from broker.shoonya.config import api as client
+
+    universe_df, written = build_universe(api=client)
+    logging.info(f"Wrote {len(universe_df)} stocks to {written}")
+    logging.info(f"\n{universe_df.head(20).to_string(index=False)}")
@@ -2,7 +2,15 @@ from broker.shoonya.config import *
 import pandas as pd
 import logging
 
+from broker.shoonya.exit_engine import plan_exit, execute_exit
+
 def exitallpositions():
+    """
+    Flatten the book concurrently.
+
+    :return:    dict of orderno -> ack (see exit_engine.execute_exit), or None when every
+                order is already COMPLETE/REJECTED; the caller decides whether to stop
+    """
 
     logging.info("MTM breached Take Profit😎")
 
@@ -19,50 +27,18 @@ def exitallpositions():
     order_df = pd.DataFrame(orderbook, columns=orderbook_columns)
 
     if (order_df['status'].isin(['COMPLETE', 'REJECTED'])).all():
-        logging.info("\nAll positions are Squarred-Off, Exited the program.")
-        exit()
+        logging.info("\nAll positions are Squarred-Off.")
+        return None
 
     else:
-        # Iterate through the complete DataFrame
-        for _, row in order_df.iterrows():
-                try:
-                    fillshares = row['fillshares']
-                    trantype = row['trantype']
-                    
-                    if trantype == 'B':
-                        lp = 1.001
-                    else:
-                        lp = 0.999
-
-                    if not pd.isna(row['snonum']) and row['status'] != 'REJECTED' and row['status'] != 'COMPLETE':                      # Trailing Open SL-Orders
-                        quote_info = api.get_quotes(exchange=row['exch'], token=row['token'])
-                        ltp = round(float(quote_info.get("lp", 0)), 2)
-                        exchange = row['exch']
-                        rqty = row['rqty']
-                        exchange = row['exch']     # Exchange
-                        tsym = row['tsym']         # Trading symbol
-                        tick_size = round(float(row['ti']), 2) if not pd.isna(row['ti']) else 0.05                                      # Default tick size if missing
-                        new_price = round(ltp * lp / tick_size) * tick_size,
-
-                        logging.info(f"Trailed order {row['norenordno']} due to MTM breaching take profit")
+        # Work out every modification first, then send them all at once
+        actions = plan_exit(order_df, quotes)
+        acks = execute_exit(api, actions)
 
-                        api.modify_order(
-                            exchange=exchange,
-                            tradingsymbol=tsym,
-                            orderno=row['norenordno'],
-                            newquantity=rqty,
-                            newprice_type='SL-LMT',
-                            newprice = new_price,
-                            newtrigger_price = round(ltp / tick_size) * tick_size
-                        )
-                    
-                    elif (fillshares == 0) and pd.isna(row['snonum']) and row['status'] != "REJECTED" and row['status'] == "OPEN":      # Cancel unfilled orders
-                        try:
-                            api.cancel_order(orderno=row['norenordno'])
-                            logging.info(f"Canceled unfilled order {row['norenordno']} due to MTM reaching")
-                        except Exception as e:
-                            logging.error(f"Failed to cancel order {row['norenordno']}: {e}")
-                            continue  # Skip further processing for this order
+        failed = [orderno for orderno, ack in acks.items() if not ack['acked']]
+        if failed:
+            logging.error(f"Failed to exit orders {failed}")
+        else:
+            logging.info(f"Exit sent for {len(acks)} orders due to MTM breaching take profit")
 
-                except Exception as e:
-                            logging.error("Failed to exit all the positions")
\ No newline at end of file
+        return acks
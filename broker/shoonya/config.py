@@ -2,15 +2,19 @@ from NorenRestApiPy.NorenApi import *
 import logging
 import pyotp
 import os
+import tempfile
 from dotenv import load_dotenv
 
+# Before the broker modules, so their environment settings see .env values
 load_dotenv()
 
+from broker.shoonya.session import LazyShoonyaClient
+from broker.shoonya.quote_cache import QuoteCache
+from broker.shoonya.order_book import OrderBook
+
 class ShoonyaApiPy(NorenApi):
     def __init__(self):
         NorenApi.__init__(self, host='https://api.shoonya.com/NorenWClientTP/', websocket='wss://api.shoonya.com/NorenWSTP/')
-        global api
-        api = self
 
     # Expose the WebSocket instance
     @property
@@ -19,38 +23,59 @@ class ShoonyaApiPy(NorenApi):
 
 logging.basicConfig(level=logging.INFO)  # Enable debug to see request and responses
 
-api = ShoonyaApiPy()  # Start of our program
+def password():
+    # Enough to reuse a stored session, no TOTP needed
+    return os.getenv('SHOONYA_PWD')
 
-def login():
+def credentials():
     # Generation of TOTP and Initializing it to "otp"
     token = os.getenv('SHOONYA_TOTP_TOKEN')  # Token to generate totp
     otp = pyotp.TOTP(token).now()  # TOTP is generated & loaded into otp variable
 
     # Login credentials from environment variables
-    user = os.getenv('SHOONYA_USER')
-    pwd = os.getenv('SHOONYA_PWD')
-    vc = os.getenv('SHOONYA_VC')
-    app_key = os.getenv('SHOONYA_APP_KEY')
-    imei = os.getenv('SHOONYA_IMEI')
-
-    # print(user, pwd, otp, vc, app_key, imei)
-
-    # Calling Login Method on api Instance (created at the start of the program)
-    ret = api.login(userid=user, password=pwd, twoFA=otp, vendor_code=vc, api_secret=app_key, imei=imei)
-    if ret and ret.get('stat') == 'Ok':
-        logging.info("Login successful")
-        return ret
-    else:
-        logging.error(f"Login failed: {ret}")
-        return None
-    return ret
+    return {
+        'userid': os.getenv('SHOONYA_USER'),
+        'password': password(),
+        'twoFA': otp,
+        'vendor_code': os.getenv('SHOONYA_VC'),
+        'api_secret': os.getenv('SHOONYA_APP_KEY'),
+        'imei': os.getenv('SHOONYA_IMEI')
+    }
+
+def mock_credentials():
+    return {'userid': 'MOCK', 'password': '', 'twoFA': '', 'vendor_code': '', 'api_secret': '', 'imei': ''}
+
+def mock_password():
+    return ''
+
+def mock_client():
+    # Offline broker for benchmarks and end-to-end tests, tuned via environment
+    from broker.shoonya.mock_api import MockNorenApi
+    return MockNorenApi(latency=float(os.getenv('SHOONYA_MOCK_LATENCY_MS', '0')) / 1000,
+                        tick_rate=int(os.getenv('SHOONYA_MOCK_TICK_RATE', '1000')),
+                        seed=int(os.getenv('SHOONYA_MOCK_SEED', '0')),
+                        reject_rate=float(os.getenv('SHOONYA_MOCK_REJECT_RATE', '0')))
+
+# Logs in lazily on first use and reuses today's session token across restarts
+if os.getenv('SHOONYA_MOCK') == '1':
+    api = LazyShoonyaClient(mock_client, mock_credentials, mock_password,
+                            session_file=os.path.join(tempfile.gettempdir(), 'shoonya_mock_session.json'))
+else:
+    api = LazyShoonyaClient(ShoonyaApiPy, credentials, password)  # Start of our program
+
+# Latest LTP per instrument, filled by the websocket feed callback
+quotes = QuoteCache(api)
+
+# Local order book and positions, filled by the order-update callback
+orders = OrderBook(api, quotes)
+
+def login():
+    """Force a fresh login, replacing any stored session."""
+    return api.login()
 
 def logout():
     api.logout()
 
-val = login()
-print(val)
-
 def start_websocket(order_update_callback, subscribe_callback, socket_open_callback):
     api.start_websocket(order_update_callback=order_update_callback,
                         subscribe_callback=subscribe_callback,
@@ -65,9 +90,11 @@ def subscribe_instruments(instruments):
 
 # Event handlers
 def event_handler_feed_update(tick_data):
+    quotes.update(tick_data)
     print(f"Feed update: {tick_data}")
 
 def event_handler_order_update(tick_data):
+    orders.on_order_update(tick_data)
     print(f"Order update: {tick_data}")
 
 feed_opened = False
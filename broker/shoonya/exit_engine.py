@@ -0,0 +1,111 @@
+"""
+Concurrent order-exit engine.
+
+All modifications and cancellations needed to flatten the book are computed
+first from the order book and the quote cache, then sent in parallel through
+a thread pool so the whole exit costs roughly one broker round-trip.
+"""
+
+import time
+import logging
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_WORKERS = 16      # Upper bound on simultaneous broker requests
+MAX_RETRIES = 2       # Extra attempts per order after the first failure
+RETRY_DELAY = 0.2     # Seconds between attempts for the same order
+
+
+def plan_exit(order_df, quotes):
+    """
+    Build the list of broker actions that flatten every open order.
+
+    :param order_df:    order book DataFrame (norenordno, exch, tsym, token, ...)
+    :param quotes:      QuoteCache used for the LTP of each leg
+
+    :return:            list of (orderno, method name, keyword arguments) tuples; open
+                        SL orders without a valid LTP are logged and left out
+    """
+    actions = []
+
+    # Every leg's LTP up front, stale quotes refreshed concurrently
+    open_sl = order_df[~order_df['status'].isin(('REJECTED', 'COMPLETE', 'CANCELED')) & order_df['snonum'].notna()]
+    prices = quotes.ltps(zip(open_sl['exch'], open_sl['token']))
+
+    for _, row in order_df.iterrows():
+        try:
+            if row['status'] in ('REJECTED', 'COMPLETE', 'CANCELED'):
+                continue
+
+            orderno = row['norenordno']
+
+            if not pd.isna(row['snonum']):                                  # Trailing Open SL-Orders
+                lp = 1.001 if row['trantype'] == 'B' else 0.999
+                ltp = prices.get((row['exch'], row['token']))
+                if ltp is None:
+                    logging.error(f"No valid LTP for {row['tsym']}, order {orderno} not modified")
+                    continue
+                ltp = round(ltp, 2)
+                tick_size = round(float(row['ti']), 2) if not pd.isna(row['ti']) else 0.05      # Default tick size if missing
+
+                actions.append((orderno, 'modify_order', {
+                    'exchange': row['exch'],
+                    'tradingsymbol': row['tsym'],
+                    'orderno': orderno,
+                    'newquantity': row['rqty'],
+                    'newprice_type': 'SL-LMT',
+                    'newprice': round(round(ltp * lp / tick_size) * tick_size, 2),
+                    'newtrigger_price': round(round(ltp / tick_size) * tick_size, 2)
+                }))
+
+            elif row['fillshares'] == 0 and row['status'] == 'OPEN':       # Cancel unfilled orders
+                actions.append((orderno, 'cancel_order', {'orderno': orderno}))
+
+        except Exception as e:
+            logging.error(f"Failed to plan exit for order {row.get('norenordno')}: {e}")
+
+    return actions
+
+
+def _send(api, orderno, method, kwargs, retries, retry_delay):
+    """Send one action, retrying until the broker acknowledges it."""
+    ret = None
+    for attempt in range(retries + 1):
+        try:
+            ret = getattr(api, method)(**kwargs)
+        except Exception as e:
+            logging.error(f"{method} for order {orderno} failed on attempt {attempt + 1}: {e}")
+            ret = None
+
+        if ret and ret.get('stat') == 'Ok':
+            return True, ret
+        if attempt < retries:
+            time.sleep(retry_delay)
+
+    return False, ret
+
+
+def execute_exit(api, actions, max_workers=MAX_WORKERS, retries=MAX_RETRIES, retry_delay=RETRY_DELAY):
+    """
+    Send all exit actions concurrently.
+
+    :return:    dict of orderno -> {'method', 'acked', 'response'} for every action
+    """
+    if not actions:
+        return {}
+
+    acks = {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(actions))) as pool:
+        futures = {
+            orderno: (method, pool.submit(_send, api, orderno, method, kwargs, retries, retry_delay))
+            for orderno, method, kwargs in actions
+        }
+        for orderno, (method, future) in futures.items():
+            acked, response = future.result()
+            acks[orderno] = {'method': method, 'acked': acked, 'response': response}
+            if acked:
+                logging.info(f"{method} acknowledged for order {orderno}")
+            else:
+                logging.error(f"{method} not acknowledged for order {orderno}: {response}")
+
+    return acks
@@ -0,0 +1,425 @@
+"""
+Offline stand-in for the NorenApi client.
+
+MockNorenApi exposes the part of the NorenApi surface the bots use (login,
+get_limits, start_websocket/subscribe with SNAPQUOTE depth ticks, place,
+modify and cancel orders, order book, positions and quotes) backed by a
+seeded in-process market. REST latency, tick rate and fill behaviour are
+configurable so the trading loops can be benchmarked and tested offline.
+
+Select it for any script importing broker.shoonya.config with
+SHOONYA_MOCK=1 (see config.py for the tuning variables).
+
+It replaces the NorenApi object in-process rather than serving the Shoonya
+REST and websocket protocols on localhost. NorenApi's own HTTP request
+building, JSON parsing and websocket handling are therefore not exercised,
+and the latency setting is a sleep per call, not real network I/O. Use it
+to test and benchmark the trading logic, not the broker client library.
+"""
+
+import time
+import random
+import logging
+import threading
+from datetime import datetime
+
+DEPTH_LEVELS = 5
+
+
+class MockNorenApi:
+    """
+    Deterministic simulated Shoonya broker.
+
+    :param latency:         seconds added to every REST call, or a (min, max) tuple for jitter
+    :param tick_rate:       total websocket ticks per second across all subscribed tokens
+    :param seed:            random seed for prices, depth and fills
+    :param cash:            cash reported by get_limits
+    :param reject_rate:     probability that place_order is rejected by the "exchange"
+    :param full_ticks:      send full depth on every tick instead of partial updates
+    :param instruments:     optional list of dicts with exchange, token, tsym, ltp and ti
+    """
+
+    def __init__(self, latency=0.0, tick_rate=1000, seed=0, cash=100000.0,
+                 reject_rate=0.0, full_ticks=False, instruments=None):
+        self.latency = latency
+        self.tick_rate = tick_rate
+        self.cash = cash
+        self.reject_rate = reject_rate
+        self.full_ticks = full_ticks
+
+        self._rng = random.Random(seed)
+        self._lock = threading.RLock()
+        self._instruments = {}      # "EXCH|TOKEN" -> market state
+        self._subscribed = []
+        self._orders = {}           # norenordno -> order row
+        self._positions = {}        # "EXCH|TOKEN" -> position state
+        self._next_orderno = 1
+        self._susertoken = None
+
+        self._feed_thread = None
+        self._feed_running = False
+        self._subscribe_callback = None
+        self._order_update_callback = None
+        self._socket_close_callback = None
+
+        for inst in instruments or []:
+            self._add_instrument(inst['exchange'], str(inst['token']), inst.get('tsym'),
+                                 float(inst['ltp']), float(inst.get('ti', 0.05)))
+
+    # ------------------------------------------------------------------
+    # Simulated market
+    # ------------------------------------------------------------------
+
+    def _sleep_latency(self):
+        latency = self.latency
+        if isinstance(latency, (tuple, list)):
+            latency = self._rng.uniform(*latency)
+        if latency > 0:
+            time.sleep(latency)
+
+    def _add_instrument(self, exchange, token, tsym=None, ltp=None, ti=0.05):
+        key = f"{exchange}|{token}"
+        if key not in self._instruments:
+            ltp = ltp if ltp is not None else round(self._rng.uniform(50, 200) / ti) * ti
+            self._instruments[key] = {
+                'e': exchange, 'tk': token, 'ts': tsym or f"MOCK{token}-EQ",
+                'lp': round(ltp, 2), 'ti': ti, 'depth': self._random_depth()
+            }
+        return self._instruments[key]
+
+    def _instrument(self, exchange=None, token=None, tsym=None):
+        if tsym is not None and token is None:
+            for inst in self._instruments.values():
+                if inst['ts'] == tsym and (exchange is None or inst['e'] == exchange):
+                    return inst
+            token = tsym
+        return self._add_instrument(exchange or 'NSE', str(token))
+
+    def _random_depth(self):
+        depth = {f"bq{i}": self._rng.randint(1, 5000) for i in range(1, DEPTH_LEVELS + 1)}
+        depth.update({f"sq{i}": self._rng.randint(1, 5000) for i in range(1, DEPTH_LEVELS + 1)})
+        depth['tbq'] = sum(depth[f"bq{i}"] for i in range(1, DEPTH_LEVELS + 1)) + self._rng.randint(0, 50000)
+        depth['tsq'] = sum(depth[f"sq{i}"] for i in range(1, DEPTH_LEVELS + 1)) + self._rng.randint(0, 50000)
+        return depth
+
+    def _tick_fields(self, inst, full):
+        tick = {'t': 'dk' if full else 'df', 'e': inst['e'], 'tk': inst['tk']}
+        depth = inst['depth']
+        if full:
+            fields = list(depth)
+        else:
+            fields = self._rng.sample(list(depth), self._rng.randint(1, 4))
+        tick['lp'] = f"{inst['lp']:.2f}"
+        for field in fields:
+            tick[field] = str(depth[field])
+        if full:
+            tick['ts'] = inst['ts']
+            tick['ti'] = f"{inst['ti']:.2f}"
+            for i in range(1, DEPTH_LEVELS + 1):
+                tick[f"bp{i}"] = f"{inst['lp'] - i * inst['ti']:.2f}"
+                tick[f"sp{i}"] = f"{inst['lp'] + i * inst['ti']:.2f}"
+        return tick
+
+    def _step(self, inst):
+        """Move price by at most one tick and perturb a few depth fields."""
+        inst['lp'] = round(max(inst['ti'], inst['lp'] + inst['ti'] * self._rng.choice((-1, 0, 1))), 2)
+        depth = inst['depth']
+        for field in self._rng.sample(list(depth), 3):
+            depth[field] = max(1, depth[field] + self._rng.randint(-500, 500))
+
+    def _run_feed(self):
+        start = time.monotonic()
+        sent = 0
+        while self._feed_running:
+            due = int((time.monotonic() - start) * self.tick_rate)
+            if due <= sent or not self._subscribed:
+                time.sleep(min(0.001, 1.0 / max(self.tick_rate, 1)))
+                continue
+
+            while sent < due and self._feed_running:
+                with self._lock:
+                    if not self._subscribed:
+                        break
+                    inst = self._instruments[self._subscribed[sent % len(self._subscribed)]]
+                    self._step(inst)
+                    tick = self._tick_fields(inst, self.full_ticks)
+                    self._match_orders(inst)
+                if self._subscribe_callback:
+                    self._subscribe_callback(tick)
+                sent += 1
+
+    # ------------------------------------------------------------------
+    # Orders and fills
+    # ------------------------------------------------------------------
+
+    def _notify_order(self, order):
+        if self._order_update_callback:
+            update = {'t': 'om', 'norenordno': order['norenordno'], 'status': order['status'],
+                      'tk': order['token'], 'exch': order['exch'], 'tsym': order['tsym'],
+                      'trantype': order['trantype'], 'qty': order['qty'],
+                      'fillshares': order['fillshares'], 'flprc': order['avgprc'],
+                      'prc': order['prc'], 'trgprc': order['trgprc'],
+                      'snonum': order['snonum'], 'snoordt': order['snoordt'],
+                      'reporttype': order['status']}
+            self._order_update_callback(update)
+
+    def _new_order(self, inst, trantype, qty, prctyp, prc, trgprc, prd, remarks,
+                   snonum=None, snoordt=None, status='OPEN'):
+        orderno = f"{datetime.now():%y%m%d}{self._next_orderno:09d}"
+        self._next_orderno += 1
+        order = {
+            'norenordno': orderno, 'exch': inst['e'], 'tsym': inst['ts'], 'token': inst['tk'],
+            'qty': str(qty), 'rqty': str(qty), 'trantype': trantype, 'prctyp': prctyp,
+            'prc': f"{prc:.2f}", 'trgprc': f"{trgprc:.2f}" if trgprc else None,
+            'ti': f"{inst['ti']:.2f}", 'prd': prd, 'status': status, 'fillshares': 0,
+            'avgprc': None, 'snonum': snonum, 'snoordt': snoordt, 'remarks': remarks,
+            'rejreason': None, 'ordenttm': str(int(time.time())),
+            'blprc': None, 'bpprc': None
+        }
+        self._orders[orderno] = order
+        return order
+
+    def _fill(self, order, price):
+        qty = int(order['rqty'])
+        order['status'] = 'COMPLETE'
+        order['fillshares'] = qty
+        order['avgprc'] = f"{price:.2f}"
+
+        key = f"{order['exch']}|{order['token']}"
+        pos = self._positions.setdefault(key, {'netqty': 0, 'avg': 0.0, 'rpnl': 0.0,
+                                                'exch': order['exch'], 'tsym': order['tsym'],
+                                                'token': order['token']})
+        signed = qty if order['trantype'] == 'B' else -qty
+        if pos['netqty'] == 0 or (pos['netqty'] > 0) == (signed > 0):
+            total = pos['netqty'] + signed
+            pos['avg'] = (pos['avg'] * abs(pos['netqty']) + price * qty) / abs(total)
+            pos['netqty'] = total
+        else:
+            closed = min(qty, abs(pos['netqty']))
+            direction = 1 if pos['netqty'] > 0 else -1
+            pos['rpnl'] += (price - pos['avg']) * closed * direction
+            pos['netqty'] += signed
+            if pos['netqty'] == 0:
+                pos['avg'] = 0.0
+            elif (pos['netqty'] > 0) != (direction > 0):
+                pos['avg'] = price
+
+        self._notify_order(order)
+
+        if order['prd'] == 'H' and order['snonum'] is None:
+            self._open_bracket_legs(order, price)
+        elif order['snonum'] is not None:
+            # One leg of a bracket filled, cancel its sibling
+            for other in self._orders.values():
+                if (other['snonum'] == order['snonum'] and other is not order
+                        and other['status'] in ('OPEN', 'TRIGGER_PENDING')):
+                    other['status'] = 'CANCELED'
+                    self._notify_order(other)
+
+    def _open_bracket_legs(self, parent, price):
+        inst = self._instrument(parent['exch'], parent['token'])
+        exit_side = 'S' if parent['trantype'] == 'B' else 'B'
+        sign = 1 if parent['trantype'] == 'B' else -1
+
+        if parent['bpprc']:
+            target = round(price + sign * float(parent['bpprc']), 2)
+            leg = self._new_order(inst, exit_side, parent['qty'], 'LMT', target, None, 'H',
+                                  parent['remarks'], snonum=parent['norenordno'], snoordt='0')
+            self._notify_order(leg)
+        if parent['blprc']:
+            trigger = round(price - sign * float(parent['blprc']), 2)
+            leg = self._new_order(inst, exit_side, parent['qty'], 'SL-MKT', 0.0, trigger, 'H',
+                                  parent['remarks'], snonum=parent['norenordno'], snoordt='1',
+                                  status='TRIGGER_PENDING')
+            self._notify_order(leg)
+
+    def _match_orders(self, inst):
+        ltp = inst['lp']
+        for order in list(self._orders.values()):
+            if order['token'] != inst['tk'] or order['exch'] != inst['e']:
+                continue
+            if order['status'] == 'OPEN':
+                prc = float(order['prc'])
+                if order['prctyp'] == 'MKT':
+                    self._fill(order, ltp)
+                elif (order['trantype'] == 'B' and ltp <= prc) or (order['trantype'] == 'S' and ltp >= prc):
+                    self._fill(order, prc)
+            elif order['status'] == 'TRIGGER_PENDING':
+                trg = float(order['trgprc'])
+                if (order['trantype'] == 'B' and ltp >= trg) or (order['trantype'] == 'S' and ltp <= trg):
+                    if order['prctyp'] == 'SL-LMT':
+                        order['status'] = 'OPEN'
+                        order['prctyp'] = 'LMT'
+                        self._notify_order(order)
+                    else:
+                        self._fill(order, ltp)
+
+    # ------------------------------------------------------------------
+    # NorenApi REST surface
+    # ------------------------------------------------------------------
+
+    def login(self, userid, password, twoFA, vendor_code, api_secret, imei):
+        self._sleep_latency()
+        self._susertoken = f"mock-{userid}-{int(time.time())}"
+        return {'stat': 'Ok', 'susertoken': self._susertoken, 'uname': userid, 'actid': userid,
+                'request_time': datetime.now().strftime('%H:%M:%S %d-%m-%Y')}
+
+    def set_session(self, userid, password, usertoken):
+        self._susertoken = usertoken
+        return True
+
+    def logout(self):
+        self._sleep_latency()
+        self._susertoken = None
+        return {'stat': 'Ok'}
+
+    def get_limits(self, product_type=None, segment=None, exchange=None):
+        self._sleep_latency()
+        return {'stat': 'Ok', 'cash': f"{self.cash:.2f}", 'payin': '0.00', 'marginused': '0.00'}
+
+    def get_quotes(self, exchange, token):
+        self._sleep_latency()
+        with self._lock:
+            inst = self._instrument(exchange, token)
+            quote = self._tick_fields(inst, True)
+        quote['stat'] = 'Ok'
+        return quote
+
+    def place_order(self, buy_or_sell, product_type, exchange, tradingsymbol, quantity,
+                    discloseqty, price_type, price=0.0, trigger_price=None, retention='DAY',
+                    amo='NO', remarks=None, bookloss_price=0.0, bookprofit_price=0.0,
+                    trail_price=0.0):
+        self._sleep_latency()
+        with self._lock:
+            inst = self._instrument(exchange, tsym=tradingsymbol)
+            status = 'TRIGGER_PENDING' if price_type in ('SL-LMT', 'SL-MKT') else 'OPEN'
+            order = self._new_order(inst, buy_or_sell, int(quantity), price_type, float(price or 0),
+                                    float(trigger_price) if trigger_price else None,
+                                    product_type, remarks, status=status)
+            order['blprc'] = f"{float(bookloss_price):.2f}" if bookloss_price else None
+            order['bpprc'] = f"{float(bookprofit_price):.2f}" if bookprofit_price else None
+
+            if self._rng.random() < self.reject_rate:
+                order['status'] = 'REJECTED'
+                order['rejreason'] = 'RED:Margin Shortfall (mock)'
+            self._notify_order(order)
+            if order['status'] == 'OPEN' and price_type == 'MKT':
+                self._fill(order, inst['lp'])
+
+        return {'stat': 'Ok', 'norenordno': order['norenordno'],
+                'request_time': datetime.now().strftime('%H:%M:%S %d-%m-%Y')}
+
+    def modify_order(self, orderno, exchange, tradingsymbol, newquantity, newprice_type,
+                     newprice=0.0, newtrigger_price=None, bookloss_price=0.0,
+                     bookprofit_price=0.0, trail_price=0.0):
+        self._sleep_latency()
+        with self._lock:
+            order = self._orders.get(orderno)
+            if order is None or order['status'] not in ('OPEN', 'TRIGGER_PENDING'):
+                return None
+            order['rqty'] = str(newquantity)
+            order['prctyp'] = newprice_type
+            order['prc'] = f"{float(newprice or 0):.2f}"
+            if newtrigger_price is not None:
+                order['trgprc'] = f"{float(newtrigger_price):.2f}"
+            order['status'] = 'TRIGGER_PENDING' if newprice_type in ('SL-LMT', 'SL-MKT') else 'OPEN'
+            self._notify_order(order)
+            self._match_orders(self._instrument(order['exch'], order['token']))
+        return {'stat': 'Ok', 'result': orderno}
+
+    def cancel_order(self, orderno):
+        self._sleep_latency()
+        with self._lock:
+            order = self._orders.get(orderno)
+            if order is None or order['status'] not in ('OPEN', 'TRIGGER_PENDING'):
+                return None
+            order['status'] = 'CANCELED'
+            self._notify_order(order)
+        return {'stat': 'Ok', 'result': orderno}
+
+    def get_order_book(self):
+        self._sleep_latency()
+        with self._lock:
+            if not self._orders:
+                return None
+            return [dict(order, stat='Ok') for order in reversed(list(self._orders.values()))]
+
+    def get_positions(self):
+        self._sleep_latency()
+        with self._lock:
+            if not self._positions:
+                return None
+            positions = []
+            for key, pos in self._positions.items():
+                ltp = self._instruments[key]['lp']
+                positions.append({
+                    'stat': 'Ok', 'exch': pos['exch'], 'tsym': pos['tsym'], 'token': pos['token'],
+                    'netqty': str(pos['netqty']), 'netavgprc': f"{pos['avg']:.2f}", 'lp': f"{ltp:.2f}",
+                    'urmtom': f"{(ltp - pos['avg']) * pos['netqty']:.2f}", 'rpnl': f"{pos['rpnl']:.2f}"
+                })
+            return positions
+
+    # ------------------------------------------------------------------
+    # NorenApi websocket surface
+    # ------------------------------------------------------------------
+
+    def start_websocket(self, subscribe_callback=None, order_update_callback=None,
+                        socket_open_callback=None, socket_close_callback=None,
+                        socket_error_callback=None):
+        self._subscribe_callback = subscribe_callback
+        self._order_update_callback = order_update_callback
+        self._socket_close_callback = socket_close_callback
+
+        self._feed_running = True
+        self._feed_thread = threading.Thread(target=self._run_feed, daemon=True)
+        self._feed_thread.start()
+
+        if socket_open_callback:
+            socket_open_callback()
+
+    def close_websocket(self):
+        self._feed_running = False
+        if self._feed_thread:
+            self._feed_thread.join()
+        if self._socket_close_callback:
+            self._socket_close_callback()
+
+    def subscribe(self, instrument, feed_type=None):
+        instruments = instrument if isinstance(instrument, list) else [instrument]
+        snapshots = []
+        with self._lock:
+            for key in instruments:
+                exchange, token = key.split('|')
+                inst = self._add_instrument(exchange, token)
+                if key not in self._subscribed:
+                    self._subscribed.append(key)
+                snapshots.append(self._tick_fields(inst, True))
+
+        # The first message per token is always a full depth snapshot
+        if self._subscribe_callback:
+            for tick in snapshots:
+                self._subscribe_callback(tick)
+
+    def unsubscribe(self, instrument, feed_type=None):
+        instruments = instrument if isinstance(instrument, list) else [instrument]
+        with self._lock:
+            self._subscribed = [key for key in self._subscribed if key not in instruments]
+
+
+if __name__ == '__main__':
+    # Quick throughput check: how many ticks per second a callback receives
+    logging.basicConfig(level=logging.INFO)
+    received = 0
+
+    def on_tick(tick):
+        global received
+        received += 1
+
+    mock = MockNorenApi(tick_rate=20000)
+    mock.start_websocket(subscribe_callback=on_tick)
+    mock.subscribe([f"NSE|{token}" for token in range(1, 991)])
+    received = 0
+    sleep_for = 2.0
+    time.sleep(sleep_for)
+    mock.close_websocket()
+    logging.info(f"Received {received / sleep_for:.0f} ticks/s from 990 tokens")
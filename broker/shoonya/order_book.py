@@ -0,0 +1,280 @@
+"""
+In-process order and position book driven by order-update websocket events.
+
+Order updates from the Shoonya websocket are merged into a local copy of the
+order book, and fills are applied to per-instrument positions as they
+arrive. The book is reconciled with get_order_book/get_positions only every
+RECONCILE_INTERVAL seconds, or straight away when a gap in the event stream
+is detected, so MTM and trailing decisions read local state instead of
+hitting the REST API on every pass.
+
+Reconciliation merges the REST rows into the local book rather than
+replacing it: rows touched by an event that arrived after the fetch started
+are kept, and a REST call that returned nothing (NorenApi returns None both
+for "no data" and for failed or expired calls) leaves the local rows as they
+are and the book marked for another reconciliation.
+"""
+
+import time
+import logging
+import threading
+import pandas as pd
+
+RECONCILE_INTERVAL = 30.0     # Seconds between routine REST reconciliations
+RECONCILE_RETRY = 0.25        # Seconds between REST fallbacks while waiting for an order
+
+TERMINAL_STATUSES = {'REJECTED', 'COMPLETE', 'CANCELED'}
+
+
+def _num(value, default=0.0):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class OrderBook:
+    """
+    Local order book and positions.
+
+    :param api:                 NorenApi-like client used for reconciliation
+    :param quotes:              QuoteCache used to mark open positions to market
+    :param reconcile_interval:  seconds between routine REST reconciliations
+    """
+
+    def __init__(self, api, quotes, reconcile_interval=RECONCILE_INTERVAL):
+        self.api = api
+        self.quotes = quotes
+        self.reconcile_interval = reconcile_interval
+
+        self._orders = {}          # norenordno -> order row
+        self._positions = {}       # "EXCH|TOKEN" -> {'exch', 'token', 'netqty', 'avg', 'rpnl'}
+        self._lock = threading.RLock()
+        self._updated = threading.Condition(self._lock)
+        self._dirty = True          # Nothing loaded yet, reconcile on first use
+        self._last_reconcile = 0.0
+        self._last_attempt = 0.0
+        self._seq = 0               # Order events applied so far
+        self._order_seq = {}        # norenordno -> seq of its latest event
+        self._position_seq = {}     # "EXCH|TOKEN" -> seq of its latest fill
+
+    # ------------------------------------------------------------------
+    # Websocket events
+    # ------------------------------------------------------------------
+
+    def on_order_update(self, update):
+        """Merge one order-update event; call from the order-update callback."""
+        orderno = update.get('norenordno')
+        if not orderno:
+            return
+
+        with self._lock:
+            self._seq += 1
+            self._order_seq[orderno] = self._seq
+            order = self._orders.get(orderno)
+            if order is None:
+                # First sight of an order that is already past its first state
+                # means we missed events for it
+                if update.get('status') not in ('PENDING', 'OPEN', 'TRIGGER_PENDING', 'REJECTED'):
+                    self._dirty = True
+                order = self._orders[orderno] = {'norenordno': orderno, 'fillshares': 0}
+
+            filled_before = int(_num(order.get('fillshares')))
+            for key, value in update.items():
+                if key not in ('t', 'reporttype'):
+                    order[key] = value
+            if 'token' not in order and 'tk' in update:
+                order['token'] = update['tk']
+
+            filled_now = int(_num(order.get('fillshares')))
+            if filled_now > filled_before and order.get('token') is None:
+                self._dirty = True      # Cannot place the fill, let REST fill it in
+            elif filled_now > filled_before:
+                price = _num(update.get('flprc') or update.get('avgprc') or order.get('avgprc'))
+                self._apply_fill(order, filled_now - filled_before, price)
+
+            self._updated.notify_all()
+
+    def mark_gap(self):
+        """Force a REST reconciliation, e.g. after a websocket reconnect."""
+        with self._lock:
+            self._dirty = True
+
+    def _apply_fill(self, order, qty, price):
+        key = f"{order.get('exch')}|{order.get('token')}"
+        self._position_seq[key] = self._seq
+        pos = self._positions.setdefault(key, {'exch': order.get('exch'), 'token': order.get('token'),
+                                                'netqty': 0, 'avg': 0.0, 'rpnl': 0.0})
+        signed = qty if order.get('trantype') == 'B' else -qty
+        netqty = pos['netqty']
+
+        if netqty == 0 or (netqty > 0) == (signed > 0):
+            pos['avg'] = (pos['avg'] * abs(netqty) + price * qty) / abs(netqty + signed)
+            pos['netqty'] = netqty + signed
+            return
+
+        closed = min(qty, abs(netqty))
+        pos['rpnl'] += (price - pos['avg']) * closed * (1 if netqty > 0 else -1)
+        pos['netqty'] = netqty + signed
+        if pos['netqty'] == 0:
+            pos['avg'] = 0.0
+        elif (pos['netqty'] > 0) != (netqty > 0):
+            pos['avg'] = price       # Flipped through zero
+
+    # ------------------------------------------------------------------
+    # REST reconciliation
+    # ------------------------------------------------------------------
+
+    def reconcile(self):
+        """
+        Merge the broker's order book and positions into the local book.
+
+        Returns True if the order book came back. If either call returned
+        nothing, the local rows it would have refreshed are kept and the book
+        stays marked for reconciliation, so a failed or expired call never
+        reads as a flat book. Positions are only taken as empty without a
+        response when the merged orders show no fills.
+        """
+        with self._lock:
+            started_seq = self._seq
+            self._last_attempt = time.monotonic()
+
+        orderbook = self.api.get_order_book()
+        positions = self.api.get_positions()
+
+        with self._lock:
+            complete = True
+
+            if orderbook is not None:
+                for row in orderbook:
+                    orderno = row.get('norenordno')
+                    if orderno and self._order_seq.get(orderno, 0) <= started_seq:
+                        self._orders[orderno] = dict(row)
+            else:
+                complete = False
+
+            if positions is not None:
+                for row in positions:
+                    key = f"{row.get('exch')}|{row.get('token')}"
+                    if self._position_seq.get(key, 0) <= started_seq:
+                        self._positions[key] = {
+                            'exch': row.get('exch'), 'token': row.get('token'),
+                            'netqty': int(_num(row.get('netqty'))),
+                            'avg': _num(row.get('netavgprc')),
+                            'rpnl': _num(row.get('rpnl'))
+                        }
+            elif orderbook is None or any(_num(order.get('fillshares')) for order in self._orders.values()):
+                complete = False
+
+            if complete:
+                self._dirty = False
+                self._last_reconcile = time.monotonic()
+            else:
+                self._dirty = True
+                logging.warning("Order book reconciliation got no "
+                                f"{'order book' if orderbook is None else 'positions'}, keeping local state")
+            self._updated.notify_all()
+            return orderbook is not None
+
+    def maybe_reconcile(self):
+        """
+        Reconcile if a gap was detected or the routine interval has passed.
+
+        An unfinished reconciliation is retried at most every RECONCILE_RETRY
+        seconds.
+        """
+        now = time.monotonic()
+        due = now - self._last_reconcile >= self.reconcile_interval
+        if (self._dirty or due) and now - self._last_attempt >= RECONCILE_RETRY:
+            try:
+                self.reconcile()
+            except Exception as e:
+                logging.error(f"Order book reconciliation failed: {e}")
+
+    # ------------------------------------------------------------------
+    # Readers
+    # ------------------------------------------------------------------
+
+    def wait_for_update(self, timeout=None):
+        """Block until the next order event or reconciliation, or the timeout."""
+        with self._lock:
+            return self._updated.wait(timeout)
+
+    def wait_for_order(self, orderno, timeout=2.0):
+        """
+        Wait for the first event of a just-placed order.
+
+        Falls back to a REST reconciliation if the event has not arrived
+        within half the timeout. A reconciliation that fails or gets no order
+        book is retried every RECONCILE_RETRY seconds while events are still
+        awaited, until the timeout. Returns the order row, or None if the
+        broker does not know it.
+        """
+        started = time.monotonic()
+        deadline = started + timeout
+        fallback_at = started + timeout / 2
+
+        while True:
+            with self._lock:
+                while orderno not in self._orders:
+                    remaining = min(fallback_at, deadline) - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._updated.wait(remaining)
+                order = self._orders.get(orderno)
+
+            if order is not None:
+                return dict(order)
+
+            try:
+                loaded = self.reconcile()
+            except Exception as e:
+                logging.error(f"Order book reconciliation failed while waiting for {orderno}: {e}")
+            else:
+                with self._lock:
+                    order = self._orders.get(orderno)
+                if order is not None:
+                    return dict(order)
+                if loaded:
+                    return None
+
+            if time.monotonic() >= deadline:
+                return None
+            fallback_at = time.monotonic() + RECONCILE_RETRY
+
+    def orders_df(self, columns):
+        """Order book as a DataFrame with the given columns, like get_order_book."""
+        with self._lock:
+            rows = [dict(order) for order in self._orders.values()]
+        return pd.DataFrame(rows, columns=columns)
+
+    def orders_for(self, exchange, token):
+        """Copies of every known order on one instrument."""
+        token = str(token)
+        with self._lock:
+            return [dict(order) for order in self._orders.values()
+                    if str(order.get('token')) == token and order.get('exch') == exchange]
+
+    def net_qty(self, exchange, token):
+        """Signed open quantity of one instrument."""
+        with self._lock:
+            pos = self._positions.get(f"{exchange}|{token}")
+            return pos['netqty'] if pos else 0
+
+    def all_terminal(self):
+        """True when every known order is rejected, complete or canceled."""
+        with self._lock:
+            return all(order.get('status') in TERMINAL_STATUSES for order in self._orders.values())
+
+    def day_mtm(self):
+        """Realized plus unrealized P&L across all positions."""
+        with self._lock:
+            positions = [dict(pos) for pos in self._positions.values()]
+
+        mtm = 0.0
+        for pos in positions:
+            mtm += pos['rpnl']
+            if pos['netqty']:
+                ltp = self.quotes.ltp(pos['exch'], pos['token'])
+                mtm += (ltp - pos['avg']) * pos['netqty']
+        return round(mtm, 2)
@@ -0,0 +1,96 @@
+"""
+Websocket-fed last traded price cache.
+
+Ticks from the Shoonya feed callback are stored per instrument with a
+monotonic receive time. Readers get the cached price while it is fresh and
+fall back to a REST get_quotes call only when the quote is stale or missing.
+"""
+
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+STALE_AFTER = 2.0     # Seconds after which a cached quote is refreshed over REST
+MAX_WORKERS = 16      # Upper bound on simultaneous REST refreshes in ltps()
+
+
+class QuoteCache:
+    """
+    Latest LTP per "EXCHANGE|TOKEN" key.
+
+    :param api:          NorenApi-like client used for the REST fallback
+    :param stale_after:  default maximum quote age in seconds
+    """
+
+    def __init__(self, api, stale_after=STALE_AFTER):
+        self.api = api
+        self.stale_after = stale_after
+        self._quotes = {}    # key -> (ltp, monotonic receive time)
+
+    @staticmethod
+    def key(exchange, token):
+        return f"{exchange}|{token}"
+
+    def update(self, tick_data):
+        """Store the LTP of a websocket tick; call from the feed callback."""
+        lp = tick_data.get('lp')
+        if lp is None or 'tk' not in tick_data or 'e' not in tick_data:
+            return
+        try:
+            # A single dict assignment is atomic under the GIL, so readers on
+            # other threads never see a half-written quote
+            self._quotes[self.key(tick_data['e'], tick_data['tk'])] = (float(lp), time.monotonic())
+        except (ValueError, TypeError):
+            pass
+
+    def _fresh(self, exchange, token, max_age):
+        quote = self._quotes.get(self.key(exchange, token))
+        if quote is not None and time.monotonic() - quote[1] <= max_age:
+            return quote[0]
+        return None
+
+    def _refresh(self, exchange, token):
+        """Fetch the LTP over REST and cache it; None if the broker has no quote."""
+        try:
+            quote_info = self.api.get_quotes(exchange=exchange, token=str(token))
+        except Exception as e:
+            logging.error(f"Quote request for {exchange}|{token} failed: {e}")
+            quote_info = None
+        if not quote_info or quote_info.get('lp') is None:
+            logging.error(f"No quote available for {exchange}|{token}")
+            return None
+
+        ltp = float(quote_info['lp'])
+        self._quotes[self.key(exchange, token)] = (ltp, time.monotonic())
+        return ltp
+
+    def ltp(self, exchange, token, max_age=None):
+        """Return the last traded price, refreshing over REST if the quote is stale."""
+        max_age = self.stale_after if max_age is None else max_age
+        ltp = self._fresh(exchange, token, max_age)
+        if ltp is not None:
+            return ltp
+
+        ltp = self._refresh(exchange, token)
+        if ltp is None:
+            quote = self._quotes.get(self.key(exchange, token))
+            return quote[0] if quote is not None else 0.0
+        return ltp
+
+    def ltps(self, instruments, max_age=None, max_workers=MAX_WORKERS):
+        """
+        Fresh LTPs of many instruments, refreshing every stale or missing quote concurrently.
+
+        :param instruments:     iterable of (exchange, token)
+        :return:                dict of (exchange, token) -> LTP, or None where no valid quote exists
+        """
+        max_age = self.stale_after if max_age is None else max_age
+        prices = {instrument: self._fresh(*instrument, max_age) for instrument in set(instruments)}
+
+        stale = [instrument for instrument, ltp in prices.items() if ltp is None]
+        if stale:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(stale))) as pool:
+                for instrument, ltp in zip(stale, pool.map(lambda instrument: self._refresh(*instrument), stale)):
+                    prices[instrument] = ltp
+
+        return {instrument: ltp if ltp is not None and ltp > 0 else None for instrument, ltp in prices.items()}
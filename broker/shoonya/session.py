@@ -0,0 +1,179 @@
+"""
+Lazy, session-reusing Shoonya client.
+
+The client logs in on first use instead of at import time, keeps the session
+token on disk for the rest of the trading day and only re-authenticates when
+a call fails because the session is no longer valid.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime
+
+DEFAULT_SESSION_FILE = os.path.join(os.path.expanduser('~'), '.shoonya_session.json')
+
+AUTH_PROBE_INTERVAL = 30     # Minimum seconds between session validity probes
+
+# Calls that do not need a logged-in session
+_UNAUTHENTICATED = {'login', 'set_session', 'logout'}
+
+# Calls that return None on success, so None says nothing about the session
+_NO_RESULT = {'start_websocket', 'close_websocket', 'subscribe', 'unsubscribe',
+              'subscribe_orders'}
+
+
+def resolve_session_file():
+    """Session token path from SHOONYA_SESSION_FILE, read when called so .env values apply."""
+    return os.getenv('SHOONYA_SESSION_FILE') or DEFAULT_SESSION_FILE
+
+
+def load_session(path=None):
+    """Return the stored session if it was created today, else None."""
+    path = path or resolve_session_file()
+    try:
+        with open(path, 'r') as f:
+            session = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if session.get('date') != datetime.now().strftime('%Y-%m-%d'):
+        return None
+    if not session.get('userid') or not session.get('susertoken'):
+        return None
+    return session
+
+
+def save_session(userid, susertoken, path=None):
+    """Atomically write the session token to disk, readable only by the owner."""
+    path = path or resolve_session_file()
+    session = {
+        'userid': userid,
+        'susertoken': susertoken,
+        'date': datetime.now().strftime('%Y-%m-%d')
+    }
+    tmp_path = f"{path}.tmp"
+    try:
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(session, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logging.error(f"Could not store Shoonya session in {path}: {e}")
+
+
+def clear_session(path=None):
+    """Remove the stored session token."""
+    path = path or resolve_session_file()
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class LazyShoonyaClient:
+    """
+    Stand-in for a NorenApi instance that authenticates on first use.
+
+    :param client_factory:  callable returning a fresh NorenApi instance
+    :param credentials:     callable returning a dict with userid, password,
+                            twoFA, vendor_code, api_secret and imei
+    :param password:        callable returning just the password, used to reuse a
+                            stored session without generating a TOTP
+    :param session_file:    where the session token is stored between runs
+                            (default SHOONYA_SESSION_FILE, else ~/.shoonya_session.json)
+    """
+
+    def __init__(self, client_factory, credentials, password, session_file=None):
+        self._client_factory = client_factory
+        self._credentials = credentials
+        self._password = password
+        self._session_file = session_file or resolve_session_file()
+        self._client = None
+        self._authenticated = False
+        self._last_probe = 0.0
+        self._lock = threading.RLock()
+
+    @property
+    def client(self):
+        """Underlying NorenApi instance, created without logging in."""
+        with self._lock:
+            if self._client is None:
+                self._client = self._client_factory()
+            return self._client
+
+    def login(self):
+        """Perform a full TOTP login and persist the new session token."""
+        with self._lock:
+            creds = self._credentials()
+            ret = self.client.login(**creds)
+            if ret and ret.get('stat') == 'Ok':
+                save_session(creds['userid'], ret['susertoken'], self._session_file)
+                self._authenticated = True
+                self._last_probe = time.monotonic()
+                logging.info("Login successful")
+                return ret
+
+            logging.error(f"Login failed: {ret}")
+            return None
+
+    def ensure_session(self):
+        """Reuse today's stored session token, logging in only if there is none."""
+        with self._lock:
+            if self._authenticated:
+                return self.client
+
+            session = load_session(self._session_file)
+            if session:
+                self.client.set_session(userid=session['userid'],
+                                        password=self._password(),
+                                        usertoken=session['susertoken'])
+                self._authenticated = True
+                logging.info("Reusing stored Shoonya session")
+            else:
+                self.login()
+            return self.client
+
+    def logout(self):
+        """Log out and forget the stored session."""
+        with self._lock:
+            ret = self.client.logout()
+            self._authenticated = False
+            clear_session(self._session_file)
+            return ret
+
+    def _session_expired(self):
+        # NorenApi returns None for both auth failures and empty results, so
+        # probe with a cheap call, at most once per AUTH_PROBE_INTERVAL
+        now = time.monotonic()
+        if now - self._last_probe < AUTH_PROBE_INTERVAL:
+            return False
+        self._last_probe = now
+        return self.client.get_limits() is None
+
+    def _call(self, name, *args, **kwargs):
+        ret = getattr(self.ensure_session(), name)(*args, **kwargs)
+        if ret is None and name not in _NO_RESULT and self._session_expired():
+            logging.info(f"Session expired during {name}, re-authenticating")
+            with self._lock:
+                self._authenticated = False
+                clear_session(self._session_file)
+                if self.login() is None:
+                    return None
+            ret = getattr(self.client, name)(*args, **kwargs)
+        return ret
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        attr = getattr(self.client, name)
+        if not callable(attr) or name in _UNAUTHENTICATED:
+            return attr
+
+        def method(*args, **kwargs):
+            return self._call(name, *args, **kwargs)
+
+        return method
@@ -0,0 +1,153 @@
+"""
+Append-only binary recorder for the Shoonya websocket feed.
+
+The feed callback only appends (receive time, tick) to an in-memory deque.
+A background thread drains it in batches into a session file of
+length-prefixed records:
+
+    file    = MAGIC record*
+    record  = <uint32 payload length> <int64 receive time, ns since epoch> <payload>
+    payload = raw tick as compact UTF-8 JSON
+
+Files rotate per session (one per recorder start) and when they exceed
+max_bytes. read_ticks() reads them back; replay.compile_session turns a
+session into numpy arrays of forward-filled depth for backtesting.
+"""
+
+import os
+import json
+import time
+import struct
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+
+MAGIC = b'SHTICK01'
+_HEADER = struct.Struct('<Iq')
+
+TICK_FOLDER = os.path.join('data', 'storage', 'raw', 'ticks')
+FLUSH_INTERVAL = 0.05       # Seconds between batched writes
+FSYNC_INTERVAL = 1.0        # Seconds between fsync calls
+MAX_BYTES = 512 * 1024 * 1024
+
+
+class TickRecorder:
+    """
+    Batched, off-thread writer of raw websocket ticks.
+
+    :param folder:          directory for the session files
+    :param flush_interval:  seconds between batched writes
+    :param fsync_interval:  seconds between fsyncs
+    :param max_bytes:       file size that triggers rotation to a new part
+    """
+
+    def __init__(self, folder=TICK_FOLDER, flush_interval=FLUSH_INTERVAL,
+                 fsync_interval=FSYNC_INTERVAL, max_bytes=MAX_BYTES):
+        self.folder = folder
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.max_bytes = max_bytes
+
+        self._queue = deque()
+        self._stop = threading.Event()
+        self._thread = None
+        self._file = None
+        self._part = 0
+        self._session = None
+        self.path = None
+        self.recorded = 0
+
+    def start(self):
+        """Open a new session file and start the writer thread."""
+        os.makedirs(self.folder, exist_ok=True)
+        self._session = datetime.now().strftime('%Y%m%d_%H%M%S')
+        self._open_part()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='tick-recorder', daemon=True)
+        self._thread.start()
+        return self
+
+    def record(self, tick_data):
+        """Queue one raw tick; safe and cheap to call from the feed callback."""
+        self._queue.append((time.time_ns(), tick_data))
+
+    def close(self):
+        """Flush everything still queued and close the file."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self._write_batch()
+        self._sync()
+        self._file.close()
+        logging.info(f"Recorded {self.recorded} ticks to {self.path}")
+
+    def _open_part(self):
+        if self._file:
+            self._sync()
+            self._file.close()
+        suffix = f"_{self._part}" if self._part else ''
+        self.path = os.path.join(self.folder, f"{self._session}{suffix}.ticks")
+        self._file = open(self.path, 'ab')
+        if self._file.tell() == 0:
+            self._file.write(MAGIC)
+        self._part += 1
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _write_batch(self):
+        queue = self._queue
+        if not queue:
+            return
+
+        chunks = []
+        while queue:
+            recv_ns, tick_data = queue.popleft()
+            payload = json.dumps(tick_data, separators=(',', ':')).encode()
+            chunks.append(_HEADER.pack(len(payload), recv_ns))
+            chunks.append(payload)
+            self.recorded += 1
+
+        self._file.write(b''.join(chunks))
+        if self._file.tell() >= self.max_bytes:
+            self._open_part()
+
+    def _run(self):
+        last_sync = time.monotonic()
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self._write_batch()
+                if time.monotonic() - last_sync >= self.fsync_interval:
+                    self._sync()
+                    last_sync = time.monotonic()
+            except Exception as e:
+                logging.error(f"Tick recorder failed to write {self.path}: {e}")
+
+
+def read_ticks(path, want=None):
+    """
+    Yield (recv_ns, tick dict) for every record in a tick file.
+
+    :param want:    optional callable taking the raw payload bytes; records it
+                    rejects are skipped without being decoded
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a tick recording")
+
+        while True:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                return          # End of file, or a record cut short by a crash
+            length, recv_ns = _HEADER.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length:
+                return
+            if want is not None and not want(payload):
+                continue
+            yield recv_ns, json.loads(payload)
+
@@ -41,6 +41,7 @@ Remaining tasks:
 
 import requests
 import os
+import atexit
 import json
 import sys
 import asyncio
@@ -55,6 +56,8 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '.
 
 from backtesting.rv_iv_analysis.rv_iv_analysis import *
 from utilities.telegram_bot import send_to_me
+from utilities.scheduler import wait_until
+from utilities.journal import JournalWriter
 
 load_dotenv()
 access_token = os.getenv("UPSTOX_ACCESS_TOKEN")
@@ -76,6 +79,25 @@ df_sensex = pd.DataFrame(sensex_data)
 underlying_instruments["NIFTY50"]["rv_data"] = df_nifty
 underlying_instruments["SENSEX30"]["rv_data"] = df_sensex
 
+# Live analysis and trade logs, appended off-thread so the loops never wait on disk
+OUTPUT_FOLDER = r"forward_testing\rv_iv_analysis"
+
+ANALYSIS_COLUMNS = [
+    'Timestamp', 'Symbol', 'LTP', 'Expiry', 'Lot Size', 'Call Strike', 'Call Cost',
+    'Put Strike', 'Put Cost', 'Total Cost', 'Upper Breakeven', 'Lower Breakeven',
+    'Upper Target', 'Lower Target', 'Profit Target', 'Target Percentile',
+    'Breakeven Target', 'Breakeven Percentile'
+]
+TRADE_COLUMNS = [
+    'Symbol', 'Option Type', 'Strike Price', 'Buy Price', 'Status', 'Target',
+    'Breakeven', 'Instrument Key', 'Sell Price'
+]
+
+analysis_journal = JournalWriter(os.path.join(OUTPUT_FOLDER, 'live_analysis.csv'), ANALYSIS_COLUMNS).start()
+trades_journal = JournalWriter(os.path.join(OUTPUT_FOLDER, 'trades.csv'), TRADE_COLUMNS).start()
+atexit.register(analysis_journal.close)
+atexit.register(trades_journal.close)
+
 # # Code to get LTP of the underlying instruments
 
 
@@ -188,20 +210,15 @@ def analyse():
             print(s)
             text.append(s)
 
-        # Check for existing open trades
-        OUTPUT_FOLDER = r"forward_testing\rv_iv_analysis"
-        trades_file = os.path.join(OUTPUT_FOLDER, 'trades.csv')
-        
-        if os.path.exists(trades_file):
-
-            existing_trades = pd.read_csv(trades_file)
-            open_trades = existing_trades[(existing_trades['Symbol'] == name) & (existing_trades['Status'] == 'Open')]
-            
-            if not open_trades.empty:
-                print_msg(f"Skipping RV analysis for {name} - Active open trades exist\n")
-                asyncio.run(send_to_me("\n".join(msg)))
-                msg = []
-                continue
+        # Check for existing open trades, on disk or still queued in the journal
+        existing_trades = pd.DataFrame(trades_journal.records(), columns=TRADE_COLUMNS)
+        open_trades = existing_trades[(existing_trades['Symbol'] == name) & (existing_trades['Status'] == 'Open')]
+
+        if not open_trades.empty:
+            print_msg(f"Skipping RV analysis for {name} - Active open trades exist\n")
+            asyncio.run(send_to_me("\n".join(msg)))
+            msg = []
+            continue
 
         # Code to get LTP of the underlying instruments
 
@@ -390,7 +407,7 @@ def analyse():
                 print_msg(f"Probability is - {breakeven_percentile}%")
 
                 # Save live analysis to CSV
-                analysis_df = pd.DataFrame([{
+                analysis_journal.write({
                     'Timestamp': datetime.now(ist).strftime('%Y-%m-%d %H:%M:%S'),
                     'Symbol': name,
                     'LTP': ltp,
@@ -409,11 +426,7 @@ def analyse():
                     'Target Percentile': target_percentile,
                     'Breakeven Target': breakeven_target,
                     'Breakeven Percentile': breakeven_percentile
-                }])
-                
-                OUTPUT_FOLDER = r"forward_testing\rv_iv_analysis"
-                analysis_file = os.path.join(OUTPUT_FOLDER, 'live_analysis.csv')
-                analysis_df.to_csv(analysis_file, mode='a', header=not os.path.exists(analysis_file), index=False)
+                })
 
                 if msg:  # Only send if msg is not empty
                     asyncio.run(send_to_me("\n".join(msg)))
@@ -457,7 +470,8 @@ def analyse():
                     # print(call_instrument_key)
                     # print(put_instrument_key)
                     
-                    trades_df = pd.DataFrame([
+                    # Save trades to CSV
+                    trades_journal.write_many([
                         {
                             'Symbol': name,
                             'Option Type': 'CE',
@@ -482,13 +496,6 @@ def analyse():
                         }
                     ])
 
-                    # Save trades to CSV
-                    OUTPUT_FOLDER = r"forward_testing\rv_iv_analysis"
-                    os.makedirs(OUTPUT_FOLDER, exist_ok=True)
-                    
-                    trades_file = os.path.join(OUTPUT_FOLDER, 'trades.csv')
-                    trades_df.to_csv(trades_file, mode='a', header=not os.path.exists(trades_file), index=False)
-                    
                     if trade_data:  # Only send if trade_data is not empty
                         asyncio.run(send_to_me("\n".join(trade_data)))
 
@@ -510,16 +517,14 @@ async def monitor():
         asyncio.run(send_to_me("\n".join(msg)))
         msg = []
 
-    OUTPUT_FOLDER = r"forward_testing\rv_iv_analysis"
-    trades_file = os.path.join(OUTPUT_FOLDER, 'trades.csv')
+    # Trades come from the journal, so rows still queued are included and closes go through its writer
+    trades_df = pd.DataFrame(trades_journal.records(), columns=TRADE_COLUMNS)
 
-    if not os.path.exists(trades_file):
-        print_msg("No trades file found")
+    if trades_df.empty:
+        print_msg("No trades found")
         send_msg()
         return
 
-    trades_df = pd.read_csv(trades_file)
-
     # print(trades_df)
 
     open_trades = trades_df[trades_df['Status'] == 'Open']
@@ -531,7 +536,7 @@ async def monitor():
 
     instrument_targets = {}
     for _, trade in open_trades.iterrows():
-        instrument_targets[trade['Instrument Key']] = trade['Target']
+        instrument_targets[trade['Instrument Key']] = float(trade['Target'])
 
     print(instrument_targets)
 
@@ -579,16 +584,14 @@ async def monitor():
                 if instrument_key not in instrument_targets:
                     continue
 
-                row_index, target = instrument_targets[instrument_key]
+                target = instrument_targets[instrument_key]
 
                 if ltp >= target:
 
                     print(f"Target hit for {instrument_key} at {ltp}")
 
-                    trades_df.loc[row_index, 'Status'] = "Close"
-                    trades_df.loc[row_index, 'Sell Price'] = ltp
-
-                    trades_df.to_csv(trades_file, index=False)
+                    trades_journal.update({'Instrument Key': instrument_key, 'Status': 'Open'},
+                                          {'Status': 'Close', 'Sell Price': ltp})
 
                     # Remove from tracking
                     del instrument_targets[instrument_key]
@@ -612,7 +615,8 @@ def run_analyse():
             analyse()
             time.sleep(15)
         else:
-            time.sleep(1)
+            # Sleep through the closed hours instead of waking every second
+            wait_until(trading_window_start.strftime('%H:%M:%S'), tz=ist, next_day=True)
 
 
 def run_monitor():
@@ -626,9 +630,9 @@ def run_monitor():
 
         if monitor_start <= current_time <= monitor_end:
             # monitor()
-            time.sleep(1)
-        else:
-            time.sleep(1)
+            wait_until(monitor_end.strftime('%H:%M:%S'), tz=ist)
+        # Block until the next session opens
+        wait_until(monitor_start.strftime('%H:%M:%S'), tz=ist, next_day=True)
 
 def main():
 
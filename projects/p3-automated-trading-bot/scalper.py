@@ -411,7 +411,8 @@ def manage_position():
         if day_m2m > TAKE_PROFIT:
             logging.info(f"Take profit target reached: {day_m2m} is daily MTM. "
                         "Closing all positions.")
-            bf.exitallpositions()
+            if bf.exitallpositions() is None:
+                exit()      # Book already squared off
 
         # Retrieve the order book from the API
         orderbook = api.get_order_book()
@@ -0,0 +1,64 @@
+import os
+import sys
+import glob
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from backtesting.rv_iv_analysis import cache
+from backtesting.rv_iv_analysis.cache import load_result, store_result
+from backtesting.rv_iv_analysis.rv_iv_analysis import analyse_symbol
+from test_rv_iv_analysis import daily_candles
+
+
+def symbol_file(tmp_path, seed=0):
+    path = str(tmp_path / '0000_TEST.csv')
+    daily_candles(seed).to_csv(path, index=False)
+    return path
+
+
+def entries(folder):
+    return sorted(os.path.basename(path) for path in glob.glob(os.path.join(folder, '*.npz')))
+
+
+def test_stored_result_loads_back_equal(tmp_path):
+    path = symbol_file(tmp_path)
+    folder = str(tmp_path / 'cache')
+    result = analyse_symbol(path, 'Friday', 'Thursday')
+
+    store_result(path, 'Friday', 'Thursday', result, folder)
+    loaded = load_result(path, 'Friday', 'Thursday', folder)
+
+    assert loaded['stock'] == result['stock'] == 'TEST'
+    assert loaded['text'] == result['text']
+    assert loaded['percentile_data'] == result['percentile_data']
+    assert len(loaded['weekly_changes']) == len(result['weekly_changes'])
+    for (date, change, peak), (old_date, old_change, old_peak) in zip(loaded['weekly_changes'],
+                                                                     result['weekly_changes']):
+        assert date == old_date
+        assert change == old_change
+        assert (np.isnan(peak) and np.isnan(old_peak)) or peak == old_peak
+
+
+def test_changed_file_misses_and_older_entries_are_pruned(tmp_path, monkeypatch):
+    path = symbol_file(tmp_path)
+    folder = str(tmp_path / 'cache')
+    result = analyse_symbol(path, 'Friday', 'Thursday')
+    first = store_result(path, 'Friday', 'Thursday', result, folder)
+    other_pair = store_result(path, 'Monday', 'Friday', analyse_symbol(path, 'Monday', 'Friday'), folder)
+
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert load_result(path, 'Friday', 'Thursday', folder) is None
+
+    second = store_result(path, 'Friday', 'Thursday', result, folder)
+    assert second != first
+    assert entries(folder) == sorted(os.path.basename(p) for p in (second, other_pair))
+
+    # A method change misses too, and its first store replaces the old entry
+    monkeypatch.setattr(cache, 'METHOD_VERSION', cache.METHOD_VERSION + 1)
+    assert load_result(path, 'Friday', 'Thursday', folder) is None
+    third = store_result(path, 'Friday', 'Thursday', result, folder)
+    assert entries(folder) == sorted(os.path.basename(p) for p in (third, other_pair))
+    assert load_result(path, 'Friday', 'Thursday', folder) is not None
@@ -0,0 +1,86 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from backtesting.scalper.depth_signal import DepthSnapshot, QTY_FIELDS, DEPTH_LEVELS
+
+
+def full_tick(lp='100.5', tbq=9000, tsq=1000, bq=500, sq=100):
+    tick = {'lp': lp, 'tbq': str(tbq), 'tsq': str(tsq)}
+    for level in range(1, DEPTH_LEVELS + 1):
+        tick[f'bq{level}'] = str(bq)
+        tick[f'sq{level}'] = str(sq)
+    return tick
+
+
+def test_row_becomes_valid_only_once_every_field_was_seen():
+    snapshot = DepthSnapshot(['11', '22'])
+    tick = full_tick()
+    fields = ['lp'] + list(QTY_FIELDS)
+
+    for field in fields[:-1]:
+        row = snapshot.update('22', {field: tick[field]})
+        assert row == 1
+        assert not snapshot.valid[1]
+
+    snapshot.update('22', {fields[-1]: tick[fields[-1]]})
+    assert snapshot.valid[1]
+    assert not snapshot.valid[0]
+    assert snapshot.ltp[1] == 100.5
+    assert snapshot.tbq[1] == 9000
+    assert snapshot.sq[1].tolist() == [100] * DEPTH_LEVELS
+
+
+def test_partial_tick_overwrites_only_its_fields():
+    snapshot = DepthSnapshot(['11'])
+    snapshot.update('11', full_tick())
+    before = snapshot.qty[0].copy()
+
+    snapshot.update('11', {'tsq': '4000', 'bq3': '50', 'lp': '101', 'ft': '1700000000'})
+
+    after = snapshot.qty[0]
+    changed = np.flatnonzero(after != before)
+    assert [QTY_FIELDS[col] for col in changed] == ['tsq', 'bq3']
+    assert snapshot.tsq[0] == 4000 and snapshot.bq[0, 2] == 50
+    assert snapshot.ltp[0] == 101.0
+    assert snapshot.valid[0]
+
+
+def test_partial_updates_change_the_signal_like_a_full_snapshot():
+    partial = DepthSnapshot(['11'])
+    partial.update('11', full_tick())
+    partial.update('11', {'tbq': '1000', 'tsq': '9000'})
+    for level in range(1, DEPTH_LEVELS + 1):
+        partial.update('11', {f'bq{level}': '100', f'sq{level}': '500'})
+
+    full = DepthSnapshot(['11'])
+    full.update('11', full_tick(tbq=1000, tsq=9000, bq=100, sq=500))
+
+    assert partial.signal_at(0, 0.6, 0.95, 1.5) == full.signal_at(0, 0.6, 0.95, 1.5) == ('S', 0.9)
+    assert partial.candidates(0.6, 0.95, 1.5) == full.candidates(0.6, 0.95, 1.5) == [(0, 'S', 0.9)]
+
+
+def test_unknown_tokens_and_malformed_numbers_raise():
+    snapshot = DepthSnapshot(['11'])
+    with pytest.raises(KeyError):
+        snapshot.update('99', full_tick())
+    with pytest.raises(ValueError):
+        snapshot.update('11', {'tbq': 'abc'})
+
+
+def test_reset_forgets_depth_except_kept_tokens():
+    snapshot = DepthSnapshot(['11', '22'])
+    snapshot.update('11', full_tick())
+    snapshot.update('22', full_tick())
+    snapshot.disable(['11'])
+
+    snapshot.reset(keep=['22'])
+
+    assert not snapshot.valid[0] and snapshot.seen[0] == 0
+    assert np.isnan(snapshot.ltp[0]) and not snapshot.qty[0].any()
+    assert not snapshot.enabled[0]
+    assert snapshot.valid[1] and snapshot.ltp[1] == 100.5
@@ -0,0 +1,87 @@
+import os
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from broker.shoonya.exit_engine import plan_exit
+from broker.shoonya.quote_cache import QuoteCache
+
+
+class QuoteApi:
+    """get_quotes stub that records calls and how many ran at the same time."""
+
+    def __init__(self, prices, delay=0.05):
+        self.prices = prices
+        self.delay = delay
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def get_quotes(self, exchange, token):
+        with self.lock:
+            self.calls.append((exchange, token))
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        threading.Event().wait(self.delay)
+        with self.lock:
+            self.active -= 1
+        lp = self.prices.get(token)
+        return None if lp is None else {'lp': str(lp)}
+
+
+def order_book(rows):
+    columns = ['norenordno', 'exch', 'tsym', 'token', 'trantype', 'status', 'fillshares',
+               'rqty', 'ti', 'snonum']
+    return pd.DataFrame(rows, columns=columns)
+
+
+def sl_row(orderno, token, trantype='S', status='TRIGGER_PENDING', ti='0.05'):
+    return [orderno, 'NSE', f'SYM{token}-EQ', token, trantype, status, 0, 10, ti, '123']
+
+
+def test_plan_exit_modifies_sl_legs_and_cancels_unfilled_orders():
+    quotes = QuoteCache(QuoteApi({}))
+    quotes.update({'e': 'NSE', 'tk': '1', 'lp': '100.00'})
+    quotes.update({'e': 'NSE', 'tk': '2', 'lp': '250.00'})
+    df = order_book([
+        sl_row('A', '1', trantype='S'),
+        sl_row('B', '2', trantype='B'),
+        ['C', 'NSE', 'SYM3-EQ', '3', 'B', 'OPEN', 0, 10, '0.05', np.nan],
+        ['D', 'NSE', 'SYM4-EQ', '4', 'B', 'COMPLETE', 10, 0, '0.05', '123'],
+    ])
+
+    actions = {orderno: (method, kwargs) for orderno, method, kwargs in plan_exit(df, quotes)}
+
+    assert set(actions) == {'A', 'B', 'C'}
+    assert actions['A'][0] == 'modify_order'
+    assert actions['A'][1]['newprice'] == 99.9
+    assert actions['A'][1]['newtrigger_price'] == 100.0
+    assert actions['B'][1]['newprice'] == 250.25
+    assert actions['C'] == ('cancel_order', {'orderno': 'C'})
+
+
+def test_plan_exit_refreshes_stale_quotes_concurrently():
+    api = QuoteApi({str(token): 100 + token for token in range(8)})
+    quotes = QuoteCache(api)
+    df = order_book([sl_row(f'O{token}', str(token)) for token in range(8)])
+
+    actions = plan_exit(df, quotes)
+
+    assert len(actions) == 8
+    assert sorted(api.calls) == [('NSE', str(token)) for token in range(8)]
+    assert api.max_active > 1
+
+
+def test_plan_exit_skips_legs_without_a_valid_ltp():
+    quotes = QuoteCache(QuoteApi({'1': 100.0}))
+    df = order_book([sl_row('A', '1'), sl_row('B', '2')])
+
+    actions = plan_exit(df, quotes)
+
+    assert [orderno for orderno, _, _ in actions] == ['A']
+    assert all(kwargs['newprice'] > 0 and kwargs['newtrigger_price'] > 0 for _, _, kwargs in actions)
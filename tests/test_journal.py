@@ -0,0 +1,88 @@
+import os
+import sys
+import csv
+import threading
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from utilities.journal import JournalWriter
+
+COLUMNS = ['Symbol', 'Status', 'Sell Price']
+
+
+def read_csv(path):
+    with open(path, newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def test_records_are_written_in_order_with_a_single_header(tmp_path):
+    path = str(tmp_path / 'journal.csv')
+    journal = JournalWriter(path, COLUMNS, flush_interval=0.01).start()
+    journal.write_many([{'Symbol': 'A', 'Status': 'Open'}, {'Symbol': 'B', 'Status': 'Open'}])
+    journal.close()
+
+    journal = JournalWriter(path, COLUMNS).start()
+    journal.write({'Symbol': 'C', 'Status': 'Open', 'Sell Price': 1.5})
+    journal.close()
+
+    rows = read_csv(path)
+    assert [row['Symbol'] for row in rows] == ['A', 'B', 'C']
+    assert rows[2]['Sell Price'] == '1.5'
+    assert journal.written == 1
+
+
+def test_ring_keeps_only_the_most_recent_records(tmp_path):
+    journal = JournalWriter(str(tmp_path / 'journal.csv'), COLUMNS, ring_size=3)
+    for i in range(5):
+        journal.write({'Symbol': str(i)})
+
+    assert [record['Symbol'] for record in journal.recent()] == ['2', '3', '4']
+    assert [record['Symbol'] for record in journal.recent(2)] == ['3', '4']
+
+
+def test_records_lists_flushed_and_queued_records_once(tmp_path):
+    path = str(tmp_path / 'journal.csv')
+    journal = JournalWriter(path, COLUMNS, flush_interval=3600).start()
+    journal.write({'Symbol': 'A', 'Status': 'Open'})
+    journal._write_batch()                       # A is on disk and still in the ring
+    journal.write({'Symbol': 'B', 'Status': 'Open'})
+
+    assert [row['Symbol'] for row in journal.records()] == ['A', 'B']
+    assert len(journal.recent()) == 2
+    journal.close()
+    assert [row['Symbol'] for row in journal.records()] == ['A', 'B']
+
+
+def test_update_applies_in_order_to_disk_and_queued_records(tmp_path):
+    path = str(tmp_path / 'journal.csv')
+    journal = JournalWriter(path, COLUMNS, flush_interval=3600).start()
+    journal.write({'Symbol': 'A', 'Status': 'Open'})
+    journal._write_batch()
+    journal.write({'Symbol': 'B', 'Status': 'Open'})
+    journal.update({'Status': 'Open'}, {'Status': 'Close', 'Sell Price': 12.5})
+    journal.write({'Symbol': 'C', 'Status': 'Open'})
+
+    expected = [('A', 'Close', '12.5'), ('B', 'Close', '12.5'), ('C', 'Open', '')]
+    assert [(r['Symbol'], r['Status'], r['Sell Price']) for r in journal.records()] == expected
+
+    journal.close()
+    assert [(r['Symbol'], r['Status'], r['Sell Price']) for r in read_csv(path)] == expected
+
+
+def test_updates_do_not_lose_records_written_concurrently(tmp_path):
+    path = str(tmp_path / 'journal.csv')
+    journal = JournalWriter(path, COLUMNS, flush_interval=0.001).start()
+
+    def writer():
+        for i in range(300):
+            journal.write({'Symbol': f'S{i}', 'Status': 'Open'})
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    for i in range(0, 300, 10):
+        journal.update({'Symbol': f'S{i}'}, {'Status': 'Close'})
+    thread.join()
+    journal.close()
+
+    rows = read_csv(path)
+    assert [row['Symbol'] for row in rows] == [f'S{i}' for i in range(300)]
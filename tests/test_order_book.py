@@ -0,0 +1,149 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from broker.shoonya.mock_api import MockNorenApi
+from broker.shoonya.order_book import OrderBook
+from broker.shoonya.quote_cache import QuoteCache
+
+INSTRUMENTS = [{'exchange': 'NSE', 'token': '11', 'tsym': 'AAA-EQ', 'ltp': 100.0},
+               {'exchange': 'NSE', 'token': '22', 'tsym': 'BBB-EQ', 'ltp': 50.0}]
+
+
+@pytest.fixture
+def mock():
+    api = MockNorenApi(instruments=INSTRUMENTS)
+    yield api
+    api.close_websocket()
+
+
+def connected_book(api):
+    book = OrderBook(api, QuoteCache(api))
+    api.start_websocket(order_update_callback=book.on_order_update)
+    return book
+
+
+def place(api, side, tsym, qty, price_type='MKT', price=0.0, bookloss_price=0.0):
+    return api.place_order(buy_or_sell=side, product_type='H', exchange='NSE', tradingsymbol=tsym,
+                           quantity=qty, discloseqty=0, price_type=price_type, price=price,
+                           bookloss_price=bookloss_price)['norenordno']
+
+
+def test_failed_rest_calls_keep_local_state_and_stay_dirty(mock):
+    book = connected_book(mock)
+    place(mock, 'B', 'AAA-EQ', 10, bookloss_price=1.0)
+    assert book.reconcile()
+
+    mock.get_order_book = lambda: None
+    mock.get_positions = lambda: None
+    assert not book.reconcile()
+
+    assert book.net_qty('NSE', '11') == 10
+    assert not book.all_terminal()          # The stop-loss leg is still pending
+    assert book._dirty
+
+
+def test_missing_positions_are_only_empty_without_fills(mock):
+    book = connected_book(mock)
+    place(mock, 'B', 'AAA-EQ', 10, price_type='LMT', price=90.0)
+
+    assert book.reconcile()
+    assert not book._dirty                  # An open order and no positions is a consistent book
+
+    place(mock, 'B', 'BBB-EQ', 5)
+    mock.get_positions = lambda: None
+    book.reconcile()
+    assert book._dirty
+    assert book.net_qty('NSE', '22') == 5
+
+
+def test_events_during_the_fetch_win_over_the_rest_rows(mock):
+    book = connected_book(mock)
+    resting = place(mock, 'B', 'AAA-EQ', 10, price_type='LMT', price=90.0)
+    book.reconcile()
+
+    fetch_order_book = mock.get_order_book
+
+    def stale_order_book():
+        rows = fetch_order_book()
+        mock.cancel_order(resting)          # Event lands while the REST response is in flight
+        place(mock, 'S', 'BBB-EQ', 3)
+        return rows
+
+    mock.get_order_book = stale_order_book
+    book.reconcile()
+
+    assert book.orders_for('NSE', '11')[0]['status'] == 'CANCELED'
+    assert book.net_qty('NSE', '22') == -3
+    assert book.all_terminal()
+
+
+def test_wait_for_order_retries_until_the_order_book_loads(mock):
+    book = OrderBook(mock, QuoteCache(mock))
+    orderno = place(mock, 'B', 'AAA-EQ', 1)
+    responses = [None, None]
+    fetch_order_book = mock.get_order_book
+    mock.get_order_book = lambda: responses.pop() if responses else fetch_order_book()
+
+    assert book.wait_for_order(orderno, timeout=2.0)['status'] == 'COMPLETE'
+
+
+def fill_event(orderno, trantype, qty, fillshares, flprc, token='11'):
+    """An order update shaped like the feed's (and MockNorenApi's) om message."""
+    return {'t': 'om', 'norenordno': orderno, 'exch': 'NSE', 'tk': token, 'tsym': 'AAA-EQ',
+            'trantype': trantype, 'qty': str(qty), 'fillshares': str(fillshares),
+            'flprc': f"{flprc:.2f}", 'status': 'COMPLETE' if fillshares == qty else 'OPEN',
+            'reporttype': 'Fill'}
+
+
+def position(book, token='11'):
+    return book._positions[f"NSE|{token}"]
+
+
+def test_partial_and_opposite_fills_update_qty_average_and_mtm(mock):
+    book = OrderBook(mock, QuoteCache(mock))
+    book.on_order_update({'norenordno': 'P1', 'status': 'OPEN', 'tk': '11', 'exch': 'NSE',
+                          'trantype': 'B', 'qty': '10', 'fillshares': '0'})
+
+    book.on_order_update(fill_event('P1', 'B', 10, 4, 100.0))
+    assert book.net_qty('NSE', '11') == 4
+    assert position(book)['avg'] == pytest.approx(100.0)
+
+    book.on_order_update(fill_event('P1', 'B', 10, 10, 103.0))
+    assert book.net_qty('NSE', '11') == 10
+    assert position(book)['avg'] == pytest.approx(101.8)
+
+    book.on_order_update(fill_event('P1', 'B', 10, 10, 103.0))     # Repeated update, no new fill
+    assert book.net_qty('NSE', '11') == 10
+
+    # Opposite fills: realize part, then flip short through zero
+    book.on_order_update(fill_event('P2', 'S', 15, 6, 105.0))
+    assert book.net_qty('NSE', '11') == 4
+    assert position(book)['rpnl'] == pytest.approx(19.2)
+    assert position(book)['avg'] == pytest.approx(101.8)
+
+    book.on_order_update(fill_event('P2', 'S', 15, 15, 99.0))
+    assert book.net_qty('NSE', '11') == -5
+    assert position(book)['rpnl'] == pytest.approx(8.0)
+    assert position(book)['avg'] == pytest.approx(99.0)
+
+    book.quotes.update({'e': 'NSE', 'tk': '11', 'lp': '97.00'})
+    assert book.day_mtm() == pytest.approx(8.0 + (97.0 - 99.0) * -5)
+
+
+def test_mock_fills_match_the_broker_positions(mock):
+    book = connected_book(mock)
+    trades = [('B', 10, 100.0), ('B', 5, 106.0), ('S', 12, 103.5), ('S', 8, 98.0), ('B', 1, 101.0)]
+
+    for side, qty, ltp in trades:
+        mock._instrument('NSE', '11')['lp'] = ltp
+        place(mock, side, 'AAA-EQ', qty)
+
+    broker = mock.get_positions()[0]
+    assert book.net_qty('NSE', '11') == int(broker['netqty']) == -4
+    assert position(book)['avg'] == pytest.approx(float(broker['netavgprc']), abs=0.005)
+    assert position(book)['rpnl'] == pytest.approx(float(broker['rpnl']), abs=0.005)
+    assert book.day_mtm() == pytest.approx(float(broker['rpnl']) + float(broker['urmtom']), abs=0.01)
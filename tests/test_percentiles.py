@@ -0,0 +1,48 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from backtesting.rv_iv_analysis.percentiles import (
+    PERCENTILES, percentile_table, bucket_averages, stack, table_frame
+)
+
+
+def legacy_percentiles(values):
+    """Percentile p is the value ranked int((p - 1) * n / 100) from the top, as the study computed it."""
+    ranked = sorted(values, reverse=True)
+    n = len(ranked)
+    return np.array([ranked[min(int((p - 1) * n / 100), n - 1)] for p in PERCENTILES])
+
+
+@pytest.mark.parametrize('n', [1, 2, 3, 7, 99, 100, 101, 250, 1000, 1234])
+def test_matches_the_legacy_rank_formula(n):
+    rng = np.random.default_rng(n)
+    values = np.round(rng.exponential(2.0, n), 2)     # Rounded like the study's changes, so ties occur
+
+    assert np.array_equal(percentile_table(values), legacy_percentiles(values))
+
+
+def test_ragged_rows_are_nan_padded_and_computed_independently():
+    rng = np.random.default_rng(0)
+    rows = [np.round(rng.uniform(0, 5, n), 2) for n in (10, 57, 300)]
+
+    table = percentile_table(stack(rows))
+
+    assert table.shape == (3, len(PERCENTILES))
+    for row, values in zip(table, rows):
+        assert np.array_equal(row, legacy_percentiles(values))
+
+
+def test_bucket_averages_and_table_frame():
+    table = np.arange(100, dtype=float)[None, :].repeat(2, axis=0)
+
+    assert bucket_averages(table)[0].tolist() == [5 * i + 2.0 for i in range(20)]
+
+    frame = table_frame(['A', 'B'], table, table + 1)
+    assert len(frame) == 200
+    assert frame.loc[frame['Stock'] == 'B', 'Percentile'].tolist() == list(PERCENTILES)
+    assert frame['Peak Abs Change Percentage'].iloc[0] == 1.0
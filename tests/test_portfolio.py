@@ -0,0 +1,52 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from backtesting.scalper.portfolio import Portfolio, PositionTask
+from broker.shoonya.order_book import OrderBook
+from broker.shoonya.quote_cache import QuoteCache
+
+
+class CancelApi:
+    """Broker stub that acknowledges cancels without sending the CANCELED event yet."""
+
+    def __init__(self, ack=True):
+        self.ack = ack
+        self.cancels = []
+
+    def cancel_order(self, orderno):
+        self.cancels.append(orderno)
+        return {'stat': 'Ok', 'result': orderno} if self.ack else None
+
+
+def stale_entry_task(api):
+    quotes = QuoteCache(api)
+    orders = OrderBook(api, quotes)
+    orders.on_order_update({'norenordno': 'E1', 'status': 'OPEN', 'exch': 'NSE', 'tk': '11',
+                            'trantype': 'B', 'prc': '100.00', 'qty': '1', 'fillshares': '0'})
+    quotes.update({'e': 'NSE', 'tk': '11', 'lp': '102.00'})     # 2% past the entry price
+    portfolio = Portfolio(api, orders, quotes)
+    return PositionTask(portfolio, 'E1', 'NSE', '11', 'AAA-EQ', 100.0), orders
+
+
+def test_stale_entry_is_cancelled_once_until_its_event_arrives():
+    api = CancelApi()
+    task, orders = stale_entry_task(api)
+
+    for _ in range(5):
+        assert not task._step(orders)
+    assert api.cancels == ['E1']
+
+    orders.on_order_update({'norenordno': 'E1', 'status': 'CANCELED'})
+    assert task._step(orders)
+
+
+def test_failed_cancel_is_retried():
+    api = CancelApi(ack=False)
+    task, orders = stale_entry_task(api)
+
+    task._step(orders)
+    task._step(orders)
+    assert api.cancels == ['E1', 'E1']
+    assert not task.cancel_sent
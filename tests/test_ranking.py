@@ -0,0 +1,100 @@
+import os
+import sys
+import random
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from backtesting.scalper.depth_signal import DepthSnapshot, DEPTH_LEVELS
+from backtesting.scalper.ranking import SignalRanking
+
+
+def rescan_best(signals):
+    """Top candidate by a full scan: highest dominance, lowest row on ties."""
+    qualifying = [(-dominant, row, direction) for row, (direction, dominant) in signals.items()]
+    if not qualifying:
+        return None
+    key, row, direction = min(qualifying)
+    return row, direction, -key
+
+
+def test_best_follows_updates_moves_and_removals():
+    ranking = SignalRanking()
+    assert ranking.best() is None
+    assert not ranking.ready.is_set()
+
+    ranking.update(3, ('B', 0.70))
+    ranking.update(1, ('S', 0.80))
+    ranking.update(2, ('B', 0.80))
+    assert ranking.best() == (1, 'S', 0.80)
+    assert ranking.ready.is_set()
+
+    ranking.update(1, ('S', 0.65))          # Move down
+    assert ranking.best() == (2, 'B', 0.80)
+
+    ranking.update(3, ('S', 0.95))          # Move up
+    assert ranking.best() == (3, 'S', 0.95)
+
+    ranking.remove(3)
+    ranking.update(2, None)
+    assert ranking.best() == (1, 'S', 0.65)
+    assert len(ranking) == 1
+
+    ranking.remove(1)
+    ranking.remove(1)                       # Removing an absent row is a no-op
+    assert ranking.best() is None
+    assert not ranking.ready.is_set()
+    assert not ranking.wait(timeout=0)
+
+
+def test_matches_full_rescan_under_random_updates():
+    rng = random.Random(7)
+    ranking = SignalRanking()
+    signals = {}
+
+    for _ in range(5000):
+        row = rng.randrange(50)
+        if rng.random() < 0.3:
+            ranking.update(row, None)
+            signals.pop(row, None)
+        else:
+            signal = (rng.choice('BS'), round(rng.uniform(0.6, 0.98), 2))
+            ranking.update(row, signal)
+            signals[row] = signal
+        assert ranking.best() == rescan_best(signals)
+        assert len(ranking) == len(signals)
+
+
+def random_snapshot(n, seed):
+    rng = random.Random(seed)
+    depth = DepthSnapshot([str(token) for token in range(n)])
+    for token in depth.tokens:
+        tick = {'lp': '100', 'tbq': str(rng.randint(1, 9000)), 'tsq': str(rng.randint(1, 9000))}
+        for level in range(1, DEPTH_LEVELS + 1):
+            tick[f'bq{level}'] = str(rng.randint(1, 900))
+            tick[f'sq{level}'] = str(rng.randint(1, 900))
+        depth.update(token, tick)
+    return depth
+
+
+def test_rebuild_from_a_full_scan_matches_per_tick_updates():
+    depth = random_snapshot(500, seed=3)
+    bounds = (0.6, 0.95, 1.5)
+
+    ticked = SignalRanking()
+    for row in range(len(depth.tokens)):
+        ticked.update(row, depth.signal_at(row, *bounds))
+    rebuilt = SignalRanking()
+    rebuilt.update(7, ('B', 0.99))          # Stale entry, dropped by the rebuild
+    rebuilt.rebuild(depth.candidates(*bounds))
+
+    assert len(rebuilt) == len(ticked) > 0
+    assert rebuilt.ready.is_set()
+    while len(ticked):
+        best = rebuilt.best()
+        assert best == ticked.best()
+        rebuilt.remove(best[0])
+        ticked.remove(best[0])
+    assert not rebuilt.ready.is_set()
+
+    rebuilt.rebuild([])
+    assert rebuilt.best() is None and not rebuilt.ready.is_set()
@@ -0,0 +1,108 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from backtesting.rv_iv_analysis.rv_iv_analysis import get_weekly_abs_changes
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+def legacy_weekly_abs_changes(df, start_day, end_day):
+    """The per-row loop get_weekly_abs_changes replaced, kept as the reference."""
+    days_map = {day: i for i, day in enumerate(DAYS)}
+    start_num = days_map[start_day]
+    end_num = days_map[end_day]
+    max_days = (end_num - start_num) % 7 if end_num != start_num else 7
+    df["Date"] = pd.to_datetime(df["Date"])
+    df["Day"] = df["Date"].dt.day_name()
+
+    start_days = df[df["Day"] == start_day].reset_index()
+    results = []
+
+    for i, row in start_days.iterrows():
+        if row["Close"] == 0:
+            continue
+
+        start_date = row["Date"]
+        end_day_data = df[(df["Date"] > start_date) & (df["Day"] == end_day)]
+
+        if not end_day_data.empty:
+            potential_end_date = end_day_data.iloc[0]["Date"]
+            days_diff = (potential_end_date - start_date).days
+
+            if days_diff <= max_days:
+                end_date = potential_end_date
+                end_close = end_day_data.iloc[0]["Close"]
+            else:
+                available_dates = df[(df["Date"] >= start_date) & (df["Date"] <= end_date)]
+                if not available_dates.empty:
+                    end_date = available_dates["Date"].max()
+                    end_close = df[df["Date"] == end_date]["Close"].iloc[0]
+                else:
+                    continue
+
+            abs_change_pct = round(abs((end_close - row["Close"]) / row["Close"]) * 100, 2)
+
+            period_df = df[(df["Date"] > start_date) & (df["Date"] <= end_date)]
+
+            peak_high = period_df["High"].max()
+            peak_low = period_df["Low"].min()
+            peak_high_change = round(abs((peak_high - row["Close"]) / row["Close"]) * 100, 2)
+            peak_low_change = round(abs((peak_low - row["Close"]) / row["Close"]) * 100, 2)
+
+            max_peak_change = max(peak_high_change, peak_low_change)
+
+            results.append((start_date, abs_change_pct, max_peak_change))
+
+    return results
+
+
+def daily_candles(seed, holiday_rate=0.04, nan_high_rate=0.02, zero_close_rate=0.01, years=3):
+    """Weekday candles with random holidays (none in the first month), NaN highs and zero closes."""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('2019-01-01', periods=260 * years)
+    holiday = rng.random(len(dates)) < holiday_rate
+    holiday[:22] = False
+    dates = dates[~holiday]
+
+    close = 1000 * np.exp(np.cumsum(rng.normal(0, 0.01, len(dates))))
+    high = close * (1 + rng.uniform(0, 0.01, len(dates)))
+    low = close * (1 - rng.uniform(0, 0.01, len(dates)))
+    high[rng.random(len(dates)) < nan_high_rate] = np.nan
+    close[22:][rng.random(len(dates) - 22) < zero_close_rate] = 0.0
+    return pd.DataFrame({'Date': dates.tz_localize('UTC'), 'Open': close, 'High': high,
+                         'Low': low, 'Close': close, 'Volume': 1})
+
+
+def same_changes(new, old):
+    assert len(new) == len(old)
+    for (new_date, new_abs, new_peak), (old_date, old_abs, old_peak) in zip(new, old):
+        assert new_date == old_date
+        assert new_abs == pytest.approx(old_abs)
+        assert (np.isnan(new_peak) and np.isnan(old_peak)) or new_peak == pytest.approx(old_peak)
+
+
+@pytest.mark.parametrize('seed', range(4))
+@pytest.mark.parametrize('start_day, end_day', [('Friday', 'Thursday'), ('Monday', 'Friday'),
+                                                ('Wednesday', 'Tuesday'), ('Thursday', 'Thursday'),
+                                                ('Tuesday', 'Wednesday')])
+def test_matches_the_legacy_loop_with_holidays_and_nan_highs(seed, start_day, end_day):
+    df = daily_candles(seed)
+
+    new = get_weekly_abs_changes(df.copy(), start_day, end_day)
+    old = legacy_weekly_abs_changes(df.copy(), start_day, end_day)
+
+    same_changes(new, old)
+
+
+def test_unsorted_input_gives_the_same_windows():
+    df = daily_candles(9)
+    shuffled = df.sample(frac=1, random_state=1)
+
+    same_changes(get_weekly_abs_changes(shuffled, 'Friday', 'Thursday'),
+                 legacy_weekly_abs_changes(df.copy(), 'Friday', 'Thursday'))
@@ -0,0 +1,83 @@
+import os
+import sys
+import time
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from utilities import scheduler
+from utilities.scheduler import MarketSchedule, wait_until
+
+
+class SteppedClock:
+    """Wall clock that runs in real time from a fixed start and can be stepped like NTP does."""
+
+    def __init__(self, start):
+        self.start = start
+        self.started = time.monotonic()
+        self.offset = timedelta()
+
+    def now(self, tz=None):
+        return self.start + timedelta(seconds=time.monotonic() - self.started) + self.offset
+
+    def step_later(self, delay, seconds):
+        def step():
+            self.offset += timedelta(seconds=seconds)
+        threading.Timer(delay, step).start()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SteppedClock(datetime(2026, 1, 5, 9, 14, 58, 800000))     # 1.2s before 09:15:00
+    monkeypatch.setattr(scheduler, '_now', clock.now)
+    return clock
+
+
+def timed(fn, *args, **kwargs):
+    started = time.monotonic()
+    result = fn(*args, **kwargs)
+    return result, time.monotonic() - started
+
+
+def test_clock_stepped_forward_does_not_fire_late(clock):
+    clock.step_later(0.1, 1.1)              # 09:15:00 is now reached 0.1s in
+
+    reached, elapsed = timed(wait_until, '09:15:00')
+
+    assert reached
+    assert elapsed < 0.9                    # Woke at the first half-way check, not after 1.2s
+
+
+def test_clock_stepped_back_does_not_fire_early(clock):
+    clock.step_later(0.1, -0.5)
+
+    reached, elapsed = timed(wait_until, '09:15:00')
+
+    assert reached
+    assert elapsed >= 1.6
+
+
+def test_stop_aborts_the_wait(clock):
+    stop = threading.Event()
+    threading.Timer(0.1, stop.set).start()
+
+    reached, elapsed = timed(wait_until, '09:15:00', stop=stop)
+
+    assert not reached and elapsed < 1.0
+
+
+def test_schedule_sets_passed_phases_now_and_later_ones_on_time(clock):
+    schedule = MarketSchedule([('pre_open', '09:14:00'), ('open', '09:15:00'), ('close', '15:30:00')]).start()
+
+    assert schedule.reached('pre_open')
+    assert not schedule.reached('open')
+    assert schedule.wait_for('open', timeout=3)
+    assert clock.now() >= datetime(2026, 1, 5, 9, 15)
+    assert not schedule.reached('close')
+
+    schedule.cancel()
+    schedule._thread.join(timeout=1)
+    assert not schedule._thread.is_alive()
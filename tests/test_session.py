@@ -0,0 +1,87 @@
+import os
+import sys
+import stat
+import json
+from datetime import datetime
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from broker.shoonya.session import LazyShoonyaClient, load_session, save_session
+
+
+class FakeClient:
+    """NorenApi stand-in whose session can be expired on demand."""
+
+    def __init__(self):
+        self.logins = 0
+        self.sessions = []
+        self.valid = False
+
+    def login(self, userid, password, twoFA, vendor_code, api_secret, imei):
+        self.logins += 1
+        self.valid = True
+        return {'stat': 'Ok', 'susertoken': f"token-{self.logins}"}
+
+    def set_session(self, userid, password, usertoken):
+        self.sessions.append((userid, password, usertoken))
+        self.valid = True
+
+    def get_limits(self):
+        return {'stat': 'Ok', 'cash': '1.00'} if self.valid else None
+
+    def get_order_book(self):
+        return [{'norenordno': '1'}] if self.valid else None
+
+
+def client_for(tmp_path, fake):
+    def credentials():
+        raise AssertionError("credentials (and a TOTP) requested")
+
+    return LazyShoonyaClient(lambda: fake, credentials, lambda: 'secret',
+                             session_file=str(tmp_path / 'session.json'))
+
+
+def full_credentials():
+    return {'userid': 'U1', 'password': 'secret', 'twoFA': '123456', 'vendor_code': 'VC',
+            'api_secret': 'KEY', 'imei': 'IMEI'}
+
+
+def test_stored_session_is_reused_without_credentials(tmp_path):
+    save_session('U1', 'stored-token', str(tmp_path / 'session.json'))
+    fake = FakeClient()
+    api = client_for(tmp_path, fake)
+
+    assert api.get_order_book() == [{'norenordno': '1'}]
+    assert fake.sessions == [('U1', 'secret', 'stored-token')]
+    assert fake.logins == 0
+
+
+def test_expired_session_logs_in_again_and_stores_the_new_token(tmp_path):
+    path = str(tmp_path / 'session.json')
+    save_session('U1', 'stored-token', path)
+    fake = FakeClient()
+    api = LazyShoonyaClient(lambda: fake, full_credentials, lambda: 'secret', session_file=path)
+    api.ensure_session()
+
+    fake.valid = False              # Broker invalidated the token
+    assert api.get_order_book() == [{'norenordno': '1'}]
+    assert fake.logins == 1
+    assert load_session(path)['susertoken'] == 'token-1'
+
+
+def test_session_from_another_day_is_ignored(tmp_path):
+    path = str(tmp_path / 'session.json')
+    with open(path, 'w') as f:
+        json.dump({'userid': 'U1', 'susertoken': 'old', 'date': '2000-01-01'}, f)
+
+    assert load_session(path) is None
+    save_session('U1', 'new', path)
+    assert load_session(path)['date'] == datetime.now().strftime('%Y-%m-%d')
+
+
+def test_session_file_is_readable_only_by_the_owner(tmp_path):
+    path = str(tmp_path / 'session.json')
+    save_session('U1', 'token', path)
+
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert not os.path.exists(f"{path}.tmp")
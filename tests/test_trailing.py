@@ -0,0 +1,113 @@
+import os
+import sys
+import threading
+
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from backtesting.scalper.trailing import TrailingStopEngine
+
+
+class BlockingModifyApi:
+    """modify_order stub that holds each call until the test releases it."""
+
+    def __init__(self):
+        self.calls = []
+        self.started = threading.Semaphore(0)
+        self.release = threading.Semaphore(0)
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+
+    def modify_order(self, orderno, exchange, tradingsymbol, newquantity, newprice_type,
+                     newprice=0.0, newtrigger_price=None):
+        with self.lock:
+            self.calls.append(newtrigger_price)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        self.started.release()
+        self.release.acquire()
+        with self.lock:
+            self.active -= 1
+        return {'stat': 'Ok', 'result': orderno}
+
+
+def sl_leg(orderno='L1', trgprc='90.00'):
+    return pd.DataFrame([{
+        'norenordno': orderno, 'exch': 'NSE', 'tsym': 'AAA-EQ', 'token': '11', 'rqty': '1',
+        'trantype': 'S', 'ti': '0.05', 'status': 'TRIGGER_PENDING', 'snoordt': '1',
+        'trgprc': trgprc, 'prc': '0.00'
+    }])
+
+
+def tick(lp):
+    return {'tk': '11', 'lp': f"{lp:.2f}"}
+
+
+@pytest.fixture
+def engine():
+    api = BlockingModifyApi()
+    engine = TrailingStopEngine(api, step=0.01, min_step_ticks=2)
+    engine.sync(sl_leg())
+    yield engine
+    for _ in range(10):
+        api.release.release()       # Never leave a worker blocked
+    engine.close()
+
+
+def settle(engine):
+    """Release the in-flight modify and wait for it to be accounted for."""
+    engine.api.release.release()
+    engine._pool.submit(lambda: None).result()
+
+
+def test_one_modify_in_flight_and_the_latest_target_wins(engine):
+    api = engine.api
+    engine.on_tick(tick(100.0))                 # Trails to 99.00
+    assert api.started.acquire(timeout=1)
+
+    for lp in (101.0, 102.0, 103.0):
+        engine.on_tick(tick(lp))
+    assert api.calls == [99.0]                  # Later targets wait for the first modify
+    assert engine.coalesced == 2
+
+    api.release.release()
+    assert api.started.acquire(timeout=1)
+    assert api.calls == [99.0, 101.95]          # Only the latest target, 103 * 0.99
+    assert api.max_active == 1
+    settle(engine)
+    assert engine._legs['L1']['price'] == 101.95
+    assert engine.sent == 2
+
+
+def test_moves_smaller_than_min_step_ticks_are_not_sent(engine):
+    api = engine.api
+    engine.on_tick(tick(100.0))
+    assert api.started.acquire(timeout=1)
+    settle(engine)
+
+    engine.on_tick(tick(100.05))                # 99.05, one tick above the live 99.00
+    assert not api.started.acquire(timeout=0.1)
+    engine.on_tick(tick(100.10))                # 99.10, two ticks
+    assert api.started.acquire(timeout=1)
+    assert api.calls == [99.0, 99.1]
+
+
+def test_no_modify_after_close(engine):
+    api = engine.api
+    engine.on_tick(tick(100.0))
+    assert api.started.acquire(timeout=1)
+    engine.on_tick(tick(105.0))                 # Pending behind the in-flight modify
+
+    closer = threading.Thread(target=engine.close)
+    closer.start()
+    while not engine._closed:
+        threading.Event().wait(0.001)
+    api.release.release()
+    closer.join(timeout=1)
+
+    engine.on_tick(tick(110.0))
+    assert api.calls == [99.0]
+    assert engine._legs['L1']['in_flight'] is None
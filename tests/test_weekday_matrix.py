@@ -0,0 +1,34 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from backtesting.rv_iv_analysis.percentiles import percentile_table
+from backtesting.rv_iv_analysis.rv_iv_analysis import get_weekly_abs_changes
+from backtesting.rv_iv_analysis.weekday_matrix import DAYS, build_cube
+from test_rv_iv_analysis import daily_candles
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_pairs_match_the_study_with_holidays(seed):
+    df = daily_candles(seed)
+    cube = build_cube(df.copy(), holding_days=[1, 5])
+
+    for start_num, start_day in enumerate(DAYS[:5]):
+        for end_num, end_day in enumerate(DAYS[:5]):
+            changes = get_weekly_abs_changes(df.copy(), start_day, end_day)
+            assert cube['pair_counts'][start_num, end_num] == len(changes)
+
+            expected = percentile_table([[change for _, change, _ in changes],
+                                         [peak for _, _, peak in changes]]).astype(np.float32)
+            assert np.array_equal(cube['pairs'][start_num, end_num], expected, equal_nan=True)
+
+
+def test_days_without_sessions_are_empty():
+    cube = build_cube(daily_candles(0), holding_days=[1])
+
+    assert (cube['pair_counts'][5:] == 0).all() and (cube['pair_counts'][:, 5:] == 0).all()
+    assert np.isnan(cube['pairs'][5, 0]).all()
@@ -0,0 +1,203 @@
+"""
+Buffered, off-thread CSV journal for MTM curves and trade logs.
+
+Trading loops call write(), which only appends the record to a deque and to
+an in-memory ring buffer of the most recent records. A background thread
+drains the deque in batches to the CSV file and fsyncs it periodically, so
+callers never wait on the filesystem and recent() answers without disk I/O.
+
+Changes to rows already in the file (Eg : closing a trade) are queued with
+update() and applied by the same thread, in order with the appends, so a
+rewrite can never lose a record that is being flushed. records() returns the
+file plus everything still queued, each record exactly once.
+"""
+
+import io
+import os
+import csv
+import time
+import logging
+import threading
+from collections import deque
+
+FLUSH_INTERVAL = 0.2        # Seconds between batched writes
+FSYNC_INTERVAL = 2.0        # Seconds between fsync calls
+RING_SIZE = 1000            # Most recent records kept in memory
+
+
+class JournalWriter:
+    """
+    Append-only CSV journal written on a background thread.
+
+    :param path:            CSV file to append to; the header is written if it is new or empty
+    :param columns:         column order for dict records
+    :param flush_interval:  seconds between batched writes
+    :param fsync_interval:  seconds between fsyncs
+    :param ring_size:       number of recent records kept for recent()
+    """
+
+    def __init__(self, path, columns, flush_interval=FLUSH_INTERVAL,
+                 fsync_interval=FSYNC_INTERVAL, ring_size=RING_SIZE):
+        self.path = path
+        self.columns = list(columns)
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+
+        self._queue = deque()
+        self._ring = deque(maxlen=ring_size)
+        self._lock = threading.Lock()      # Held while queued items move to the file
+        self._stop = threading.Event()
+        self._thread = None
+        self._file = None
+        self.written = 0
+
+    def start(self):
+        """Open the file, write the header if needed and start the writer thread."""
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._file = open(self.path, 'a', newline='')
+        if self._file.tell() == 0:
+            csv.writer(self._file).writerow(self.columns)
+            self._file.flush()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f'journal-{os.path.basename(self.path)}',
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def write(self, record):
+        """Queue one record (dict keyed by column); never blocks on disk."""
+        self._ring.append(record)
+        self._queue.append(('write', record))
+
+    def write_many(self, records):
+        """Queue several records in order."""
+        for record in records:
+            self.write(record)
+
+    def update(self, match, changes):
+        """
+        Queue a change to existing records: every record whose columns equal
+        all values in match (compared as text) gets the values in changes.
+        Applies to records on disk and to those queued before this call.
+        """
+        self._queue.append(('update', (dict(match), dict(changes))))
+
+    def recent(self, n=None):
+        """The last n records written (all kept ones if n is None), oldest first."""
+        records = list(self._ring)
+        return records if n is None else records[-n:]
+
+    def records(self):
+        """
+        Every record as a dict of column -> text: the rows on disk followed by
+        the queued ones, with queued updates applied. Reads the file.
+        """
+        with self._lock:
+            queued = list(self._queue)
+            rows = self._read_rows()
+
+        for kind, item in queued:
+            if kind == 'write':
+                rows.append({column: _text(item.get(column, '')) for column in self.columns})
+            else:
+                _apply_update(rows, *item)
+        return rows
+
+    def close(self):
+        """Write everything still queued, fsync and close the file."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self._write_batch()
+        self._sync()
+        self._file.close()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _read_rows(self):
+        if self._file is not None and not self._file.closed:
+            self._file.flush()
+        try:
+            with open(self.path, 'r', newline='') as f:
+                reader = csv.reader(f)
+                header = next(reader, None)
+                if header is None:
+                    return []
+                return [{column: row[i] if i < len(row) else '' for i, column in enumerate(header)}
+                        for row in reader]
+        except FileNotFoundError:
+            return []
+
+    def _rewrite(self, match, changes):
+        """Apply one update to the file, replacing it atomically; the caller holds the lock."""
+        rows = self._read_rows()
+        if not _apply_update(rows, match, changes):
+            return
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(self.columns)
+            writer.writerows([row.get(column, '') for column in self.columns] for row in rows)
+            f.flush()
+            os.fsync(f.fileno())
+        self._file.close()
+        os.replace(tmp_path, self.path)
+        self._file = open(self.path, 'a', newline='')
+
+    def _write_batch(self):
+        with self._lock:
+            queue = self._queue
+            if not queue:
+                return
+
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            while queue:
+                kind, item = queue.popleft()
+                if kind == 'write':
+                    writer.writerow([item.get(column, '') for column in self.columns])
+                    self.written += 1
+                    continue
+
+                # Appends queued before the update must be on disk before the rewrite
+                self._file.write(buffer.getvalue())
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                self._rewrite(*item)
+
+            self._file.write(buffer.getvalue())
+            self._file.flush()
+
+    def _run(self):
+        last_sync = time.monotonic()
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self._write_batch()
+                if time.monotonic() - last_sync >= self.fsync_interval:
+                    self._sync()
+                    last_sync = time.monotonic()
+            except Exception as e:
+                logging.error(f"Journal failed to write {self.path}: {e}")
+
+
+def _text(value):
+    """Value as it reads back from the CSV file."""
+    return '' if value is None else str(value)
+
+
+def _apply_update(rows, match, changes):
+    """Apply changes in place to the rows matching every value in match; returns the count."""
+    match = {column: _text(value) for column, value in match.items()}
+    changed = 0
+    for row in rows:
+        if all(row.get(column) == value for column, value in match.items()):
+            row.update({column: _text(value) for column, value in changes.items()})
+            changed += 1
+    return changed
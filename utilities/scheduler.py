@@ -0,0 +1,115 @@
+"""
+Event-driven market-phase scheduling for the trading bots.
+
+Instead of polling the clock every second, each market phase is a
+threading.Event set at its wall-clock time by a thread blocked in
+wait_until. Bots block on the event (wait_for), so they use no CPU while
+idle and react to a transition within milliseconds.
+
+wait_until sleeps half the remaining time at most and re-reads the wall
+clock on every wake-up, so a clock step (e.g. by NTP) moves the phases with
+it instead of firing them early or late; a wait takes only a few dozen
+wake-ups however far away its target is.
+"""
+
+import threading
+from datetime import datetime, timedelta
+
+# Default NSE cash-market phases used by the scalper (local wall-clock time)
+MARKET_PHASES = (
+    ('pre_open', '09:14:00'),    # Subscribe to tokens one minute before the open
+    ('open', '09:15:01'),        # First moment to look for trades
+    ('cutoff', '09:20:00'),      # No new trades after this
+    ('close', '15:30:00'),
+)
+
+MIN_WAIT = 1.0      # Below this many seconds to go, sleep the rest in one wait
+
+
+def _now(tz=None):
+    return datetime.now(tz) if tz else datetime.now()
+
+
+def _target(hhmmss, tz=None, next_day=False):
+    """Wall-clock datetime of hhmmss today, or tomorrow if it has passed and next_day is set."""
+    now = _now(tz)
+    clock = datetime.strptime(hhmmss, "%H:%M:%S").time()
+    target = now.replace(hour=clock.hour, minute=clock.minute, second=clock.second, microsecond=0)
+    if target <= now and next_day:
+        target += timedelta(days=1)
+    return target
+
+
+def seconds_until(hhmmss, tz=None, next_day=False):
+    """
+    Seconds from now until hhmmss today (0 if already passed).
+
+    :param next_day:    if the time has passed today, count to tomorrow's instead
+    """
+    return max((_target(hhmmss, tz, next_day) - _now(tz)).total_seconds(), 0.0)
+
+
+def wait_until(hhmmss, tz=None, stop=None, next_day=False):
+    """
+    Block until hhmmss without polling.
+
+    :param stop:    optional threading.Event that aborts the wait when set
+    :return:        False if aborted by stop, else True
+    """
+    stop = stop or threading.Event()
+    target = _target(hhmmss, tz, next_day)
+    remaining = (target - _now(tz)).total_seconds()
+    while remaining > 0:
+        # Re-read the wall clock on every wake-up in case it was adjusted meanwhile
+        if stop.wait(remaining / 2 if remaining > MIN_WAIT else remaining):
+            return False
+        remaining = (target - _now(tz)).total_seconds()
+    return not stop.is_set()
+
+
+class MarketSchedule:
+    """
+    One threading.Event per market phase, set at the phase's start time.
+
+    :param phases:  sequence of (name, "HH:MM:SS") in chronological order
+    :param tz:      timezone for the phase times; None means local time
+    """
+
+    def __init__(self, phases=MARKET_PHASES, tz=None):
+        self.phases = list(phases)
+        self.tz = tz
+        self.events = {name: threading.Event() for name, _ in self.phases}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Set the phases already passed and wait for the rest on a background thread."""
+        upcoming = []
+        for name, hhmmss in self.phases:
+            if seconds_until(hhmmss, self.tz) <= 0:
+                self.events[name].set()
+            else:
+                upcoming.append((name, hhmmss))
+
+        self._thread = threading.Thread(target=self._run, args=(upcoming,),
+                                        name='market-schedule', daemon=True)
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        """Stop waiting for the remaining phases."""
+        self._stop.set()
+
+    def _run(self, upcoming):
+        for name, hhmmss in upcoming:
+            if not wait_until(hhmmss, self.tz, stop=self._stop):
+                return
+            self.events[name].set()
+
+    def reached(self, name):
+        """True once the phase has started."""
+        return self.events[name].is_set()
+
+    def wait_for(self, name, timeout=None):
+        """Block until the phase starts; returns False on timeout."""
+        return self.events[name].wait(timeout)